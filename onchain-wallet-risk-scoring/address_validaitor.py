@@ -1,26 +1,229 @@
-# Установите библиотеку: pip install git+https://github.com/0x9090/CrypocurrencyAddressValidation.git
-from cryptocurrencyaddressvalidation import Validation
+import hashlib
+from typing import Callable, Dict, Iterable, List, Optional
+
+BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+BASE58_INDEX = {ch: i for i, ch in enumerate(BASE58_ALPHABET)}
+BECH32_CHARSET = 'qpzry9x8gf2tvdw0s3jn54khce6mua7l'
+BECH32_INDEX = {ch: i for i, ch in enumerate(BECH32_CHARSET)}
+BECH32_CONST = 1
+BECH32M_CONST = 0x2bc830a3
+HEX_DIGITS = set('0123456789abcdefABCDEF')
+
+# Версии base58 адресов основной сети: P2PKH и P2SH
+BASE58_VERSIONS = {0x00: 'p2pkh', 0x05: 'p2sh'}
+
+_KECCAK_RC = [
+    0x0000000000000001, 0x0000000000008082, 0x800000000000808A, 0x8000000080008000,
+    0x000000000000808B, 0x0000000080000001, 0x8000000080008081, 0x8000000000008009,
+    0x000000000000008A, 0x0000000000000088, 0x0000000080008009, 0x000000008000000A,
+    0x000000008000808B, 0x800000000000008B, 0x8000000000008089, 0x8000000000008003,
+    0x8000000000008002, 0x8000000000000080, 0x000000000000800A, 0x800000008000000A,
+    0x8000000080008081, 0x8000000000008080, 0x0000000080000001, 0x8000000080008008,
+]
+_KECCAK_ROT = [[0, 36, 3, 41, 18], [1, 44, 10, 45, 2], [62, 6, 43, 15, 61],
+               [28, 55, 25, 21, 56], [27, 20, 39, 8, 14]]
+_MASK64 = (1 << 64) - 1
+_KECCAK_RATE = 136
+
+# rho и pi вместе: (дорожка-источник, дорожка-приёмник, сдвиг)
+_KECCAK_RHO_PI = [(x + 5 * y, y + 5 * ((2 * x + 3 * y) % 5), _KECCAK_ROT[x][y])
+                  for x in range(5) for y in range(5)]
+
+
+def _keccak_f(a: List[int]):
+    """Keccak-f[1600] над 25 дорожками на месте.
+
+    Дорожки — int или numpy-массивы uint64 (тогда за вызов — пачка состояний,
+    см. keccak256_many); чистый Python — запасной путь без _native_keccak.
+    """
+    b = [0] * 25
+    for rc in _KECCAK_RC:
+        c = [a[x] ^ a[x + 5] ^ a[x + 10] ^ a[x + 15] ^ a[x + 20] for x in range(5)]
+        d = [c[x - 1] ^ (((c[(x + 1) % 5] << 1) | (c[(x + 1) % 5] >> 63)) & _MASK64) for x in range(5)]
+        for src, dst, r in _KECCAK_RHO_PI:
+            lane = a[src] ^ d[src % 5]
+            b[dst] = ((lane << r) | (lane >> (64 - r))) & _MASK64 if r else lane
+        for y in range(0, 25, 5):
+            for x in range(5):
+                a[y + x] = b[y + x] ^ (~b[y + (x + 1) % 5] & b[y + (x + 2) % 5])
+        a[0] ^= rc
+
+
+def _native_keccak() -> Optional[Callable[[bytes], bytes]]:
+    """Keccak-256 на C, если есть: OpenSSL >= 3.2, pycryptodome или pysha3"""
+    try:
+        hashlib.new('keccak-256')
+        return lambda data: hashlib.new('keccak-256', data).digest()
+    except ValueError:
+        pass
+    try:
+        from Crypto.Hash import keccak
+        return lambda data: keccak.new(digest_bits=256, data=data).digest()
+    except ImportError:
+        pass
+    try:
+        import sha3
+        return lambda data: sha3.keccak_256(data).digest()
+    except ImportError:
+        return None
+
+
+_NATIVE_KECCAK = _native_keccak()
+
+
+def keccak256(data: bytes) -> bytes:
+    """Keccak-256 (как в Ethereum, не SHA3-256)"""
+    if _NATIVE_KECCAK is not None:
+        return _NATIVE_KECCAK(data)
+    padded = bytearray(data) + b'\x01'
+    padded += b'\x00' * (-len(padded) % _KECCAK_RATE)
+    padded[-1] |= 0x80
+    state = [0] * 25
+    for offset in range(0, len(padded), _KECCAK_RATE):
+        block = padded[offset:offset + _KECCAK_RATE]
+        for i in range(_KECCAK_RATE // 8):
+            state[i] ^= int.from_bytes(block[8 * i:8 * i + 8], 'little')
+        _keccak_f(state)
+    return b''.join(state[i].to_bytes(8, 'little') for i in range(4))
+
+
+def keccak256_many(items: List[bytes]) -> List[bytes]:
+    """Keccak-256 пачки строк короче блока (136 байт) одной перестановкой на numpy.
+
+    Без C-реализации это в десятки раз быстрее keccak256 на каждую строку;
+    с ней, для длинных строк и маленьких пачек — обычный keccak256.
+    """
+    if _NATIVE_KECCAK is not None or len(items) < 32 or any(len(data) >= _KECCAK_RATE for data in items):
+        return [keccak256(data) for data in items]
+    import numpy as np
+
+    blocks = np.zeros((len(items), _KECCAK_RATE), dtype=np.uint8)
+    for i, data in enumerate(items):
+        blocks[i, :len(data)] = np.frombuffer(data, dtype=np.uint8)
+        blocks[i, len(data)] = 0x01
+    blocks[:, -1] |= 0x80
+    words = blocks.view('<u8')
+    state = [words[:, i].copy() for i in range(_KECCAK_RATE // 8)]
+    state += [np.zeros(len(items), dtype=np.uint64) for _ in range(25 - len(state))]
+    _keccak_f(state)
+    return [row.tobytes() for row in np.stack(state[:4], axis=1).astype('<u8')]
+
+
+def _b58decode_check(address: str) -> Optional[bytes]:
+    num = 0
+    for ch in address:
+        digit = BASE58_INDEX.get(ch)
+        if digit is None:
+            return None
+        num = num * 58 + digit
+    leading = len(address) - len(address.lstrip('1'))
+    body = num.to_bytes((num.bit_length() + 7) // 8, 'big') if num else b''
+    raw = b'\x00' * leading + body
+    if len(raw) < 5:
+        return None
+    payload, checksum = raw[:-4], raw[-4:]
+    if hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:4] != checksum:
+        return None
+    return payload
+
+
+def _bech32_polymod(values: Iterable[int]) -> int:
+    generator = (0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3)
+    chk = 1
+    for value in values:
+        top = chk >> 25
+        chk = (chk & 0x1ffffff) << 5 ^ value
+        for i in range(5):
+            if (top >> i) & 1:
+                chk ^= generator[i]
+    return chk
+
+
+def _segwit_type(address: str, hrp: str = 'bc') -> Optional[str]:
+    """Тип segwit адреса (BIP173 bech32 / BIP350 bech32m) или None"""
+    if len(address) > 90 or (address.lower() != address and address.upper() != address):
+        return None
+    address = address.lower()
+    pos = address.rfind('1')
+    if address[:pos] != hrp or pos + 7 > len(address):
+        return None
+    try:
+        data = [BECH32_INDEX[ch] for ch in address[pos + 1:]]
+    except KeyError:
+        return None
+    expanded = [ord(ch) >> 5 for ch in hrp] + [0] + [ord(ch) & 31 for ch in hrp]
+    const = _bech32_polymod(expanded + data)
+    if const not in (BECH32_CONST, BECH32M_CONST):
+        return None
+    version, words = data[0], data[1:-6]
+    # 5-битные группы -> байты программы
+    acc, bits, program = 0, 0, []
+    for word in words:
+        acc = (acc << 5) | word
+        bits += 5
+        if bits >= 8:
+            bits -= 8
+            program.append((acc >> bits) & 0xff)
+    if bits >= 5 or (acc & ((1 << bits) - 1)):
+        return None
+    if version > 16 or not 2 <= len(program) <= 40:
+        return None
+    if version == 0:
+        if const != BECH32_CONST or len(program) not in (20, 32):
+            return None
+        return 'p2wpkh' if len(program) == 20 else 'p2wsh'
+    if const != BECH32M_CONST:
+        return None
+    return 'p2tr' if version == 1 and len(program) == 32 else f'witness_v{version}'
+
+
+# hex адреса в нижнем регистре -> keccak256 (hex); заполняет validate_addresses пачкой
+_EIP55_DIGESTS: Dict[str, str] = {}
+_EIP55_DIGESTS_MAX = 100000
+
+
+def _eip55_ok(hex_part: str) -> bool:
+    if hex_part.islower() or hex_part.isupper() or hex_part.isdigit():
+        return True
+    lower = hex_part.lower()
+    digest = _EIP55_DIGESTS.get(lower) or keccak256(lower.encode()).hex()
+    return all(ch.isdigit() or (ch.isupper() == (int(h, 16) >= 8))
+               for ch, h in zip(hex_part, digest))
+
 
 class AddressValidator:
     """Валидация адресов криптовалют"""
-    
+
+    @staticmethod
+    def btc_address_type(address: str) -> Optional[str]:
+        """Тип BTC адреса основной сети (p2pkh, p2sh, p2wpkh, p2wsh, p2tr, ...) или None"""
+        if not address:
+            return None
+        first = address[0]
+        if first in '13':
+            if not 25 <= len(address) <= 34:
+                return None
+            payload = _b58decode_check(address)
+            if payload is None or len(payload) != 21:
+                return None
+            return BASE58_VERSIONS.get(payload[0])
+        if address[:3] in ('bc1', 'BC1'):
+            return _segwit_type(address)
+        return None
+
     @staticmethod
     def validate_btc_address(address: str) -> bool:
-        """Проверка адреса Bitcoin (P2PKH, P2SH, Bech32)[citation:6]"""
-        try:
-            return Validation.validate('BTC', 'MAINNET', address)
-        except:
-            return False
-    
+        """Проверка адреса Bitcoin (P2PKH, P2SH, Bech32/Bech32m)"""
+        return AddressValidator.btc_address_type(address) is not None
+
     @staticmethod
     def validate_eth_address(address: str) -> bool:
-        """Проверка адреса Ethereum"""
-        try:
-            return Validation.validate('ETH', 'MAINNET', address)
-        except:
-            # Базовая проверка формата
-            return address.startswith('0x') and len(address) == 42
-    
+        """Проверка адреса Ethereum (с контрольной суммой EIP-55 для смешанного регистра)"""
+        if not address or len(address) != 42 or not address.startswith('0x'):
+            return False
+        hex_part = address[2:]
+        return all(ch in HEX_DIGITS for ch in hex_part) and _eip55_ok(hex_part)
+
     @staticmethod
     def validate_address(address: str, chain: str = 'auto') -> dict:
         """Универсальная проверка адреса"""
@@ -29,21 +232,45 @@ class AddressValidator:
             'chain': 'unknown',
             'details': {}
         }
-        
-        # Автоопределение сети
+        address = address or ''
+
+        # Автоопределение сети по первым символам: одна проверка вместо перебора
         if chain == 'auto':
-            if AddressValidator.validate_btc_address(address):
-                result['is_valid'] = True
-                result['chain'] = 'BTC'
-            elif AddressValidator.validate_eth_address(address):
-                result['is_valid'] = True
-                result['chain'] = 'ETH'
+            chain = 'ETH' if address.startswith('0x') else 'BTC'
+            auto = True
         else:
-            if chain.upper() == 'BTC':
-                result['is_valid'] = AddressValidator.validate_btc_address(address)
+            auto = False
+
+        if chain.upper() == 'BTC':
+            address_type = AddressValidator.btc_address_type(address)
+            if address_type or not auto:
+                result['is_valid'] = address_type is not None
                 result['chain'] = 'BTC'
-            elif chain.upper() == 'ETH':
-                result['is_valid'] = AddressValidator.validate_eth_address(address)
+            if address_type:
+                result['details'] = {'type': address_type}
+        elif chain.upper() == 'ETH':
+            is_valid = AddressValidator.validate_eth_address(address)
+            if is_valid or not auto:
+                result['is_valid'] = is_valid
                 result['chain'] = 'ETH'
-        
-        return result
\ No newline at end of file
+
+        return result
+
+    @staticmethod
+    def validate_addresses(addresses: Iterable[str], chain: str = 'auto') -> List[Dict]:
+        """Пакетная проверка (например, адресов из загруженного CSV)
+
+        Контрольные суммы EIP-55 адресов в смешанном регистре считаются
+        заранее одной пачкой (keccak256_many).
+        """
+        addresses = [address.strip() if address else address for address in addresses]
+        mixed = list({address[2:].lower() for address in addresses
+                      if address and len(address) == 42 and address.startswith('0x')
+                      and not (address[2:].islower() or address[2:].isupper() or address[2:].isdigit())})
+        if len(_EIP55_DIGESTS) + len(mixed) > _EIP55_DIGESTS_MAX:
+            _EIP55_DIGESTS.clear()
+        if mixed:
+            digests = keccak256_many([hex_part.encode() for hex_part in mixed])
+            _EIP55_DIGESTS.update(zip(mixed, (digest.hex() for digest in digests)))
+        validate = AddressValidator.validate_address
+        return [validate(address, chain) for address in addresses]
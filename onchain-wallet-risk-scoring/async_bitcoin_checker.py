@@ -0,0 +1,210 @@
+import asyncio
+from collections import deque
+from contextlib import aclosing
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+
+import aiohttp
+
+import metrics
+from bitcoin_checker import SATOSHI, parse_balance, parse_transactions
+from tx_batch import TxBatch
+
+
+class AsyncBitcoinAddressChecker:
+    """Неблокирующая проверка Bitcoin адресов для обработчиков aiogram.
+
+    Одна ClientSession с пулом keep-alive соединений на всё время жизни бота;
+    ответы разбираются теми же функциями, что и в BitcoinAddressChecker.
+    С локальным индексом (chain_index.ChainIndex) /balance и /rawaddr для
+    адресов с полной историей в индексе отвечаются из него, в сеть идут
+    только остальные.
+    """
+
+    def __init__(self, api_url: str = "https://blockchain.info",
+                 pool_size: int = 100, timeout: float = 10, index=None):
+        self.api_url = api_url.rstrip('/')
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.index = index
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Ленивое создание сессии (нужен запущенный event loop)"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=30, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def _get_json(self, path: str, params: Dict = None, timeout: float = None) -> Dict:
+        if self.index is None:
+            return await self._get_remote(path, params, timeout)
+        # запросы к sqlite по ключу — доли миллисекунды, в executor не выносятся
+        if path == "/balance":
+            addresses = params['active'].split('|')
+            with metrics.stage('chain_index'):
+                data = self.index.balances(addresses)
+            missing = [address for address in addresses if address not in data]
+            if missing:
+                data.update(await self._get_remote(path, {**params, 'active': '|'.join(missing)}, timeout))
+            return data
+        if path.startswith("/rawaddr/"):
+            params = params or {}
+            with metrics.stage('chain_index'):
+                data = self.index.rawaddr(path[len("/rawaddr/"):], int(params.get('limit', 50)),
+                                          int(params.get('offset', 0)))
+            if data is not None:
+                return data
+        return await self._get_remote(path, params, timeout)
+
+    async def _get_remote(self, path: str, params: Dict = None, timeout: float = None) -> Dict:
+        session = self._get_session()
+        kwargs = {'timeout': aiohttp.ClientTimeout(total=timeout)} if timeout else {}
+        endpoint = path.split('/', 2)[1]  # 'balance', 'rawaddr' — без адреса в метке
+        with metrics.upstream(endpoint):
+            try:
+                async with session.get(f"{self.api_url}{path}", params=params, **kwargs) as response:
+                    response.raise_for_status()
+                    return await response.json(content_type=None)
+            except Exception as e:
+                metrics.upstream_error(endpoint, e)
+                raise
+
+    async def check_address_balance(self, address: str) -> Dict:
+        """Проверка баланса одного адреса"""
+        try:
+            data = await self._get_json("/balance", {'active': address})
+            if address in data:
+                return parse_balance(address, data[address])
+            return {'success': False, 'error': 'Address not found'}
+        except Exception as e:
+            return {'success': False, 'error': str(e) or type(e).__name__}
+
+    async def get_address_transactions(self, address: str, limit: int = 50) -> List[Dict]:
+        """Получение истории транзакций"""
+        try:
+            data = await self._get_json(f"/rawaddr/{address}", {'limit': limit})
+            return parse_transactions(data)
+        except Exception:
+            return []
+
+    async def _fetch_page(self, address: str, offset: int, page_size: int, page_cache=None) -> Tuple[int, TxBatch]:
+        """Страница rawaddr: (n_tx адреса, транзакции страницы в TxBatch)"""
+        key = f"{address}:{offset}:{page_size}"
+        if page_cache is not None:
+            cached = page_cache.get(key)
+            if cached is not None:
+                return cached
+        data = await self._get_json(f"/rawaddr/{address}", {'limit': page_size, 'offset': offset})
+        page = (data.get('n_tx', 0), TxBatch.from_rawaddr(data))
+        if page_cache is not None and len(page[1]):
+            page_cache.set(key, page)
+        return page
+
+    async def iter_address_batches(self, address: str, page_size: int = 50, prefetch: int = 4,
+                                   max_txs: Optional[int] = None, page_cache=None) -> AsyncIterator[TxBatch]:
+        """Вся история адреса постранично (offset), от новых к старым, по TxBatch на страницу.
+        
+        Следующие `prefetch` страниц запрашиваются параллельно, пока потребитель
+        разбирает текущую; в памяти не больше prefetch + 1 страниц.
+        В page_cache кладётся только первая страница: глубокая история в кэше
+        держала бы в памяти до max_txs / page_size страниц на адрес.
+        Ошибка запроса страницы пробрасывается потребителю.
+        """
+        n_tx, first = await self._fetch_page(address, 0, page_size, page_cache)
+        total = min(n_tx, max_txs) if max_txs is not None else n_tx
+        offsets = iter(range(page_size, total, page_size))
+        pending = deque()
+
+        def schedule():
+            offset = next(offsets, None)
+            if offset is not None:
+                pending.append(asyncio.ensure_future(self._fetch_page(address, offset, page_size)))
+
+        for _ in range(prefetch):
+            schedule()
+        try:
+            left = total
+            page = first
+            while True:
+                if len(page) >= left:
+                    if left:
+                        if len(page) > left:
+                            head = TxBatch()
+                            head.extend(page, left)
+                            page = head
+                        yield page
+                    return
+                left -= len(page)
+                yield page
+                if not pending:
+                    return
+                _, page = await pending.popleft()
+                schedule()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def iter_address_transactions(self, address: str, page_size: int = 50, prefetch: int = 4,
+                                        max_txs: Optional[int] = None, page_cache=None) -> AsyncIterator[Dict]:
+        """То же, что iter_address_batches, по транзакции в формате get_address_transactions"""
+        batches = self.iter_address_batches(address, page_size, prefetch, max_txs, page_cache)
+        async with aclosing(batches):
+            async for batch in batches:
+                for i in range(len(batch)):
+                    yield batch.tx(i)
+
+    async def check_balances(self, addresses: List[str]) -> Dict[str, Dict]:
+        """Балансы до 100 адресов одним запросом в формате check_address_balance"""
+        addresses = addresses[:100]  # Лимит API
+        try:
+            data = await self._get_json("/balance", {'active': '|'.join(addresses)}, timeout=15)
+        except Exception as e:
+            error = {'success': False, 'error': str(e) or type(e).__name__}
+            return {addr: dict(error) for addr in addresses}
+        return {addr: parse_balance(addr, data[addr]) if addr in data
+                else {'success': False, 'error': 'Address not found'}
+                for addr in addresses}
+
+    async def check_multiple_addresses(self, addresses: List[str]) -> Dict:
+        """Проверка нескольких адресов (до 100 за запрос)"""
+        try:
+            addresses = addresses[:100]  # Лимит API
+            data = await self._get_json("/balance", {'active': '|'.join(addresses)}, timeout=15)
+
+            results = {}
+            total_balance = 0
+            for addr in addresses:
+                if addr in data:
+                    balance_btc = data[addr]['final_balance'] / SATOSHI
+                    results[addr] = {
+                        'balance_btc': balance_btc,
+                        'transaction_count': data[addr]['n_tx']
+                    }
+                    total_balance += balance_btc
+
+            return {
+                'success': True,
+                'results': results,
+                'total_balance_btc': total_balance,
+                'addresses_checked': len(results)
+            }
+        except Exception as e:
+            return {'success': False, 'error': str(e) or type(e).__name__}
+
+    async def check_address(self, address: str, limit: int = 50) -> Tuple[Dict, List[Dict]]:
+        """Баланс и история транзакций параллельно"""
+        return await asyncio.gather(
+            self.check_address_balance(address),
+            self.get_address_transactions(address, limit=limit)
+        )
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
@@ -0,0 +1,67 @@
+import asyncio
+from typing import Dict, List
+
+
+class BalanceBatcher:
+    """Склейка запросов баланса от разных обработчиков в batch-запросы.
+
+    Адреса, запрошенные в течение `window` секунд, уходят одним вызовом
+    `check_balances` (active=a|b|c, до 100 адресов). Повторный запрос адреса,
+    который уже ждёт ответа, получает тот же результат без нового запроса.
+    """
+
+    def __init__(self, checker, window: float = 0.05, max_batch: int = 100):
+        self.checker = checker
+        self.window = window
+        self.max_batch = min(max_batch, 100)
+        self._pending: List[str] = []
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._timer = None
+        self._tasks = set()
+        self.stats = {'requests': 0, 'deduplicated': 0, 'upstream_calls': 0, 'addresses_sent': 0}
+
+    async def check_address_balance(self, address: str) -> Dict:
+        """Баланс адреса; результат в формате BitcoinAddressChecker.check_address_balance"""
+        self.stats['requests'] += 1
+        future = self._inflight.get(address)
+        if future is not None:
+            self.stats['deduplicated'] += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[address] = future
+            self._pending.append(address)
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        # shield: отмена одного ожидающего не должна отменять ответ остальным
+        return dict(await asyncio.shield(future))
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            task = asyncio.ensure_future(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[str]):
+        self.stats['upstream_calls'] += 1
+        self.stats['addresses_sent'] += len(batch)
+        try:
+            results = await self.checker.check_balances(batch)
+        except Exception as e:
+            results = {addr: {'success': False, 'error': str(e) or type(e).__name__} for addr in batch}
+        for addr in batch:
+            future = self._inflight.pop(addr, None)
+            if future is not None and not future.done():
+                future.set_result(results.get(addr, {'success': False, 'error': 'Address not found'}))
+
+    async def close(self):
+        """Отправить накопленное и дождаться ответов"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
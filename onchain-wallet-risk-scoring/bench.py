@@ -0,0 +1,211 @@
+"""Замеры горячих путей на синтетических данных (см. synthetic.py).
+
+    python bench.py --sizes 1000,100000,1000000 --out bench.json
+    python bench.py --compare bench_old.json bench.json
+
+Результат — JSON: метаданные (коммит, версии, seed) и по записи на пару
+(бенчмарк, размер) с лучшим и медианным временем. --compare печатает
+отношение времён и завершается с кодом 1, если что-то замедлилось сильнее
+порога — так можно сравнивать коммиты между собой.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from typing import Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+
+def measure(fn: Callable, repeat: int) -> Dict:
+    """Лучшее и медианное время одного вызова fn (число вызовов подбирает timeit)"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    times = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {'number': number, 'best_s': min(times), 'median_s': statistics.median(times)}
+
+
+def table_benchmarks(size: int, args, workdir: str) -> Dict[str, Callable]:
+    import score
+    from synthetic import write_tx_csv
+
+    path = os.path.join(workdir, f'txs_{size}.csv')
+    write_tx_csv(path, size, seed=args.seed, n_counterparties=args.counterparties, burstiness=args.burstiness)
+    df = score.load_txs(path)
+    return {
+        'load_txs': lambda: score.load_txs(path),
+        'load_txs_projected': lambda: score.load_txs(path, score.SCORE_COLUMNS),
+        'factor_low_liquidity': lambda: score.factor_low_liquidity(df),
+        'factor_fresh_contracts': lambda: score.factor_fresh_contracts(df),
+        'factor_direction_entropy': lambda: score.factor_direction_entropy(df),
+        'factor_time_bursts': lambda: score.factor_time_bursts(df),
+        'score_wallet': lambda: score.score_wallet(df),
+    }
+
+
+def btc_benchmarks(size: int, args) -> Dict[str, Callable]:
+    import address_validaitor
+    from address_validaitor import AddressValidator
+    from bitcoin_checker import parse_transactions
+    from funds_origin import FundsOriginAnalyzer
+    from synthetic import synthetic_rawaddr
+    from tx_batch import TxBatch
+
+    wallet = '1BenchWa11etAddressxxxxxxxxxxxxxx'
+    data = synthetic_rawaddr(wallet, n_tx=size, seed=args.seed)
+    transactions = parse_transactions(data)
+    batch = TxBatch.from_rawaddr(data)
+    records = FundsOriginAnalyzer.btc_origin_records(transactions, wallet)
+    analyzer = FundsOriginAnalyzer()
+    sample = ['1BvBMSEYstWetqTFn5Au4m4GFg7xJaNVN2', '3J98t1WpEZ73CNmQviecrnyiWrnqRhWNLy',
+              'bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq',
+              'bc1p0xlxvlhemja6c4dqv22uapctqupfhlxm9h8z3k2e72q4k9hcz7vqzk5jj0',
+              'not-an-address']
+    addresses = [sample[i % len(sample)] for i in range(size)]
+    # ETH отдельно: EIP-55 (keccak256) на каждый адрес в смешанном регистре, все разные
+    rng = random.Random(args.seed)
+    eth_addresses = eth_checksum(['%040x' % rng.getrandbits(160) for _ in range(size)])
+
+    def validate_eth_batch():
+        address_validaitor._EIP55_DIGESTS.clear()
+        return AddressValidator.validate_addresses(eth_addresses)
+
+    return {
+        'analyze_btc_origin': lambda: analyzer.analyze_btc_origin(records),
+        'parse_rawaddr_dicts': lambda: parse_transactions(data),
+        'parse_rawaddr_batch': lambda: TxBatch.from_rawaddr(data),
+        'origin_from_dicts': lambda: analyzer.analyze_btc_origin(
+            FundsOriginAnalyzer.btc_origin_records(transactions, wallet)),
+        'origin_from_batch': lambda: analyzer.accumulate_btc_batch(analyzer.new_category_stats(), batch, wallet),
+        'validate_btc_address': lambda: [AddressValidator.validate_address(a) for a in addresses],
+        'validate_eth_checksum': lambda: [AddressValidator.validate_address(a) for a in eth_addresses],
+        'validate_eth_batch': validate_eth_batch,
+    }
+
+
+def eth_checksum(hex_parts: List[str]) -> List[str]:
+    """EIP-55 запись адресов по 40 hex-символам (нижний регистр)"""
+    from address_validaitor import keccak256_many
+
+    digests = keccak256_many([hex_part.encode() for hex_part in hex_parts])
+    return ['0x' + ''.join(c.upper() if int(d, 16) >= 8 else c for c, d in zip(hex_part, digest.hex()))
+            for hex_part, digest in zip(hex_parts, digests)]
+
+
+def report_benchmarks(args) -> Dict[str, Callable]:
+    from bitcoin_checker import parse_balance, parse_transactions
+    from funds_origin import FundsOriginAnalyzer
+    from main_bot import RiskAnalyzerBot
+    from synthetic import synthetic_rawaddr
+    from tx_batch import TxBatch
+    from wallet_analysis import calculate_total_risk
+
+    wallet = '1BenchWa11etAddressxxxxxxxxxxxxxx'
+    data = synthetic_rawaddr(wallet, n_tx=50, seed=args.seed)
+    transactions = parse_transactions(data)
+    origin = FundsOriginAnalyzer().analyze_btc_origin(FundsOriginAnalyzer.btc_origin_records(transactions, wallet))
+    bot = RiskAnalyzerBot.__new__(RiskAnalyzerBot)  # без токена и сети: отчёт не использует состояние бота
+    recent = TxBatch()
+    recent.extend(TxBatch.from_rawaddr(data), 10)
+    analysis = {'chain': 'BTC', 'balance': parse_balance(wallet, data), 'transactions': recent,
+                'origin_analysis': origin, 'total_risk': calculate_total_risk(parse_balance(wallet, data), origin),
+                'risk_factors': ['Средства из неизвестных источников']}
+    return {'generate_risk_report': lambda: bot.generate_risk_report(wallet, analysis)}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def run(args) -> Dict:
+    import numpy
+    import pandas
+
+    results: List[Dict] = []
+    selected = set(args.only.split(',')) if args.only else None
+
+    def record(group: Dict[str, Callable], size: int):
+        for name, fn in group.items():
+            if selected and name not in selected:
+                continue
+            entry = {'name': name, 'size': size, **measure(fn, args.repeat)}
+            entry['per_item_ns'] = entry['best_s'] / size * 1e9
+            results.append(entry)
+            print(f"{name:28s} {size:>11,d}  {entry['best_s'] * 1e3:10.3f} ms  "
+                  f"{entry['per_item_ns']:9.1f} ns/item", file=sys.stderr)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            record(table_benchmarks(size, args, workdir), size)
+            if size <= args.btc_max:
+                record(btc_benchmarks(size, args), size)
+    try:
+        record(report_benchmarks(args), 1)
+    except ImportError as e:  # main_bot требует aiogram
+        print(f"generate_risk_report skipped: {e}", file=sys.stderr)
+
+    return {
+        'meta': {'commit': git_commit(), 'python': platform.python_version(), 'platform': platform.platform(),
+                 'numpy': numpy.__version__, 'pandas': pandas.__version__, 'seed': args.seed,
+                 'repeat': args.repeat, 'counterparties': args.counterparties, 'burstiness': args.burstiness},
+        'results': results,
+    }
+
+
+def compare(old_path: str, new_path: str, threshold: float) -> int:
+    with open(old_path) as f:
+        old = {(r['name'], r['size']): r for r in json.load(f)['results']}
+    with open(new_path) as f:
+        new = json.load(f)['results']
+    regressions = 0
+    for r in new:
+        before = old.get((r['name'], r['size']))
+        if before is None:
+            continue
+        ratio = r['best_s'] / before['best_s']
+        mark = 'REGRESSION' if ratio > threshold else ('faster' if ratio < 1 / threshold else '')
+        regressions += ratio > threshold
+        print(f"{r['name']:28s} {r['size']:>11,d}  {before['best_s'] * 1e3:10.3f} -> "
+              f"{r['best_s'] * 1e3:10.3f} ms  x{ratio:5.2f}  {mark}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры горячих путей на синтетических данных")
+    parser.add_argument('--sizes', default='1000,100000',
+                        type=lambda s: [int(float(x)) for x in s.split(',')], help="размеры таблиц, через запятую")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--counterparties', type=int, help="размер пула контрагентов (по умолчанию строк/3)")
+    parser.add_argument('--burstiness', type=float, default=0.1, help="доля транзакций в пределах минуты")
+    parser.add_argument('--btc-max', type=int, default=100_000,
+                        help="максимальный размер для BTC бенчмарков (данные строятся в памяти)")
+    parser.add_argument('--only', help="имена бенчмарков через запятую")
+    parser.add_argument('--out', help="файл для JSON (по умолчанию stdout)")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="сравнить два результата")
+    parser.add_argument('--threshold', type=float, default=1.1, help="порог замедления для --compare")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(compare(*args.compare, args.threshold))
+    result = json.dumps(run(args), indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(result)
+    else:
+        print(result)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,36 +1,65 @@
-import requests
 import json
 from typing import List, Dict
 
+import metrics
+from tx_batch import SATOSHI, TxBatch
+
+
+def parse_balance(address: str, address_data: Dict) -> Dict:
+    """Ответ /balance по одному адресу -> результат check_address_balance"""
+    return {
+        'success': True,
+        'address': address,
+        'balance_btc': address_data['final_balance'] / SATOSHI,
+        'balance_satoshi': address_data['final_balance'],
+        'total_received': address_data['total_received'] / SATOSHI,
+        'total_sent': address_data['total_sent'] / SATOSHI,
+        'transaction_count': address_data['n_tx'],
+        'unconfirmed_balance': address_data.get('unconfirmed_balance', 0) / SATOSHI
+    }
+
+
+def parse_transactions(data: Dict) -> List[Dict]:
+    """Ответ /rawaddr -> список транзакций get_address_transactions (словари — для внешних потребителей)"""
+    return TxBatch.from_rawaddr(data).to_dicts()
+
+
 class BitcoinAddressChecker:
-    """Проверка баланса и транзакций Bitcoin адресов[citation:2]"""
+    """Проверка баланса и транзакций Bitcoin адресов[citation:2]
+
+    index — локальный chain_index.ChainIndex: адреса с полной историей в
+    индексе отвечаются из него без запросов к API.
+    """
     
-    def __init__(self):
+    def __init__(self, index=None):
         self.api_url = "https://blockchain.info"
-        self.satoshi = 1e8  # 1 BTC в сатоши
+        self.satoshi = SATOSHI
+        self.index = index
+    
+    def _get_json(self, endpoint: str, url: str, timeout: float) -> Dict:
+        import requests  # только для синхронного клиента: боту (async) не нужен
+        
+        with metrics.upstream(endpoint):
+            try:
+                return requests.get(url, timeout=timeout).json()
+            except Exception as e:
+                metrics.upstream_error(endpoint, e)
+                raise
     
     def check_address_balance(self, address: str) -> Dict:
         """Проверка баланса одного адреса"""
         try:
+            if self.index is not None:
+                local = self.index.balance(address)
+                if local is not None:
+                    return parse_balance(address, local)
+            
             # Используем API blockchain.info[citation:2]
             url = f"{self.api_url}/balance?active={address}"
-            response = requests.get(url, timeout=10)
-            data = response.json()
+            data = self._get_json('balance', url, timeout=10)
             
             if address in data:
-                address_data = data[address]
-                balance_btc = address_data['final_balance'] / self.satoshi
-                
-                return {
-                    'success': True,
-                    'address': address,
-                    'balance_btc': balance_btc,
-                    'balance_satoshi': address_data['final_balance'],
-                    'total_received': address_data['total_received'] / self.satoshi,
-                    'total_sent': address_data['total_sent'] / self.satoshi,
-                    'transaction_count': address_data['n_tx'],
-                    'unconfirmed_balance': address_data['unconfirmed_balance'] / self.satoshi
-                }
+                return parse_balance(address, data[address])
             else:
                 return {'success': False, 'error': 'Address not found'}
                 
@@ -40,39 +69,12 @@ class BitcoinAddressChecker:
     def get_address_transactions(self, address: str, limit: int = 50) -> List[Dict]:
         """Получение истории транзакций"""
         try:
-            url = f"{self.api_url}/rawaddr/{address}?limit={limit}"
-            response = requests.get(url, timeout=10)
-            data = response.json()
-            
-            transactions = []
-            for tx in data.get('txs', []):
-                transaction = {
-                    'hash': tx['hash'],
-                    'time': datetime.fromtimestamp(tx['time']),
-                    'confirmations': tx.get('block_height', 0),
-                    'inputs': [],
-                    'outputs': []
-                }
-                
-                # Анализ входов
-                for inp in tx.get('inputs', []):
-                    if 'prev_out' in inp:
-                        transaction['inputs'].append({
-                            'address': inp['prev_out'].get('addr'),
-                            'value': inp['prev_out'].get('value', 0) / self.satoshi
-                        })
-                
-                # Анализ выходов
-                for out in tx.get('out', []):
-                    transaction['outputs'].append({
-                        'address': out.get('addr'),
-                        'value': out.get('value', 0) / self.satoshi,
-                        'spent': out.get('spent', False)
-                    })
-                
-                transactions.append(transaction)
+            data = self.index.rawaddr(address, limit) if self.index is not None else None
+            if data is None:
+                url = f"{self.api_url}/rawaddr/{address}?limit={limit}"
+                data = self._get_json('rawaddr', url, timeout=10)
             
-            return transactions
+            return parse_transactions(data)
             
         except Exception as e:
             return []
@@ -80,12 +82,14 @@ class BitcoinAddressChecker:
     def check_multiple_addresses(self, addresses: List[str]) -> Dict:
         """Проверка нескольких адресов (до 100 за запрос)[citation:2]"""
         try:
-            # Объединяем адреса через | как в blockchain.info API[citation:2]
-            addresses_str = '|'.join(addresses[:100])  # Лимит API
-            
-            url = f"{self.api_url}/balance?active={addresses_str}"
-            response = requests.get(url, timeout=15)
-            data = response.json()
+            data = self.index.balances(addresses[:100]) if self.index is not None else {}
+            missing = [addr for addr in addresses[:100] if addr not in data]
+            if missing:
+                # Объединяем адреса через | как в blockchain.info API[citation:2]
+                addresses_str = '|'.join(missing)  # Лимит API
+                
+                url = f"{self.api_url}/balance?active={addresses_str}"
+                data.update(self._get_json('balance', url, timeout=15))
             
             results = {}
             total_balance = 0
@@ -1,20 +1,26 @@
-import requests
+import asyncio
 import hashlib
 import hmac
 import base64
 from datetime import datetime, timedelta
+from typing import Dict, Iterable
+
+from tx_batch import SATOSHI
 
 class BitcoinPaymentProcessor:
     """Обработчик платежей в Bitcoin через WalletPay API[citation:4]"""
     
-    def __init__(self, api_key: str, store_id: str):
+    def __init__(self, api_key: str, store_id: str,
+                 base_url: str = "https://pay.wallet.tg/wpay/store-api/v1"):
         self.api_key = api_key
         self.store_id = store_id
-        self.base_url = "https://pay.wallet.tg/wpay/store-api/v1"
+        self.base_url = base_url.rstrip('/')
+        self._session = None
         
     def create_payment_link(self, amount_btc: float, description: str, 
                           user_id: int, external_id: str) -> dict:
         """Создание ссылки для оплаты в Bitcoin[citation:4]"""
+        import requests
         
         headers = {
             'Wpay-Store-Api-Key': self.api_key,
@@ -23,7 +29,7 @@ class BitcoinPaymentProcessor:
         }
         
         # Конвертация в сатоши (1 BTC = 100,000,000 сатоши)
-        amount_satoshi = int(amount_btc * 100000000)
+        amount_satoshi = int(amount_btc * SATOSHI)
         
         payload = {
             'amount': {
@@ -62,6 +68,8 @@ class BitcoinPaymentProcessor:
     
     def check_payment_status(self, payment_id: str) -> dict:
         """Проверка статуса платежа"""
+        import requests
+        
         headers = {
             'Wpay-Store-Api-Key': self.api_key,
             'Accept': 'application/json',
@@ -88,21 +96,69 @@ class BitcoinPaymentProcessor:
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def verify_webhook_signature(self, request) -> bool:
-        """Верификация подписи вебхука[citation:4]"""
+    async def check_payment_statuses(self, payment_ids: Iterable[str], concurrency: int = 10) -> Dict[str, dict]:
+        """check_payment_status для пачки заказов, неблокирующе и не больше `concurrency` запросов сразу"""
+        import aiohttp
+        
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        headers = {'Wpay-Store-Api-Key': self.api_key, 'Accept': 'application/json'}
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def check(payment_id: str) -> dict:
+            async with semaphore:
+                try:
+                    async with self._session.get(f"{self.base_url}/order/{payment_id}", headers=headers) as response:
+                        data = await response.json(content_type=None)
+                        if response.status != 200:
+                            return {'success': False, 'error': 'Payment not found'}
+                        return {
+                            'success': True,
+                            'status': data['data']['status'],
+                            'paid_at': data['data'].get('paidAt'),
+                            'amount_paid': data['data'].get('selectedPaymentOption', {}).get('amount', {})
+                        }
+                except Exception as e:
+                    return {'success': False, 'error': str(e) or type(e).__name__}
+        
+        payment_ids = list(payment_ids)
+        results = await asyncio.gather(*(check(payment_id) for payment_id in payment_ids))
+        return dict(zip(payment_ids, results))
+    
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+    
+    def compute_signature(self, method: str, path: str, timestamp: str, body: bytes) -> str:
+        """Подпись WalletPay: base64(HMAC-SHA256(api_key, "метод.путь.timestamp.base64(тело)"))"""
         ENCODING = 'utf-8'
         
         text = '.'.join([
-            request.method,
-            request.path,
-            request.headers.get('WalletPay-Timestamp'),
-            base64.b64encode(request.get_data()).decode(ENCODING),
+            method,
+            path,
+            timestamp or '',
+            base64.b64encode(body).decode(ENCODING),
         ])
         
-        signature = base64.b64encode(hmac.new(
+        return base64.b64encode(hmac.new(
             bytes(self.api_key, ENCODING),
             msg=bytes(text, ENCODING),
             digestmod=hashlib.sha256
-        ).digest())
-        
-        return request.headers.get('Walletpay-Signature') == signature.decode(ENCODING)
\ No newline at end of file
+        ).digest()).decode(ENCODING)
+    
+    def verify_signature(self, method: str, path: str, timestamp: str, body: bytes, signature: str) -> bool:
+        """Проверка подписи сравнением за постоянное время"""
+        if not signature or not timestamp:
+            return False
+        expected = self.compute_signature(method, path, timestamp, body)
+        return hmac.compare_digest(expected.encode(), signature.encode())
+    
+    def verify_webhook_signature(self, request) -> bool:
+        """Верификация подписи вебхука[citation:4]"""
+        return self.verify_signature(
+            request.method,
+            request.path,
+            request.headers.get('WalletPay-Timestamp'),
+            request.get_data(),
+            request.headers.get('Walletpay-Signature'),
+        )
\ No newline at end of file
@@ -0,0 +1,237 @@
+"""HTTP API тарифа Business: пакетный анализ адресов с потоковой выдачей NDJSON.
+
+    POST /v1/analyze
+    X-API-Key: <ключ>
+    {"addresses": ["1A1z...", "bc1q...", ...], "chain": "auto"}   (или текст: адрес в строке)
+
+Ответ — application/x-ndjson, по строке на каждый входной адрес в порядке
+готовности (поле index — позиция во входном списке), последней строкой
+{"summary": {...}}. Невалидные адреса отдаются сразу после пакетной проверки,
+остальные — по мере завершения анализа.
+
+Квота 'api' тарифа Business («1000 запросов в день») считается в адресах:
+запрос списывает по единице на каждый уникальный валидный адрес и получает 429,
+если остатка не хватает на весь список; адреса, которые не удалось
+проанализировать, возвращаются в квоту.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import metrics
+from address_validaitor import AddressValidator
+from job_queue import BULK_TIER, AnalysisQueue, QueueFull, UserLimitExceeded
+from subscriptions import SubscriptionStore
+
+# analyze(chain, address) -> результат WalletAnalyzer.analyze_btc (или {'error': ...})
+Analyze = Callable[[str, str], Awaitable[Dict]]
+
+MAX_ADDRESSES = 10000
+
+
+def summarize(index: int, address: str, chain: str, result: Dict) -> Dict:
+    """Строка ответа: только итог анализа, без транзакций"""
+    if 'error' in result:
+        return {'index': index, 'address': address, 'chain': chain, 'status': 'error', 'error': result['error']}
+    balance = result['balance']
+    return {
+        'index': index,
+        'address': address,
+        'chain': chain,
+        'status': 'ok',
+        'total_risk': result['total_risk'],
+        'balance_btc': balance['balance_btc'],
+        'transaction_count': balance['transaction_count'],
+        'origin': {cat: data['amount_percentage'] for cat, data in result['origin_analysis'].items()},
+        'risk_factors': result['risk_factors'],
+    }
+
+
+class BulkAnalysisAPI:
+    """Пакетный анализ для Business: тысячи адресов в одном запросе.
+
+    - адреса проверяются одним вызовом AddressValidator.validate_addresses,
+      повторы внутри запроса анализируются один раз;
+    - не больше `per_request` адресов запроса в работе одновременно; с `queue`
+      анализы идут через общую с ботом AnalysisQueue (её воркеры — общий лимит
+      запросов к API, тот же адрес из бота и из bulk анализируется один раз)
+      с приоритетом BULK_TIER и от имени владельца ключа, так что действует и
+      его per-user лимит очереди; без неё — под собственным семафором
+      на `concurrency` анализов;
+    - квота 'api' (QUOTAS) списывается по адресу, неудачные адреса возвращаются;
+    - готовые строки пишутся пачками: всё, что накопилось, пока шла запись.
+    """
+
+    def __init__(self, analyze: Analyze, subscriptions: SubscriptionStore, api_keys: Dict[str, int],
+                 concurrency: int = 64, per_request: int = 32, max_addresses: int = MAX_ADDRESSES,
+                 supported_chains: Tuple[str, ...] = ('BTC',), path: str = '/v1/analyze',
+                 queue: Optional[AnalysisQueue] = None, retry_delay: float = 0.05):
+        self.analyze = analyze
+        self.subscriptions = subscriptions
+        self.api_keys = api_keys
+        self.queue = queue
+        self.retry_delay = retry_delay
+        self.concurrency = concurrency
+        self.per_request = per_request
+        self.max_addresses = max_addresses
+        self.supported_chains = supported_chains
+        self.path = path
+        self._semaphore = None
+        self._runner = None
+        self.stats = {'requests': 0, 'addresses': 0, 'analyzed': 0, 'failed': 0, 'rejected': 0}
+
+    def _reject(self, status: int, error: str, **extra):
+        from aiohttp import web
+
+        self.stats['rejected'] += 1
+        return web.json_response({'error': error, **extra}, status=status)
+
+    @staticmethod
+    async def _read_addresses(request) -> Tuple[List[str], str]:
+        if request.content_type == 'application/json':
+            payload = await request.json()
+            if isinstance(payload, list):
+                return payload, 'auto'
+            return payload.get('addresses') or [], payload.get('chain', 'auto')
+        text = await request.text()
+        return [line for line in text.splitlines() if line.strip()], request.query.get('chain', 'auto')
+
+    async def handle_analyze(self, request):
+        from aiohttp import web
+
+        user_id = self.api_keys.get(request.headers.get('X-API-Key', ''))
+        if user_id is None:
+            return self._reject(401, 'invalid api key')
+        if self.subscriptions.tier(user_id) != 'business':
+            return self._reject(403, 'business subscription required')
+        try:
+            addresses, chain = await self._read_addresses(request)
+        except ValueError:
+            return self._reject(400, 'bad request body')
+        if not isinstance(addresses, list) or not all(isinstance(a, str) for a in addresses):
+            return self._reject(400, 'addresses must be a list of strings')
+        if len(addresses) > self.max_addresses:
+            return self._reject(413, f'at most {self.max_addresses} addresses per request')
+
+        started = time.perf_counter()
+        validations = AddressValidator.validate_addresses(addresses, chain)
+        lines = []
+        todo: Dict[Tuple[str, str], List[int]] = {}  # (сеть, адрес) -> позиции во входе
+        for index, (address, check) in enumerate(zip(addresses, validations)):
+            address = address.strip()
+            if not check['is_valid']:
+                lines.append({'index': index, 'address': address, 'status': 'invalid'})
+            elif check['chain'] not in self.supported_chains:
+                lines.append({'index': index, 'address': address, 'chain': check['chain'], 'status': 'unsupported'})
+            else:
+                todo.setdefault((check['chain'], address), []).append(index)
+
+        if todo and not self.subscriptions.try_consume(user_id, 'api', cost=len(todo)):
+            return self._reject(429, 'api quota exceeded', required=len(todo),
+                                remaining=self.subscriptions.remaining(user_id, 'api'))
+
+        self.stats['requests'] += 1
+        self.stats['addresses'] += len(addresses)
+        response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+        await response.prepare(request)
+        counts = {'ok': 0, 'error': 0, 'invalid': 0, 'unsupported': 0}
+        for line in lines:
+            counts[line['status']] += 1
+        with metrics.inflight('bulk_api'):
+            done = await self._stream(response, todo, lines, counts, user_id)
+        # адреса, которые не удалось проанализировать (апстрим недоступен, перегрузка), не списываются
+        if len(todo) > done:
+            self.subscriptions.refund(user_id, 'api', cost=len(todo) - done)
+        summary = {'total': len(addresses), **counts, 'seconds': round(time.perf_counter() - started, 3)}
+        try:
+            await response.write(json.dumps({'summary': summary}).encode() + b'\n')
+            await response.write_eof()
+        except ConnectionError:
+            pass
+        return response
+
+    async def _analyze(self, chain: str, address: str, user_id: int) -> Dict:
+        if self.queue is not None:
+            while True:
+                try:
+                    ticket = self.queue.submit((chain, address), lambda: self.analyze(chain, address),
+                                               user_id=user_id, tier=BULK_TIER)
+                    break
+                except UserLimitExceeded:
+                    # слоты владельца заняты (например, его /analyze в боте) — ждём освобождения
+                    await asyncio.sleep(self.retry_delay)
+            return await ticket.result()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            return await self.analyze(chain, address)
+
+    async def _stream(self, response, todo: Dict[Tuple[str, str], List[int]], lines: List[Dict],
+                      counts: Dict[str, int], user_id: int = None) -> int:
+        """Анализ пулом воркеров с записью строк по готовности; возвращает число успешных адресов"""
+        jobs = deque(todo.items())
+        ready: asyncio.Queue = asyncio.Queue()
+        analyzed = 0
+
+        async def worker():
+            while jobs:
+                (chain, address), indices = jobs.popleft()
+                try:
+                    result = await self._analyze(chain, address, user_id)
+                except QueueFull:
+                    result = {'error': 'overloaded'}
+                except Exception as e:
+                    logging.warning(f"Bulk analysis failed for {address}: {e}")
+                    result = {'error': 'analysis failed'}
+                ready.put_nowait((chain, address, indices, result))
+
+        n_workers = min(self.per_request, len(jobs))
+        if self.queue is not None:
+            n_workers = min(n_workers, self.queue.user_limit(BULK_TIER))
+        workers = [asyncio.ensure_future(worker()) for _ in range(n_workers)]
+        try:
+            batch = lines
+            remaining = len(todo)
+            while True:
+                if batch:
+                    await response.write(''.join(json.dumps(line, ensure_ascii=False) + '\n'
+                                                 for line in batch).encode())
+                if not remaining:
+                    break
+                batch = []
+                items = [await ready.get()]
+                while not ready.empty():
+                    items.append(ready.get_nowait())
+                for chain, address, indices, result in items:
+                    remaining -= 1
+                    status = 'error' if 'error' in result else 'ok'
+                    if status == 'ok':
+                        analyzed += 1
+                    self.stats['analyzed' if status == 'ok' else 'failed'] += 1
+                    metrics.count(metrics.ANALYZE_TOTAL, chain, f'bulk_{status}')
+                    counts[status] += len(indices)
+                    batch.extend(summarize(index, address, chain, result) for index in indices)
+        except ConnectionError:
+            logging.info("Bulk API client disconnected")
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        return analyzed
+
+    async def start(self, port: int, host: str = '0.0.0.0'):
+        from aiohttp import web
+
+        app = web.Application(client_max_size=self.max_addresses * 128)
+        app.router.add_post(self.path, self.handle_analyze)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,227 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from tx_batch import TxBatch
+
+_MISSING = object()
+
+
+def _json_default(value):
+    # страницы истории (tx_cache) и последние транзакции отчёта — TxBatch
+    if isinstance(value, TxBatch):
+        return {'__tx_batch__': value.to_state()}
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _json_object(obj: Dict):
+    if len(obj) == 1 and '__tx_batch__' in obj:
+        return TxBatch.from_state(obj['__tx_batch__'])
+    return obj
+
+
+def dumps(value: Any) -> str:
+    return json.dumps(value, default=_json_default, ensure_ascii=False)
+
+
+def loads(text: str) -> Any:
+    """Обратное к dumps; кортежи возвращаются списками"""
+    return json.loads(text, object_hook=_json_object)
+
+
+class SqliteCacheBackend:
+    """Постоянное хранилище кэша в sqlite (переживает перезапуск бота).
+
+    Несколько кэшей делят один файл, каждый в своём namespace. Значения
+    хранятся в JSON (TxBatch — колонками). Запись отложенная, как в
+    SubscriptionStore: set/delete меняют только словарь `_pending`, раз
+    в `flush_interval` секунд он пишется одной транзакцией в отдельном
+    потоке; get сначала смотрит в `_pending`. Файл открывается при первом
+    чтении или записи, а не при создании (старт бота его не ждёт).
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        # (namespace, key) -> (expires_at, значение) или None — удалить
+        self._pending: Dict[Tuple[str, str], Optional[tuple]] = {}
+        self._task = None
+        self._writing = None
+        self.db = None
+        self._writer = None
+
+    def _open(self):
+        # Чтение — в event loop, запись — в потоке своим соединением (WAL: чтение не ждёт записи)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                namespace TEXT NOT NULL, key TEXT NOT NULL,
+                expires_at REAL NOT NULL, value TEXT NOT NULL,
+                PRIMARY KEY (namespace, key)) WITHOUT ROWID
+        """)
+        self.db.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        self.db.commit()
+        self._writer = sqlite3.connect(self.path, check_same_thread=False)
+
+    def get(self, namespace: str, key: str, now: float):
+        if (namespace, key) in self._pending:
+            entry = self._pending[(namespace, key)]
+            if entry is None or entry[0] <= now:
+                return _MISSING, 0
+            return entry[1], entry[0]
+        if self.db is None:
+            self._open()
+        row = self.db.execute("SELECT expires_at, value FROM cache WHERE namespace=? AND key=?",
+                              (namespace, key)).fetchone()
+        if row is None or row[0] <= now:
+            return _MISSING, 0
+        try:
+            return loads(row[1]), row[0]
+        except ValueError:
+            # запись старого формата (pickle) или битая — считается промахом
+            return _MISSING, 0
+
+    def set(self, namespace: str, key: str, value: Any, expires_at: float):
+        self._pending[(namespace, key)] = (expires_at, value)
+
+    def delete(self, namespace: str, key: str):
+        self._pending[(namespace, key)] = None
+
+    def _take_pending(self) -> Dict:
+        pending, self._pending = self._pending, {}
+        return pending
+
+    def _write(self, pending: Dict):
+        rows, deleted = [], []
+        for (namespace, key), entry in pending.items():
+            if entry is None:
+                deleted.append((namespace, key))
+                continue
+            try:
+                rows.append((namespace, key, entry[0], dumps(entry[1])))
+            except (TypeError, ValueError) as e:
+                logging.warning(f"Cache value {namespace}:{key} not stored: {e}")
+                deleted.append((namespace, key))
+        with self._writer:
+            self._writer.executemany("DELETE FROM cache WHERE namespace=? AND key=?", deleted)
+            self._writer.executemany("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)", rows)
+
+    def flush(self) -> int:
+        """Записать изменения синхронно; возвращает число записей"""
+        if not self._pending:
+            return 0
+        if self.db is None:
+            self._open()
+        pending = self._take_pending()
+        self._write(pending)
+        return len(pending)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._pending:
+                if self.db is None:
+                    self._open()
+                pending = self._take_pending()
+                self._writing = asyncio.ensure_future(asyncio.to_thread(self._write, pending))
+                try:
+                    # shield: остановка цикла не должна бросать запись на середине
+                    await asyncio.shield(self._writing)
+                except Exception as e:
+                    logging.error(f"Cache flush failed: {e}")
+                    # более новые set/delete за время записи не перетираются
+                    self._pending = {**pending, **self._pending}
+
+    def start(self):
+        """Периодическая запись в фоне (нужен запущенный event loop)"""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._flush_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._writing is not None:
+            await asyncio.gather(self._writing, return_exceptions=True)
+        self.flush()
+        if self.db is not None:
+            self._writer.close()
+            self.db.close()
+            self.db = self._writer = None
+
+
+class TTLCache:
+    """LRU-кэш с TTL на каждую запись и счётчиками попаданий/промахов/вытеснений.
+
+    В памяти хранится не больше `maxsize` записей; при заданном `backend`
+    записи дублируются в sqlite, и промах в памяти проверяется там.
+    """
+
+    def __init__(self, name: str, maxsize: int = 10000, ttl: float = 300,
+                 backend: Optional[SqliteCacheBackend] = None,
+                 clock: Callable[[], float] = time.time):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        self.clock = clock
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0}
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        key = str(key)
+        now = self.clock()
+        entry = self._data.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                self._data.move_to_end(key)
+                self.stats['hits'] += 1
+                return value
+            del self._data[key]
+            self.stats['expired'] += 1
+        if self.backend is not None:
+            value, expires_at = self.backend.get(self.name, key, now)
+            if value is not _MISSING:
+                self._store(key, value, expires_at)
+                self.stats['hits'] += 1
+                return value
+        self.stats['misses'] += 1
+        return default
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        key = str(key)
+        expires_at = self.clock() + (self.ttl if ttl is None else ttl)
+        self._store(key, value, expires_at)
+        if self.backend is not None:
+            self.backend.set(self.name, key, value, expires_at)
+
+    def _store(self, key: str, value, expires_at: float):
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def delete(self, key):
+        key = str(key)
+        self._data.pop(key, None)
+        if self.backend is not None:
+            self.backend.delete(self.name, key)
+
+    def hit_rate(self) -> float:
+        total = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / total if total else 0.0
+
+    def info(self) -> Dict:
+        return {'name': self.name, 'size': len(self._data), 'maxsize': self.maxsize,
+                'hit_rate': round(self.hit_rate(), 4), **self.stats}
@@ -0,0 +1,320 @@
+"""Локальный индекс адрес -> транзакции в sqlite: ответы /balance и /rawaddr без blockchain.info.
+
+Источник — файлы с транзакциями в формате blockchain.info (суммы в сатоши,
+inputs[].prev_out, out[]):
+    *.json            — ответ /rawaddr ({"txs": [...]}), /rawblock ({"tx": [...]}),
+                        одна транзакция или список любых из них
+    *.ndjson, *.jsonl — то же, по объекту на строку (дамп блоков)
+
+Таблицы:
+    txs(id, hash, height, body)                 — транзакция как компактный JSON
+    postings(address, time, tx_id, result)      — адрес -> транзакция и изменение баланса,
+                                                  ключ (address, time, tx_id): страница
+                                                  истории — один проход по b-дереву
+    balances(address, n_tx, total_received, total_sent)
+    blocks(height, hash, time), complete(address, n_tx, updated_at), meta(key, value)
+                                                — что из этого — полная история (ниже)
+
+Транзакции с уже известным hash пропускаются, так что повторная загрузка
+файла, пересекающиеся ответы rawaddr и дозапись новых блоков в тот же
+индекс ничего не удваивают. Журнал WAL: бот читает индекс, пока отдельный
+процесс дописывает блоки.
+
+Запись в balances ещё не значит, что история адреса полная: ответ rawaddr
+одного адреса добавляет и его контрагентов, по одной-две транзакции.
+Поэтому balances()/rawaddr() отвечают только за адреса с полным покрытием:
+    - блоки загружены подряд с высоты 0 (tip в meta) — тогда покрыты все адреса,
+      в том числе без транзакций; при max_age блок tip должен быть не старше
+      max_age секунд, иначе индекс отстал от сети;
+    - или адрес загружен полным ответом rawaddr (len(txs) == n_tx), в индексе
+      не меньше его транзакций, и загружен не раньше чем max_age секунд назад.
+Остальные адреса вызывающий запрашивает у API.
+
+Сборка:
+    python chain_index.py chain.db blocks.ndjson rawaddr_*.json
+    python chain_index.py chain.db --synthetic 2000 --txs-per-block 50
+"""
+import argparse
+import json
+import sqlite3
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS txs (
+        id INTEGER PRIMARY KEY,
+        hash TEXT NOT NULL UNIQUE,
+        height INTEGER NOT NULL,
+        body TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS postings (
+        address TEXT NOT NULL,
+        time INTEGER NOT NULL,
+        tx_id INTEGER NOT NULL,
+        result INTEGER NOT NULL,
+        PRIMARY KEY (address, time, tx_id)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS balances (
+        address TEXT PRIMARY KEY,
+        n_tx INTEGER NOT NULL,
+        total_received INTEGER NOT NULL,
+        total_sent INTEGER NOT NULL
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS blocks (
+        height INTEGER PRIMARY KEY,
+        hash TEXT NOT NULL,
+        time INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS complete (
+        address TEXT PRIMARY KEY,
+        n_tx INTEGER NOT NULL,
+        updated_at REAL NOT NULL
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    );
+"""
+
+# Поля ответа rawaddr, которые относятся к адресу, а не к транзакции
+_ADDRESS_FIELDS = ('result', 'balance')
+# Лимит параметров в одном IN (...) для старых сборок sqlite
+_IN_CHUNK = 500
+_compact_json = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False).encode
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[List]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Coverage:
+    """Что из прочитанного — полная история: блоки и полные ответы rawaddr"""
+
+    def __init__(self):
+        self.blocks: List[tuple] = []     # (height, hash, time)
+        self.addresses: List[tuple] = []  # (address, n_tx)
+
+
+def iter_txs(obj, coverage: Optional[Coverage] = None) -> Iterator[Dict]:
+    """Транзакции из блока, ответа rawaddr, одной транзакции или списка таких объектов"""
+    if isinstance(obj, list):
+        for item in obj:
+            yield from iter_txs(item, coverage)
+        return
+    txs = obj.get('txs', obj.get('tx'))
+    if txs is None:
+        yield obj
+        return
+    for tx in txs:
+        if 'height' in obj:  # /rawblock: высота и время блока у транзакций могут отсутствовать
+            tx.setdefault('block_height', obj['height'])
+            tx.setdefault('time', obj.get('time', 0))
+        yield tx
+    if coverage is not None:
+        if 'height' in obj and 'tx' in obj:
+            coverage.blocks.append((obj['height'], obj.get('hash', ''), obj.get('time', 0)))
+        elif 'address' in obj and len(txs) >= obj.get('n_tx', len(txs) + 1):
+            coverage.addresses.append((obj['address'], obj['n_tx']))
+
+
+def iter_file_objects(path: str) -> Iterator:
+    with open(path) as f:
+        if path.endswith(('.ndjson', '.jsonl')):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield json.load(f)
+
+
+class ChainIndex:
+    """Адрес -> транзакции и балансы в sqlite; ответы в форматах /balance и /rawaddr"""
+
+    def __init__(self, path: str, batch_size: int = 10000, max_age: Optional[float] = None,
+                 clock: Callable[[], float] = time.time):
+        self.path = path
+        self.batch_size = batch_size
+        self.max_age = max_age
+        self.clock = clock
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def __len__(self):
+        return self.db.execute("SELECT count(*) FROM txs").fetchone()[0]
+
+    def __contains__(self, address: str) -> bool:
+        return self.db.execute("SELECT 1 FROM balances WHERE address = ?", (address,)).fetchone() is not None
+
+    def height(self) -> int:
+        """Высота, до которой блоки загружены подряд с 0 (-1 — таких блоков нет)"""
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'tip'").fetchone()
+        return -1 if row is None else row[0]
+
+    def ingest(self, txs: Iterable[Dict]) -> int:
+        """Добавить транзакции пачками по batch_size; известные hash пропускаются. Возвращает число новых.
+
+        Покрытие не меняется: для блоков и ответов rawaddr — ingest_objects.
+        """
+        return sum(self._ingest_batch(batch) for batch in _chunks(txs, self.batch_size))
+
+    def ingest_objects(self, objects: Iterable) -> int:
+        """Блоки, ответы rawaddr и транзакции; после загрузки отмечается полная история"""
+        coverage = Coverage()
+        added = self.ingest(tx for obj in objects for tx in iter_txs(obj, coverage))
+        self._mark_complete(coverage)
+        return added
+
+    def ingest_file(self, path: str) -> int:
+        return self.ingest_objects(iter_file_objects(path))
+
+    def _mark_complete(self, coverage: Coverage):
+        # отмечается только после записи всех транзакций: оборванная загрузка не даёт покрытия
+        with self.db:
+            self.db.executemany("INSERT OR IGNORE INTO blocks VALUES (?, ?, ?)", coverage.blocks)
+            now = self.clock()
+            self.db.executemany("INSERT OR REPLACE INTO complete VALUES (?, ?, ?)",
+                                [(address, n_tx, now) for address, n_tx in coverage.addresses])
+            tip = self.height()
+            while self.db.execute("SELECT 1 FROM blocks WHERE height = ?", (tip + 1,)).fetchone():
+                tip += 1
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('tip', ?)", (tip,))
+
+    def chain_covered(self) -> bool:
+        """Блоки загружены подряд с 0 и (при max_age) последний не старше max_age"""
+        row = self.db.execute("""
+            SELECT b.time FROM meta m JOIN blocks b ON b.height = m.value WHERE m.key = 'tip'
+        """).fetchone()
+        return row is not None and (self.max_age is None or row[0] >= self.clock() - self.max_age)
+
+    def _ingest_batch(self, txs: List[Dict]) -> int:
+        fresh = {}
+        for tx in txs:
+            fresh.setdefault(tx['hash'], tx)
+        hashes = list(fresh)
+        for part in _chunks(hashes, _IN_CHUNK):
+            for (known,) in self.db.execute(
+                    f"SELECT hash FROM txs WHERE hash IN ({','.join('?' * len(part))})", part):
+                del fresh[known]
+        if not fresh:
+            return 0
+
+        with self.db:
+            # id назначаются здесь, внутри транзакции записи: postings ссылаются на них
+            next_id = self.db.execute("SELECT coalesce(max(id), 0) + 1 FROM txs").fetchone()[0]
+            tx_rows, postings, totals = [], [], {}
+            for tx_id, (tx_hash, tx) in enumerate(fresh.items(), next_id):
+                tx_time = int(tx.get('time') or 0)
+                body = {key: value for key, value in tx.items() if key not in _ADDRESS_FIELDS}
+                tx_rows.append((tx_id, tx_hash, int(tx.get('block_height') or 0),
+                                _compact_json(body)))
+                flows = {}  # адрес -> [получено, отправлено]
+                for inp in tx.get('inputs', ()):
+                    prev = inp.get('prev_out')
+                    if prev and prev.get('addr'):
+                        flows.setdefault(prev['addr'], [0, 0])[1] += prev.get('value', 0)
+                for out in tx.get('out', ()):
+                    if out.get('addr'):
+                        flows.setdefault(out['addr'], [0, 0])[0] += out.get('value', 0)
+                for address, (received, sent) in flows.items():
+                    postings.append((address, tx_time, tx_id, received - sent))
+                    total = totals.get(address)
+                    if total is None:
+                        total = totals[address] = [address, 0, 0, 0]
+                    total[1] += 1
+                    total[2] += received
+                    total[3] += sent
+            self.db.executemany("INSERT INTO txs VALUES (?, ?, ?, ?)", tx_rows)
+            postings.sort()  # вставка в порядке ключа: b-дерево postings дописывается, а не перестраивается
+            self.db.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)", postings)
+            self.db.executemany("""
+                INSERT INTO balances VALUES (?, ?, ?, ?)
+                ON CONFLICT(address) DO UPDATE SET
+                    n_tx = n_tx + excluded.n_tx,
+                    total_received = total_received + excluded.total_received,
+                    total_sent = total_sent + excluded.total_sent
+            """, list(totals.values()))
+        return len(tx_rows)
+
+    def balances(self, addresses: Iterable[str]) -> Dict[str, Dict]:
+        """Ответ /balance?active=a|b|...: только адреса с полной историей в индексе"""
+        addresses = list(dict.fromkeys(addresses))
+        chain = self.chain_covered()
+        fresh_after = self.clock() - self.max_age if self.max_age is not None else float('-inf')
+        data = {}
+        for part in _chunks(addresses, _IN_CHUNK):
+            for address, n_tx, received, sent, complete_n_tx, updated_at in self.db.execute(f"""
+                    SELECT b.*, c.n_tx, c.updated_at FROM balances b LEFT JOIN complete c USING (address)
+                    WHERE b.address IN ({','.join('?' * len(part))})""", part):
+                if chain or (complete_n_tx is not None and n_tx >= complete_n_tx and updated_at >= fresh_after):
+                    data[address] = {'final_balance': received - sent, 'n_tx': n_tx,
+                                     'total_received': received, 'total_sent': sent}
+        if chain:
+            # вся цепочка в индексе: адрес без записей — адрес без транзакций
+            for address in addresses:
+                data.setdefault(address, {'final_balance': 0, 'n_tx': 0, 'total_received': 0, 'total_sent': 0})
+        return data
+
+    def balance(self, address: str) -> Optional[Dict]:
+        return self.balances([address]).get(address)
+
+    def rawaddr(self, address: str, limit: int = 50, offset: int = 0) -> Optional[Dict]:
+        """Ответ /rawaddr/{address}: страница истории от новых к старым; None — истории адреса в индексе нет"""
+        info = self.balance(address)
+        if info is None:
+            return None
+        txs = []
+        for result, body in self.db.execute("""
+                SELECT p.result, t.body FROM postings p JOIN txs t ON t.id = p.tx_id
+                WHERE p.address = ? ORDER BY p.time DESC, p.tx_id DESC LIMIT ? OFFSET ?
+        """, (address, limit, offset)):
+            tx = json.loads(body)
+            tx['result'] = result
+            txs.append(tx)
+        return {'address': address, **info, 'txs': txs}
+
+    def close(self):
+        self.db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Загрузка транзакций в локальный индекс адрес -> транзакции")
+    parser.add_argument('db')
+    parser.add_argument('files', nargs='*', help="JSON (rawaddr, rawblock, список) или NDJSON")
+    parser.add_argument('--synthetic', type=int, metavar='BLOCKS',
+                        help="дописать синтетическую цепочку (synthetic.synthetic_chain) после последнего блока")
+    parser.add_argument('--txs-per-block', type=int, default=50)
+    parser.add_argument('--addresses', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if not args.files and not args.synthetic:
+        parser.error("nothing to ingest: pass files or --synthetic")
+
+    index = ChainIndex(args.db)
+    started = time.perf_counter()
+    added = 0
+    for path in args.files:
+        added += index.ingest_file(path)
+    if args.synthetic:
+        from synthetic import synthetic_chain
+
+        # блоки после последнего загруженного (монеты тратятся только в пределах этого запуска)
+        blocks = synthetic_chain(args.synthetic, txs_per_block=args.txs_per_block, n_addresses=args.addresses,
+                                 seed=args.seed, start_height=index.height() + 1)
+        added += index.ingest_objects(blocks)
+    elapsed = time.perf_counter() - started
+    print(f"{args.db}: +{added} txs in {elapsed:.1f} s ({added / max(elapsed, 1e-9):.0f} tx/s), "
+          f"{len(index)} total, height {index.height()}")
+    index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""Локальная имитация blockchain.info (/balance, /rawaddr) и замер пропускной способности bulk API.
+
+    python fake_blockchain.py --addresses 2000 --n-tx 120 --latency 0.02
+
+Поднимает заглушку API, BulkAnalysisAPI поверх WalletAnalyzer и отправляет
+один запрос со всеми адресами; печатает время до первой строки, адресов в
+секунду и число обращений к заглушке. История адреса детерминирована
+(synthetic_rawaddr с seed от адреса), задержка ответа задаётся --latency.
+"""
+import argparse
+import asyncio
+import json
+import time
+import zlib
+from functools import lru_cache
+from typing import Dict
+
+from synthetic import synthetic_btc_addresses, synthetic_rawaddr
+
+
+class FakeBlockchainInfo:
+    def __init__(self, n_tx: int = 120, latency: float = 0.0, labeled_share: float = 0.3):
+        self.n_tx = n_tx
+        self.latency = latency
+        self.labeled_share = labeled_share
+        self.calls = {'balance': 0, 'rawaddr': 0, 'addresses': 0}
+        self._runner = None
+        self.api_url = ''
+        self._rawaddr = lru_cache(maxsize=20000)(self._generate)
+
+    def _generate(self, address: str) -> Dict:
+        return synthetic_rawaddr(address, self.n_tx, seed=zlib.crc32(address.encode()),
+                                 labeled_share=self.labeled_share)
+
+    async def _balance(self, request):
+        from aiohttp import web
+
+        self.calls['balance'] += 1
+        await asyncio.sleep(self.latency)
+        addresses = request.query.get('active', '').split('|')
+        self.calls['addresses'] += len(addresses)
+        data = {}
+        for address in addresses:
+            raw = self._rawaddr(address)
+            data[address] = {key: raw[key] for key in ('final_balance', 'n_tx', 'total_received', 'total_sent')}
+        return web.json_response(data)
+
+    async def _rawaddr_page(self, request):
+        from aiohttp import web
+
+        self.calls['rawaddr'] += 1
+        await asyncio.sleep(self.latency)
+        raw = self._rawaddr(request.match_info['address'])
+        offset = int(request.query.get('offset', 0))
+        limit = int(request.query.get('limit', 50))
+        return web.json_response({**raw, 'txs': raw['txs'][offset:offset + limit]})
+
+    async def start(self, port: int, host: str = '127.0.0.1'):
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get('/balance', self._balance)
+        app.router.add_get('/rawaddr/{address}', self._rawaddr_page)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self.api_url = f"http://{host}:{port}"
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def bench_bulk(args) -> Dict:
+    """Один bulk-запрос на args.addresses адресов через заглушку API"""
+    import aiohttp
+
+    from async_bitcoin_checker import AsyncBitcoinAddressChecker
+    from balance_batcher import BalanceBatcher
+    from bulk_api import BulkAnalysisAPI
+    from funds_origin import FundsOriginAnalyzer
+    from job_queue import AnalysisQueue
+    from subscriptions import SubscriptionStore
+    from wallet_analysis import WalletAnalyzer
+
+    fake = FakeBlockchainInfo(n_tx=args.n_tx, latency=args.latency)
+    await fake.start(args.stub_port)
+    checker = AsyncBitcoinAddressChecker(api_url=fake.api_url, pool_size=args.concurrency * 2)
+    batcher = BalanceBatcher(checker)
+    analyzer = WalletAnalyzer(checker, FundsOriginAnalyzer(), get_balance=batcher.check_address_balance,
+                              max_history=args.n_tx)
+    subscriptions = SubscriptionStore()
+    subscriptions.set_tier(1, 'business')
+    # как в боте: анализы через общую очередь, её воркеры — лимит запросов к заглушке
+    queue = AnalysisQueue(workers=args.concurrency, max_queue=args.concurrency * 4,
+                          per_user_tier={'bulk': args.concurrency})
+    api = BulkAnalysisAPI(lambda chain, address: analyzer.analyze_btc(address), subscriptions, {'bench': 1},
+                          per_request=args.concurrency, queue=queue)
+    await api.start(args.api_port, host='127.0.0.1')
+    addresses = synthetic_btc_addresses(args.addresses, seed=args.seed)
+    try:
+        started = time.perf_counter()
+        first = None
+        lines = 0
+        async with aiohttp.ClientSession() as session:
+            async with session.post(f"http://127.0.0.1:{args.api_port}/v1/analyze",
+                                    json={'addresses': addresses}, headers={'X-API-Key': 'bench'}) as response:
+                response.raise_for_status()
+                async for line in response.content:
+                    if first is None:
+                        first = time.perf_counter() - started
+                    lines += 1
+                    record = json.loads(line)
+        elapsed = time.perf_counter() - started
+    finally:
+        await api.close()
+        await queue.close()
+        await batcher.close()
+        await checker.close()
+        await fake.close()
+    return {'addresses': args.addresses, 'lines': lines, 'summary': record.get('summary'),
+            'first_line_s': round(first, 4), 'seconds': round(elapsed, 3),
+            'addresses_per_s': round(args.addresses / elapsed, 1), 'upstream_calls': fake.calls}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk API throughput against a local blockchain.info stub')
+    parser.add_argument('--addresses', type=int, default=2000)
+    parser.add_argument('--n-tx', type=int, default=120, help='transactions per address')
+    parser.add_argument('--latency', type=float, default=0.02, help='stub response delay, seconds')
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--stub-port', type=int, default=8765)
+    parser.add_argument('--api-port', type=int, default=8766)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(bench_bulk(args)), indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Локальная имитация WalletPay Store API для проверки оплаты без сети.
+
+    fake = FakeWalletPay(api_key='test', webhook_url='http://127.0.0.1:8081/wpay/webhook')
+    await fake.start(8090)
+    processor = BitcoinPaymentProcessor('test', 'store', base_url=fake.base_url)
+    ...
+    await fake.pay(order_id)          # статус PAID + подписанный вебхук ORDER_PAID
+    await fake.pay(order_id, notify=False)  # оплата без вебхука — для reconciler
+
+Вебхук подписывается так же, как настоящий: заголовки WalletPay-Timestamp
+и Walletpay-Signature (см. BitcoinPaymentProcessor.compute_signature).
+"""
+import asyncio
+import itertools
+import json
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from bitcoin_payments import BitcoinPaymentProcessor
+
+STORE_API_PREFIX = '/wpay/store-api/v1'
+
+
+class FakeWalletPay:
+    def __init__(self, api_key: str, webhook_url: Optional[str] = None):
+        self.api_key = api_key
+        self.webhook_url = webhook_url
+        self.signer = BitcoinPaymentProcessor(api_key, store_id='fake')
+        self.orders: Dict[str, Dict] = {}
+        self._ids = itertools.count(1)
+        self._runner = None
+        self.base_url = ''
+        self.webhooks_sent = 0
+
+    def _auth(self, request) -> bool:
+        return request.headers.get('Wpay-Store-Api-Key') == self.api_key
+
+    async def _create_order(self, request):
+        from aiohttp import web
+
+        if not self._auth(request):
+            return web.json_response({'status': 'INVALID_API_KEY', 'message': 'bad api key'}, status=401)
+        payload = await request.json()
+        for order in self.orders.values():
+            if order['externalId'] == payload['externalId']:
+                return web.json_response({'status': 'ALREADY', 'data': order})
+        order_id = str(next(self._ids))
+        order = self.orders[order_id] = {
+            'id': order_id,
+            'status': 'ACTIVE',
+            'number': f"fake{order_id}",
+            'amount': payload['amount'],
+            'externalId': payload['externalId'],
+            'customData': payload.get('customData'),
+            'payLink': f"https://t.me/wallet/start?startapp=wpay_order-orderId__{order_id}",
+            'createdDateTime': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        }
+        return web.json_response({'status': 'SUCCESS', 'data': order})
+
+    async def _get_order(self, request):
+        from aiohttp import web
+
+        if not self._auth(request):
+            return web.json_response({'status': 'INVALID_API_KEY'}, status=401)
+        order = self.orders.get(request.match_info['order_id'])
+        if order is None:
+            return web.json_response({'status': 'NOT_FOUND'}, status=404)
+        return web.json_response({'status': 'SUCCESS', 'data': order})
+
+    async def pay(self, order_id: str, notify: bool = True, repeat: int = 1):
+        """Отметить заказ оплаченным и (если notify) отправить вебхук `repeat` раз"""
+        order = self.orders[str(order_id)]
+        order['status'] = 'PAID'
+        order['paidAt'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        order['selectedPaymentOption'] = {'amount': order['amount']}
+        if notify:
+            event = {'eventDateTime': order['paidAt'], 'eventId': next(self._ids), 'type': 'ORDER_PAID',
+                     'payload': {'id': int(order['id']), 'number': order['number'],
+                                 'externalId': order['externalId'], 'status': 'PAID',
+                                 'orderAmount': order['amount'], 'orderCompletedDateTime': order['paidAt']}}
+            for _ in range(repeat):
+                await self.send_webhook([event])
+
+    async def send_webhook(self, events, signature: Optional[str] = None, timestamp: Optional[str] = None) -> int:
+        """POST подписанных событий на webhook_url; возвращает HTTP статус ответа"""
+        import aiohttp
+
+        body = json.dumps(events).encode()
+        timestamp = timestamp or str(time.time_ns() // 1000)
+        path = urlsplit(self.webhook_url).path
+        headers = {'WalletPay-Timestamp': timestamp, 'Content-Type': 'application/json',
+                   'Walletpay-Signature': signature or self.signer.compute_signature('POST', path, timestamp, body)}
+        async with aiohttp.ClientSession() as session:
+            async with session.post(self.webhook_url, data=body, headers=headers) as response:
+                self.webhooks_sent += 1
+                return response.status
+
+    async def start(self, port: int, host: str = '127.0.0.1'):
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_post(f'{STORE_API_PREFIX}/order', self._create_order)
+        app.router.add_get(f'{STORE_API_PREFIX}/order/{{order_id}}', self._get_order)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self.base_url = f"http://{host}:{port}{STORE_API_PREFIX}"
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def _demo():
+    """Полный цикл: заказ, оплата с вебхуком (и повтором), оплата без вебхука + сверка"""
+    from payment_webhook import PaymentWebhookServer
+
+    activated = []
+
+    async def activate(user_id, tier, order):
+        activated.append((user_id, tier, order['order_id']))
+
+    fake = FakeWalletPay('test-key', webhook_url='http://127.0.0.1:8091/wpay/webhook')
+    await fake.start(8090)
+    processor = BitcoinPaymentProcessor('test-key', 'store', base_url=fake.base_url)
+    server = PaymentWebhookServer(processor, activate, reconcile_after=0)
+    await server.start(8091, host='127.0.0.1')
+    try:
+        for user_id, tier in ((1, 'pro'), (2, 'business')):
+            result = await asyncio.to_thread(processor.create_payment_link, 0.001, 'demo', user_id, f"sub_{user_id}")
+            server.register_order(result['payment_id'], f"sub_{user_id}", user_id, tier)
+        await fake.pay('1', repeat=2)
+        print('forged signature ->', await fake.send_webhook([{'type': 'ORDER_PAID', 'payload': {'id': 2}}],
+                                                            signature='AAAA'))
+        await fake.pay('2', notify=False)
+        await server.drain()
+        print('reconciled:', await server.reconcile())
+        await server.drain()
+        print('activated:', activated)
+        print('stats:', server.stats)
+    finally:
+        await server.close()
+        await fake.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(_demo())
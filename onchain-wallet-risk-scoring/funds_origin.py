@@ -1,3 +1,14 @@
+from typing import Iterable, Optional, Union
+
+import metrics
+from label_db import LabelDatabase
+from label_index import AddressLabelIndex
+from tx_batch import SATOSHI, TxBatch
+
+# Примерно награда за блок (6.25–6.35 BTC), в сатоши
+BLOCK_REWARD_SATOSHI = (625_000_000, 635_000_000)
+
+
 class FundsOriginAnalyzer:
     """Анализ категорий происхождения средств"""
     
@@ -27,30 +38,179 @@ class FundsOriginAnalyzer:
         }
     }
     
+    _default_btc_index = None
+    
+    def __init__(self, btc_index: Optional[AddressLabelIndex] = None,
+                 label_db: Union[LabelDatabase, str, None] = None):
+        # Индекс собирается один раз; свои базы меток передаются через btc_index
+        self.btc_index = btc_index or self.default_btc_index()
+        # Точные метки (миллионы адресов) — из mmap-базы, см. label_db.py
+        self.label_db = LabelDatabase(label_db) if isinstance(label_db, str) else label_db
+    
+    @classmethod
+    def default_btc_index(cls) -> AddressLabelIndex:
+        """Индекс из KNOWN_ADDRESSES (общий для всех экземпляров)"""
+        if cls._default_btc_index is None:
+            known = cls.KNOWN_ADDRESSES['BTC']
+            index = AddressLabelIndex()
+            for prefix in known['exchange_prefixes']:
+                index.add_prefix(prefix, 'exchange')
+            for pool in known['mining_pools']:
+                index.add_substring(pool, 'mining')
+            cls._default_btc_index = index.build()
+        return cls._default_btc_index
+    
     def analyze_btc_origin(self, transactions: list) -> dict:
         """Анализ происхождения BTC средств"""
-        category_stats = {cat: {'count': 0, 'amount': 0} for cat in self.CATEGORIES}
+        category_stats = self.new_category_stats()
+        self.accumulate_btc_origin(category_stats, transactions)
+        return self._calculate_percentages(category_stats)
+    
+    async def analyze_btc_origin_stream(self, transactions, batch_size: int = 500) -> dict:
+        """analyze_btc_origin для async-потока транзакций в постоянной памяти.
         
-        for tx in transactions:
-            category = self._categorize_btc_transaction(tx)
+        Транзакции классифицируются пачками по batch_size и не сохраняются.
+        """
+        category_stats = self.new_category_stats()
+        batch = []
+        async for tx in transactions:
+            batch.append(tx)
+            if len(batch) >= batch_size:
+                self.accumulate_btc_origin(category_stats, batch)
+                batch = []
+        self.accumulate_btc_origin(category_stats, batch)
+        return self._calculate_percentages(category_stats)
+    
+    async def analyze_btc_origin_batches(self, batches, wallet_address: str) -> dict:
+        """analyze_btc_origin по async-потоку TxBatch (страницы истории) без словарей на транзакцию.
+        
+        Суммы копятся в сатоши (int) и переводятся в BTC один раз в конце.
+        """
+        category_stats = self.new_category_stats()
+        async for batch in batches:
+            self.accumulate_btc_batch(category_stats, batch, wallet_address)
+        return self.origin_from_satoshi(category_stats)
+    
+    def origin_from_satoshi(self, category_stats: dict) -> dict:
+        """Результат анализа по счётчикам accumulate_btc_batch (суммы в сатоши)"""
+        return self._calculate_percentages({cat: {'count': stats['count'], 'amount': stats['amount'] / SATOSHI}
+                                            for cat, stats in category_stats.items()})
+    
+    @metrics.timed('origin_analysis')
+    def accumulate_btc_batch(self, category_stats: dict, batch: TxBatch, wallet_address: str):
+        """Поступления из батча в счётчики категорий (суммы в сатоши).
+        
+        Метка ищется один раз на адрес словаря батча, а не на транзакцию.
+        """
+        sources, amounts = batch.incoming(wallet_address)
+        if not sources:
+            return
+        unique = sorted(set(sources))
+        addresses = [batch.addresses[i] if i >= 0 else '' for i in unique]
+        labels = self.btc_index.classify_batch(addresses)
+        if self.label_db is not None:
+            labels = [exact or label for exact, label in zip(self.label_db.get_batch(addresses), labels)]
+        label_of = dict(zip(unique, labels))
+        for source, amount in zip(sources, amounts):
+            category = label_of[source]
+            if not category:
+                # Анализ по сумме (паттерны майнинга)
+                category = 'mining' if BLOCK_REWARD_SATOSHI[0] <= amount <= BLOCK_REWARD_SATOSHI[1] else 'unknown'
+            category_stats[category]['count'] += 1
+            category_stats[category]['amount'] += amount
+    
+    def new_category_stats(self) -> dict:
+        return {cat: {'count': 0, 'amount': 0} for cat in self.CATEGORIES}
+    
+    @metrics.timed('origin_analysis')
+    def accumulate_btc_origin(self, category_stats: dict, transactions: list):
+        """Добавить транзакции в счётчики категорий"""
+        for tx, category in zip(transactions, self.categorize_btc_transactions(transactions)):
             category_stats[category]['count'] += 1
             category_stats[category]['amount'] += tx.get('amount', 0)
+    
+    @staticmethod
+    def btc_origin_records(transactions: Iterable[dict], wallet_address: str) -> list:
+        """Транзакции get_address_transactions -> записи {'address', 'amount'} о поступлениях.
+        
+        Учитываются только входящие транзакции (кошелёк не среди входов);
+        источник — вход с наибольшей суммой, сумма — всё полученное кошельком.
+        """
+        records = []
+        for tx in transactions:
+            inputs = tx.get('inputs', [])
+            if any(inp.get('address') == wallet_address for inp in inputs):
+                continue
+            received = sum(out.get('value', 0) for out in tx.get('outputs', [])
+                           if out.get('address') == wallet_address)
+            if received <= 0:
+                continue
+            source = max(inputs, key=lambda inp: inp.get('value', 0), default={}).get('address')
+            records.append({'address': source or '', 'amount': received, 'hash': tx.get('hash')})
+        return records
+    
+    def lookup_label(self, address: str) -> Optional[str]:
+        """Категория адреса по базе меток и индексу (без анализа суммы)"""
+        if self.label_db is not None:
+            category = self.label_db.get(address)
+            if category is not None:
+                return category
+        return self.btc_index.classify(address)
+    
+    @metrics.timed('origin_analysis_arrays')
+    def analyze_btc_origin_arrays(self, addresses, amounts) -> dict:
+        """То же, что analyze_btc_origin, но по колонкам (адреса, суммы).
+        
+        Метки ищутся один раз на уникальный адрес, диапазон награды за блок
+        и агрегация по категориям считаются масками и bincount numpy.
+        """
+        import numpy as np
+        
+        amounts = np.asarray(amounts)
+        categories = list(self.CATEGORIES)
+        category_ids = {cat: i for i, cat in enumerate(categories)}
+        
+        addresses = np.array([address or '' for address in addresses], dtype=object)
+        unique, inverse = np.unique(addresses, return_inverse=True)
+        unique = unique.tolist()
+        labels = self.btc_index.classify_batch(unique)
+        if self.label_db is not None:
+            labels = [exact or label for exact, label in zip(self.label_db.get_batch(unique), labels)]
+        codes = np.array([category_ids[label] if label else -1 for label in labels], dtype=np.intp)
+        codes = codes[inverse.ravel()] if len(codes) else np.zeros(0, dtype=np.intp)
         
+        # Анализ по сумме (паттерны майнинга) для адресов без метки
+        unlabeled = codes < 0
+        block_reward = (amounts >= 6.25) & (amounts <= 6.35)
+        codes[unlabeled & block_reward] = category_ids['mining']
+        codes[unlabeled & ~block_reward] = category_ids['unknown']
+        
+        counts = np.bincount(codes, minlength=len(categories))
+        if np.issubdtype(amounts.dtype, np.integer):
+            sums = np.zeros(len(categories), dtype=np.int64)
+            np.add.at(sums, codes, amounts)
+        else:
+            sums = np.bincount(codes, weights=amounts, minlength=len(categories))
+        
+        category_stats = {cat: {'count': int(counts[i]), 'amount': sums[i].item() if counts[i] else 0}
+                          for i, cat in enumerate(categories)}
         return self._calculate_percentages(category_stats)
     
+    def categorize_btc_transactions(self, transactions: list) -> list:
+        """Категории для всех транзакций одним проходом по индексу"""
+        addresses = [tx.get('address', '') for tx in transactions]
+        labels = self.btc_index.classify_batch(addresses)
+        if self.label_db is not None:
+            labels = [exact or label for exact, label in zip(self.label_db.get_batch(addresses), labels)]
+        return [label or self._categorize_by_amount(tx) for tx, label in zip(transactions, labels)]
+    
     def _categorize_btc_transaction(self, tx: dict) -> str:
         """Определение категории для BTC транзакции"""
-        address = tx.get('address', '')
-        
         # Проверка по известным адресам
-        for prefix in self.KNOWN_ADDRESSES['BTC']['exchange_prefixes']:
-            if address.startswith(prefix):
-                return 'exchange'
-        
-        for pool in self.KNOWN_ADDRESSES['BTC']['mining_pools']:
-            if pool in address:
-                return 'mining'
-        
+        return self.lookup_label(tx.get('address', '')) or self._categorize_by_amount(tx)
+    
+    @staticmethod
+    def _categorize_by_amount(tx: dict) -> str:
         # Анализ по сумме (паттерны майнинга)
         if 6.25 <= tx.get('amount', 0) <= 6.35:  # Примерно награда за блок
             return 'mining'
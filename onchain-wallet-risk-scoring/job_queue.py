@@ -0,0 +1,231 @@
+import asyncio
+import heapq
+import itertools
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+# Меньше — раньше; неизвестный тариф считается бесплатным.
+# 'bulk' — адреса из bulk API: после интерактивных запросов любого тарифа
+TIER_PRIORITY = {'business': 0, 'pro': 1, 'free': 2, 'bulk': 3}
+# Тариф задач bulk API (bulk_api.py)
+BULK_TIER = 'bulk'
+
+
+class QueueFull(Exception):
+    """Очередь переполнена: задача отклонена или вытеснена более приоритетной"""
+
+
+class UserLimitExceeded(Exception):
+    """У пользователя уже слишком много задач в работе"""
+
+
+class _Job:
+    __slots__ = ('key', 'factory', 'priority', 'seq', 'future', 'users', 'running')
+
+    def __init__(self, key, factory, priority, seq, future):
+        self.key = key
+        self.factory = factory
+        self.priority = priority
+        self.seq = seq
+        self.future = future
+        self.users: List[Hashable] = []  # кто занял слот per-user лимита
+        self.running = False
+
+
+class Ticket:
+    """Результат submit: position — место в очереди (0 — задача уже выполняется или начнётся сразу)"""
+
+    __slots__ = ('future', 'position', 'merged')
+
+    def __init__(self, future: asyncio.Future, position: int, merged: bool):
+        self.future = future
+        self.position = position
+        self.merged = merged
+
+    async def result(self) -> Any:
+        # shield: отмена одного обработчика не отменяет общую задачу
+        return await asyncio.shield(self.future)
+
+
+class AnalysisQueue:
+    """Очередь анализов с фиксированным пулом воркеров.
+
+    - глобально одновременно выполняется не больше `workers` задач;
+    - у пользователя не больше `per_user` задач в очереди и в работе
+      (для отдельных тарифов — `per_user_tier`, например {'bulk': 16});
+    - порядок — по приоритету тарифа, внутри тарифа — FIFO;
+    - при `max_queue` ожидающих задачах вытесняется самая новая из наименее
+      приоритетных (сначала бесплатные), либо отклоняется сама новая задача;
+    - повторный запрос с тем же ключом (адресом), пока задача не завершена,
+      присоединяется к ней, а задача поднимается до лучшего тарифа из запросов.
+    """
+
+    def __init__(self, workers: int = 8, max_queue: int = 200, per_user: int = 2,
+                 priorities: Optional[Dict[str, int]] = None, per_user_tier: Optional[Dict[str, int]] = None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.per_user = per_user
+        self.per_user_tier = per_user_tier or {}
+        self.priorities = priorities or TIER_PRIORITY
+        self._heap: List[tuple] = []  # (priority, seq, job); устаревшие записи пропускаются
+        self._queued = 0
+        self._jobs: Dict[Hashable, _Job] = {}
+        self._per_user: Dict[Hashable, int] = {}
+        self._seq = itertools.count()
+        self._idle = 0
+        self._waiters: deque = deque()  # futures простаивающих воркеров
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {'submitted': 0, 'merged': 0, 'completed': 0, 'failed': 0,
+                      'shed': 0, 'rejected': 0, 'user_limited': 0}
+
+    def _start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+            self._idle = self.workers
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    @property
+    def running(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.running)
+
+    def submit(self, key: Hashable, factory: Callable[[], Awaitable], user_id: Hashable = None,
+               tier: str = 'free') -> Ticket:
+        """Поставить задачу в очередь; factory() создаёт корутину анализа.
+
+        Бросает UserLimitExceeded или QueueFull сразу, без ожидания.
+        """
+        self._start()
+        priority = self.priorities.get(tier, self.priorities.get('free', max(self.priorities.values())))
+        job = self._jobs.get(key)
+        if job is not None:
+            self.stats['merged'] += 1
+            if not job.running and priority < job.priority:
+                # лучший тариф среди присоединившихся: перекладываем задачу в куче
+                job.priority = priority
+                heapq.heappush(self._heap, (priority, job.seq, job))
+            return Ticket(job.future, self._position(job), merged=True)
+
+        limit = self.user_limit(tier)
+        if user_id is not None and self._per_user.get(user_id, 0) >= limit:
+            self.stats['user_limited'] += 1
+            raise UserLimitExceeded(f"user {user_id} already has {limit} jobs")
+        if self._queued >= self.max_queue:
+            victim = self._worst_queued()
+            # при равном тарифе вытесняется самая новая задача, т.е. сама новая
+            if victim is None or victim.priority <= priority:
+                self.stats['rejected'] += 1
+                raise QueueFull("analysis queue is full")
+            self._shed(victim)
+
+        job = _Job(key, factory, priority, next(self._seq), asyncio.get_running_loop().create_future())
+        if user_id is not None:
+            job.users.append(user_id)
+            self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+        self._jobs[key] = job
+        heapq.heappush(self._heap, (priority, job.seq, job))
+        self._queued += 1
+        self.stats['submitted'] += 1
+        position = self._position(job)
+        self._notify()
+        return Ticket(job.future, position, merged=False)
+
+    def user_limit(self, tier: str) -> int:
+        """Сколько задач тарифа может быть у одного пользователя"""
+        return self.per_user_tier.get(tier, self.per_user)
+
+    def _position(self, job: _Job) -> int:
+        """0 — задача выполняется или начнёт сразу (есть свободный воркер)"""
+        if job.running:
+            return 0
+        ahead = sum(1 for other in self._jobs.values()
+                    if not other.running and (other.priority, other.seq) < (job.priority, job.seq))
+        return 0 if ahead < self._idle else ahead - self._idle + 1
+
+    def _worst_queued(self) -> Optional[_Job]:
+        waiting = [job for job in self._jobs.values() if not job.running]
+        return max(waiting, key=lambda job: (job.priority, job.seq), default=None)
+
+    def _shed(self, job: _Job):
+        self.stats['shed'] += 1
+        self._finish(job)
+        self._queued -= 1
+        job.priority = None  # запись в куче станет устаревшей
+        if not job.future.done():
+            job.future.set_exception(QueueFull("job shed under overload"))
+            job.future.exception()  # не логировать "exception was never retrieved"
+
+    def _finish(self, job: _Job):
+        if self._jobs.get(job.key) is job:
+            del self._jobs[job.key]
+        for user_id in job.users:
+            left = self._per_user.get(user_id, 1) - 1
+            if left:
+                self._per_user[user_id] = left
+            else:
+                self._per_user.pop(user_id, None)
+
+    def _notify(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    def _pop(self) -> Optional[_Job]:
+        while self._heap:
+            priority, _, job = heapq.heappop(self._heap)
+            if job.priority == priority and not job.running and self._jobs.get(job.key) is job:
+                return job
+        return None
+
+    async def _worker(self):
+        while True:
+            job = self._pop()
+            while job is None:
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.append(waiter)
+                await waiter
+                job = self._pop()
+            self._queued -= 1
+            self._idle -= 1
+            job.running = True
+            try:
+                result = await job.factory()
+            except asyncio.CancelledError:
+                job.future.cancel()
+                raise
+            except Exception as e:
+                self.stats['failed'] += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+                    job.future.exception()
+            else:
+                self.stats['completed'] += 1
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                self._finish(job)
+                self._idle += 1
+
+    def info(self) -> Dict:
+        return {'workers': self.workers, 'idle': self._idle, 'queued': self._queued,
+                'running': self.running, **self.stats}
+
+    async def close(self):
+        """Остановить воркеры; ожидающие задачи отменяются"""
+        for job in list(self._jobs.values()):
+            if not job.future.done():
+                job.future.cancel()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._jobs.clear()
+        self._per_user.clear()
+        self._heap.clear()
+        self._queued = 0
+        self._idle = 0
+        self._waiters.clear()
@@ -0,0 +1,164 @@
+"""Компактная база меток адресов в одном бинарном файле.
+
+Формат (little-endian заголовок):
+    magic b'OWLB', version u16, n_categories u16, n_records u64
+    n_categories x 16 байт — имена категорий (ascii, дополнены нулями)
+    n_records x 9 байт — 8 байт blake2b(адрес) big-endian + 1 байт id категории,
+    записи отсортированы по хэшу.
+
+Файл открывается через mmap: старт не зависит от числа меток, а несколько
+процессов бота делят одну копию в page cache.
+
+Сборка:
+    python label_db.py labels.db exchanges.csv mixers.csv --include-known
+CSV: колонки address,category (category — ключ FundsOriginAnalyzer.CATEGORIES).
+"""
+import argparse
+import csv
+import hashlib
+import mmap
+import struct
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MAGIC = b'OWLB'
+VERSION = 1
+HEADER = struct.Struct('<4sHHQ')
+NAME_SIZE = 16
+KEY_SIZE = 8
+RECORD_SIZE = KEY_SIZE + 1
+
+
+def normalize_address(address: str) -> str:
+    """ETH и bech32 адреса регистронезависимы, base58 — нет"""
+    lowered = address.lower()
+    if lowered.startswith(('0x', 'bc1', 'tb1')):
+        return lowered
+    return address
+
+
+def address_key(address: str) -> bytes:
+    return hashlib.blake2b(normalize_address(address).encode(), digest_size=KEY_SIZE).digest()
+
+
+class LabelDatabase:
+    """Поиск категории адреса бинарным поиском по mmap-файлу"""
+
+    def __init__(self, path: str):
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n_categories, self.n_records = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: not a label database (v{VERSION})")
+        names_at = HEADER.size
+        self.categories = [
+            self._mm[names_at + i * NAME_SIZE:names_at + (i + 1) * NAME_SIZE].rstrip(b'\0').decode()
+            for i in range(n_categories)
+        ]
+        self._records_at = names_at + n_categories * NAME_SIZE
+
+    def __len__(self):
+        return self.n_records
+
+    def __contains__(self, address: str) -> bool:
+        return self.get(address) is not None
+
+    def get(self, address: str, default=None) -> Optional[str]:
+        if not address:
+            return default
+        key = address_key(address)
+        mm, base = self._mm, self._records_at
+        lo, hi = 0, self.n_records
+        while lo < hi:
+            mid = (lo + hi) // 2
+            at = base + mid * RECORD_SIZE
+            probe = mm[at:at + KEY_SIZE]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return self.categories[mm[at + KEY_SIZE]]
+        return default
+
+    def get_batch(self, addresses: Iterable[str]) -> List[Optional[str]]:
+        get = self.get
+        return [get(address) for address in addresses]
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+def build(path: str, labels: Iterable[Tuple[str, str]]) -> int:
+    """Записать базу из пар (адрес, категория); при повторах побеждает первая метка"""
+    import numpy as np
+
+    category_ids: Dict[str, int] = {}
+    keys, cats = [], bytearray()
+    for address, category in labels:
+        if not address:
+            continue
+        if category not in category_ids:
+            if len(category_ids) == 256:
+                raise ValueError("more than 256 categories")
+            category_ids[category] = len(category_ids)
+        keys.append(int.from_bytes(address_key(address), 'big'))
+        cats.append(category_ids[category])
+
+    keys = np.array(keys, dtype=np.uint64)
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    first = np.ones(len(sorted_keys), dtype=bool)
+    first[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    order = order[first]
+
+    records = np.empty(len(order), dtype=[('key', '>u8'), ('category', 'u1')])
+    records['key'] = keys[order]
+    records['category'] = np.frombuffer(bytes(cats), dtype=np.uint8)[order] if len(cats) else []
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(category_ids), len(records)))
+        for name in category_ids:
+            f.write(name.encode('ascii')[:NAME_SIZE].ljust(NAME_SIZE, b'\0'))
+        f.write(records.tobytes())
+    return len(records)
+
+
+def read_csv_labels(path: str) -> Iterable[Tuple[str, str]]:
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            yield row['address'].strip(), row['category'].strip()
+
+
+def known_labels() -> Iterable[Tuple[str, str]]:
+    """Точные адреса из FundsOriginAnalyzer.KNOWN_ADDRESSES"""
+    from funds_origin import FundsOriginAnalyzer
+
+    for address in FundsOriginAnalyzer.KNOWN_ADDRESSES['ETH']['exchanges']:
+        yield address, 'exchange'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сборка бинарной базы меток адресов")
+    parser.add_argument('out')
+    parser.add_argument('csv', nargs='*', help="CSV с колонками address,category")
+    parser.add_argument('--include-known', action='store_true',
+                        help="добавить точные адреса из KNOWN_ADDRESSES")
+    args = parser.parse_args()
+
+    from funds_origin import FundsOriginAnalyzer
+
+    def labels():
+        for path in args.csv:
+            for address, category in read_csv_labels(path):
+                if category not in FundsOriginAnalyzer.CATEGORIES:
+                    parser.error(f"{path}: unknown category {category!r} for {address}")
+                yield address, category
+        if args.include_known:
+            yield from known_labels()
+
+    print(f"{args.out}: {build(args.out, labels())} records")
+
+
+if __name__ == '__main__':
+    main()
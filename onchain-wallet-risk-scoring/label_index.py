@@ -0,0 +1,124 @@
+import csv
+from typing import Dict, Iterable, List, Optional
+
+
+class AddressLabelIndex:
+    """Индекс меток адресов: точные совпадения, префиксы и подстроки.
+
+    Стоимость одного поиска не зависит от числа меток:
+    - точные адреса: dict;
+    - префиксы: dict по каждой встречающейся длине префикса (самый длинный выигрывает);
+    - подстроки: автомат Ахо-Корасик (при нескольких совпадениях — правило,
+      добавленное раньше).
+    Порядок проверки: точный адрес, префикс, подстрока.
+    """
+
+    def __init__(self):
+        self.exact: Dict[str, str] = {}
+        self._prefixes: Dict[str, str] = {}
+        self._prefix_lengths: List[int] = []  # по убыванию, заполняется в build()
+        self._patterns: List[tuple] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Optional[tuple]] = [None]  # (номер правила, категория)
+        self._built = True
+
+    def add_exact(self, address: str, category: str):
+        self.exact.setdefault(address, category)
+
+    def add_prefix(self, prefix: str, category: str):
+        if prefix not in self._prefixes:
+            self._prefixes[prefix] = category
+            self._built = False
+
+    def add_substring(self, pattern: str, category: str):
+        self._patterns.append((pattern, category))
+        self._built = False
+
+    def add(self, kind: str, pattern: str, category: str):
+        {'exact': self.add_exact, 'prefix': self.add_prefix,
+         'substring': self.add_substring}[kind](pattern, category)
+
+    def build(self) -> 'AddressLabelIndex':
+        """Подготовка к поиску: длины префиксов и автомат Ахо-Корасик"""
+        self._prefix_lengths = sorted({len(p) for p in self._prefixes}, reverse=True)
+        goto, out = [{}], [None]
+        for rule_id, (pattern, category) in enumerate(self._patterns):
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(None)
+                state = nxt
+            if out[state] is None or rule_id < out[state][0]:
+                out[state] = (rule_id, category)
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0) if state else 0
+                # совпадение по суффиксу тоже считается совпадением
+                inherited = out[fail[nxt]]
+                if inherited is not None and (out[nxt] is None or inherited[0] < out[nxt][0]):
+                    out[nxt] = inherited
+        self._goto, self._fail, self._out = goto, fail, out
+        self._built = True
+        return self
+
+    def _match_substring(self, address: str) -> Optional[str]:
+        goto, fail, out = self._goto, self._fail, self._out
+        state, best = 0, None
+        for ch in address:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            hit = out[state]
+            if hit is not None and (best is None or hit[0] < best[0]):
+                best = hit
+        return best[1] if best else None
+
+    def classify(self, address: str) -> Optional[str]:
+        """Категория адреса или None, если меток нет"""
+        if not self._built:
+            self.build()
+        address = address or ''
+        category = self.exact.get(address)
+        if category is not None:
+            return category
+        prefixes = self._prefixes
+        for length in self._prefix_lengths:
+            category = prefixes.get(address[:length])
+            if category is not None:
+                return category
+        if len(self._goto) > 1:
+            return self._match_substring(address)
+        return None
+
+    def classify_batch(self, addresses: Iterable[str]) -> List[Optional[str]]:
+        """Категории для пачки адресов за один вызов"""
+        if not self._built:
+            self.build()
+        classify = self.classify
+        return [classify(address) for address in addresses]
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple]) -> 'AddressLabelIndex':
+        """Индекс из строк (kind, pattern, category)"""
+        index = cls()
+        for kind, pattern, category in rows:
+            index.add(kind, pattern, category)
+        return index.build()
+
+    @classmethod
+    def load_csv(cls, path: str) -> 'AddressLabelIndex':
+        """Индекс из CSV с колонками kind,pattern,category"""
+        with open(path, newline='') as f:
+            return cls.from_rows((row['kind'], row['pattern'], row['category'])
+                                 for row in csv.DictReader(f))
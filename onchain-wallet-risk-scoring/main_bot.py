@@ -1,29 +1,210 @@
+import time
+_STARTED = time.perf_counter()  # отсчёт времени старта (см. --profile-startup)
+
 from aiogram import Bot, Dispatcher, types
 from aiogram.filters import Command
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+_FRAMEWORK = time.perf_counter()
+import argparse
 import asyncio
 import logging
+import os
+import sys
+from datetime import datetime
+from functools import cached_property
+from typing import TYPE_CHECKING, Optional
+
+# Здесь — только то, что нужно до первого ответа; модули подсистем
+# импортируются в их cached_property (см. LAZY_SUBSYSTEMS)
+from cache import SqliteCacheBackend, TTLCache
+from job_queue import BULK_TIER, AnalysisQueue, QueueFull, UserLimitExceeded
+from tx_batch import SATOSHI
+import metrics
+
+if TYPE_CHECKING:
+    from address_validaitor import AddressValidator
+    from async_bitcoin_checker import AsyncBitcoinAddressChecker
+    from balance_batcher import BalanceBatcher
+    from bitcoin_payments import BitcoinPaymentProcessor
+    from bulk_api import BulkAnalysisAPI
+    from chain_index import ChainIndex
+    from funds_origin import FundsOriginAnalyzer
+    from payment_webhook import PaymentWebhookServer
+    from subscriptions import SubscriptionStore
+    from wallet_analysis import WalletAnalyzer
+    from watchlist import Watchlist
+
+_IMPORTED = time.perf_counter()
+
+# Бюджет времени старта бота до готовности отвечать, мс: собственные импорты
+# и RiskAnalyzerBot(); импорт aiogram (_FRAMEWORK) в --profile-startup — отдельной строкой
+STARTUP_BUDGET_MS = 3000
+
+# Сети с конвейером анализа (WalletAnalyzer); ETH адреса пока только проверяются валидатором
+ANALYZED_CHAINS = ('BTC',)
+
+# Подсистемы, которые создаются при первом обращении
+LAZY_SUBSYSTEMS = ('validator', 'origin_analyzer', 'chain_index', 'btc_checker', 'balance_batcher', 'wallet_analyzer',
+                   'subscriptions', 'payment_processor', 'payment_webhook', 'bulk_api',
+                   'watchlist')
 
 class RiskAnalyzerBot:
     """Главный класс Telegram бота"""
     
-    def __init__(self, token: str):
+    def __init__(self, token: str, cache_path: str = None, labels_path: str = None,
+                 label_db_path: str = None, max_history: int = 5000, metrics_port: int = None,
+                 analysis_workers: int = 8, max_queue: int = 200, per_user_jobs: int = 2,
+                 payment_base_url: str = None, webhook_port: int = None,
+                 subscriptions_path: str = None, api_port: int = None, api_keys: dict = None,
+                 watchlist_path: str = None, watch_budget: float = 5.0, chain_index_path: str = None,
+                 chain_index_max_age: float = 3600, bulk_jobs: int = 16):
         self.bot = Bot(token=token)
         self.dp = Dispatcher()
         
-        # Инициализация модулей
-        self.validator = AddressValidator()
-        self.origin_analyzer = FundsOriginAnalyzer()
-        self.btc_checker = BitcoinAddressChecker()
+        # Тяжёлые подсистемы (индекс меток, HTTP-клиенты, платежи, sqlite) создаются
+        # при первом обращении — см. cached_property ниже; здесь только настройки
+        self.labels_path = labels_path
+        self.label_db_path = label_db_path
+        self.subscriptions_path = subscriptions_path
+        self.chain_index_path = chain_index_path
+        self.chain_index_max_age = chain_index_max_age
+        self.payment_base_url = payment_base_url
+        
+        # Кэши: популярные адреса не запрашиваются и не пересчитываются повторно
+        # (в sqlite — отложенной записью в фоне, см. main)
+        self.cache_backend = SqliteCacheBackend(cache_path) if cache_path else None
+        self.balance_cache = TTLCache('balance', maxsize=50000, ttl=60, backend=self.cache_backend)
+        self.tx_cache = TTLCache('transactions', maxsize=5000, ttl=300, backend=self.cache_backend)
+        self.report_cache = TTLCache('report', maxsize=5000, ttl=300, backend=self.cache_backend)
+        
+        # Метрики Prometheus: без metrics_port сбор выключен и почти ничего не стоит
+        self.metrics_port = metrics_port
+        if metrics_port:
+            metrics.enable()
+            metrics.REGISTRY.collectors.append(
+                metrics.cache_collector([self.balance_cache, self.tx_cache, self.report_cache]))
+        
+        # Анализы выполняются фиксированным пулом воркеров, а не прямо в обработчике:
+        # число одновременных запросов к API ограничено, платные тарифы идут первыми
+        # Адреса bulk API идут той же очередью с низшим приоритетом, до bulk_jobs на владельца ключа
+        self.analysis_queue = AnalysisQueue(workers=analysis_workers, max_queue=max_queue,
+                                            per_user=per_user_jobs, per_user_tier={BULK_TIER: bulk_jobs})
+        # Сколько транзакций истории учитывать при анализе происхождения:
+        # 5000 — до 100 запросов rawaddr на один /analyze
+        self.max_history = max_history
+        
+        self.webhook_port = webhook_port
+        
+        # Bulk API тарифа Business: ключ -> user_id владельца подписки
+        self.api_port = api_port
+        self.api_keys = api_keys or {}
+        
+        # Мониторинг адресов: не больше watch_budget запросов к API в секунду
+        self.watchlist_path = watchlist_path
+        self.watch_budget = watch_budget
+        
+        # Регистрация обработчиков
+        self.register_handlers()
+    
+    @cached_property
+    def validator(self) -> 'AddressValidator':
+        from address_validaitor import AddressValidator
+        
+        return AddressValidator()
+    
+    @cached_property
+    def origin_analyzer(self) -> 'FundsOriginAnalyzer':
+        from funds_origin import FundsOriginAnalyzer
+        from label_index import AddressLabelIndex
+        
+        # Индекс меток адресов строится один раз (CSV kind,pattern,category)
+        btc_index = AddressLabelIndex.load_csv(self.labels_path) if self.labels_path else None
+        return FundsOriginAnalyzer(btc_index=btc_index, label_db=self.label_db_path)
+    
+    @cached_property
+    def chain_index(self) -> Optional['ChainIndex']:
+        # Локальный индекс цепочки (chain_index.py): адреса с полной историей — без blockchain.info;
+        # блоки старше chain_index_max_age секунд считаются отставанием, тогда отвечает API
+        if not self.chain_index_path:
+            return None
+        from chain_index import ChainIndex
+        
+        return ChainIndex(self.chain_index_path, max_age=self.chain_index_max_age)
+    
+    @cached_property
+    def btc_checker(self) -> 'AsyncBitcoinAddressChecker':
+        from async_bitcoin_checker import AsyncBitcoinAddressChecker
+        
+        return AsyncBitcoinAddressChecker(index=self.chain_index)
+    
+    @cached_property
+    def balance_batcher(self) -> 'BalanceBatcher':
+        from balance_batcher import BalanceBatcher
+        
+        # Балансы от параллельных /analyze склеиваются в один запрос
+        return BalanceBatcher(self.btc_checker)
+    
+    @cached_property
+    def wallet_analyzer(self) -> 'WalletAnalyzer':
+        from wallet_analysis import WalletAnalyzer
+        
+        # Тот же конвейер используется bulk API (bulk_api.py)
+        return WalletAnalyzer(self.btc_checker, self.origin_analyzer, get_balance=self.get_balance,
+                              max_history=self.max_history, page_cache=self.tx_cache)
+    
+    @cached_property
+    def subscriptions(self) -> 'SubscriptionStore':
+        from subscriptions import SubscriptionStore
+        
+        # Тарифы и суточные квоты: проверка в памяти, запись в sqlite пачками в фоне
+        return SubscriptionStore(self.subscriptions_path)
+    
+    @cached_property
+    def payment_processor(self) -> 'BitcoinPaymentProcessor':
+        from bitcoin_payments import BitcoinPaymentProcessor
         
-        # Инициализация платежной системы
-        self.payment_processor = BitcoinPaymentProcessor(
+        return BitcoinPaymentProcessor(
             api_key="YOUR_WALLETPAY_API_KEY",
-            store_id="YOUR_STORE_ID"
+            store_id="YOUR_STORE_ID",
+            **({'base_url': self.payment_base_url} if self.payment_base_url else {})
         )
+    
+    @cached_property
+    def payment_webhook(self) -> 'PaymentWebhookServer':
+        from payment_webhook import PaymentWebhookServer
+        
+        # Оплата подтверждается вебхуком WalletPay; пропущенные вебхуки находит сверка
+        # Ожидающие заказы — в том же sqlite, что и подписки: оплата не теряется при перезапуске
+        return PaymentWebhookServer(self.payment_processor, self.activate_subscription,
+                                    db_path=self.subscriptions_path)
+    
+    @cached_property
+    def bulk_api(self) -> 'BulkAnalysisAPI':
+        from bulk_api import BulkAnalysisAPI
+        
+        # Анализ через analyze_wallet в общей очереди: кэш отчётов, batcher балансов
+        # и лимит одновременных запросов к API — те же, что у бота
+        return BulkAnalysisAPI(self.analyze_wallet, self.subscriptions, self.api_keys,
+                               queue=self.analysis_queue)
+    
+    @cached_property
+    def watchlist(self) -> 'Watchlist':
+        from watchlist import Watchlist
         
-        # Регистрация обработчиков
-        self.register_handlers()
+        # «Мониторинг подозрительной активности»: опрос балансов пачками, пересчёт при новых транзакциях
+        return Watchlist(self.btc_checker, self.origin_analyzer, self.send_watch_alert,
+                         path=self.watchlist_path, budget=self.watch_budget)
+    
+    async def close(self):
+        """Остановить созданные подсистемы (не созданные не трогаются)"""
+        for name in ('watchlist', 'bulk_api', 'payment_webhook', 'subscriptions', 'analysis_queue', 'balance_batcher', 'btc_checker',
+                     'cache_backend'):
+            subsystem = self.__dict__.get(name)
+            if subsystem is not None:
+                await subsystem.close()
+        if self.__dict__.get('chain_index') is not None:
+            self.chain_index.close()
+        await self.bot.session.close()
     
     def register_handlers(self):
         """Регистрация команд бота"""
@@ -36,6 +217,14 @@ class RiskAnalyzerBot:
         async def analyze_command(message: types.Message):
             await self.handle_analyze(message)
         
+        @self.dp.message(Command("watch"))
+        async def watch_command(message: types.Message):
+            await self.handle_watch(message)
+        
+        @self.dp.message(Command("unwatch"))
+        async def unwatch_command(message: types.Message):
+            await self.handle_unwatch(message)
+        
         @self.dp.message(Command("subscription"))
         async def subscription_command(message: types.Message):
             await self.handle_subscription(message)
@@ -57,6 +246,7 @@ class RiskAnalyzerBot:
 
 Команды:
 /analyze [адрес] — анализ кошелька
+/watch [адрес] — мониторинг адреса
 /subscription — подписки и тарифы
 /help — справка
 
@@ -74,8 +264,13 @@ class RiskAnalyzerBot:
         
         await message.answer(welcome_text, parse_mode='Markdown', reply_markup=keyboard)
     
+    @metrics.timed('handle_analyze')
     async def handle_analyze(self, message: types.Message):
         """Обработка анализа кошелька"""
+        with metrics.inflight('analyze'):
+            await self._handle_analyze(message)
+    
+    async def _handle_analyze(self, message: types.Message):
         try:
             # Извлечение адреса из сообщения
             parts = message.text.split()
@@ -86,22 +281,73 @@ class RiskAnalyzerBot:
             address = parts[1]
             
             # Валидация адреса
-            validation = self.validator.validate_address(address)
+            with metrics.stage('validate'):
+                validation = self.validator.validate_address(address)
             
             if not validation['is_valid']:
+                metrics.count(metrics.ANALYZE_TOTAL, 'unknown', 'invalid_address')
                 await message.answer("❌ Неверный формат адреса. Проверьте правильность.")
                 return
             
-            # Отправка статуса анализа
-            status_msg = await message.answer(f"🔍 Анализирую {validation['chain']} адрес...")
+            chain = validation['chain']
+            if chain not in ('BTC', 'ETH'):
+                await message.answer("❌ Поддерживаются только BTC и ETH адреса")
+                return
+            if chain not in ANALYZED_CHAINS:
+                # до списания квоты и постановки в очередь
+                metrics.count(metrics.ANALYZE_TOTAL, chain, 'unsupported')
+                await message.answer(f"❌ Анализ {chain} адресов пока недоступен, адрес корректен.")
+                return
+            
+            # Квота тарифа (бесплатный — 3 анализа в сутки)
+            user_id = message.from_user.id if message.from_user else None
+            if not self.subscriptions.try_consume(user_id, 'analyze'):
+                metrics.count(metrics.ANALYZE_TOTAL, chain, 'quota_exceeded')
+                await message.answer("🚫 Лимит бесплатного тарифа исчерпан (3 анализа в сутки).\n"
+                                     "Оформите PRO для безлимитного анализа: /subscription")
+                return
             
-            # Анализ в зависимости от сети
-            if validation['chain'] == 'BTC':
-                result = await self.analyze_btc_wallet(address)
-            elif validation['chain'] == 'ETH':
-                result = await self.analyze_eth_wallet(address)
+            # Постановка в очередь: повторный запрос того же адреса присоединяется к текущему
+            try:
+                ticket = self.analysis_queue.submit(
+                    (chain, address), lambda: self.analyze_wallet(chain, address),
+                    user_id=user_id, tier=self.get_user_tier(user_id))
+            except UserLimitExceeded:
+                self.subscriptions.refund(user_id, 'analyze')
+                await message.answer("⏳ Дождитесь завершения предыдущих анализов.")
+                return
+            except QueueFull:
+                self.subscriptions.refund(user_id, 'analyze')
+                metrics.count(metrics.ANALYZE_TOTAL, chain, 'shed')
+                await message.answer("⚠️ Сервис перегружен, попробуйте через несколько минут "
+                                     "или оформите подписку для приоритетной обработки.")
+                return
+            
+            # Отправка статуса анализа
+            if ticket.position:
+                status_msg = await message.answer(f"⏳ Запрос в очереди, позиция {ticket.position}")
             else:
-                await message.answer("❌ Поддерживаются только BTC и ETH адреса")
+                status_msg = await message.answer(f"🔍 Анализирую {chain} адрес...")
+            
+            try:
+                result = await ticket.result()
+            except QueueFull:
+                # вытеснен более приоритетными запросами
+                self.subscriptions.refund(user_id, 'analyze')
+                metrics.count(metrics.ANALYZE_TOTAL, chain, 'shed')
+                await message.answer("⚠️ Сервис перегружен, попробуйте через несколько минут.")
+                return
+            except Exception:
+                # сбой воркера — не вина пользователя, квота возвращается
+                self.subscriptions.refund(user_id, 'analyze')
+                raise
+            if 'error' in result:
+                # данные не получены (апстрим недоступен) — отчёта нет, квота возвращается
+                self.subscriptions.refund(user_id, 'analyze')
+                await message.answer("❌ Не удалось проанализировать адрес, попробуйте позже. "
+                                     "Запрос не списан с лимита.")
+                await self.bot.delete_message(message.chat.id, status_msg.message_id)
+                metrics.count(metrics.ANALYZE_TOTAL, chain, 'error')
                 return
             
             # Формирование и отправка отчета
@@ -109,74 +355,108 @@ class RiskAnalyzerBot:
             
             await message.answer(report, parse_mode='HTML')
             await self.bot.delete_message(message.chat.id, status_msg.message_id)
+            metrics.count(metrics.ANALYZE_TOTAL, chain, 'ok')
             
         except Exception as e:
+            metrics.count(metrics.ANALYZE_TOTAL, 'unknown', 'exception')
             logging.error(f"Analysis error: {e}")
             await message.answer("❌ Ошибка анализа. Попробуйте позже.")
     
-    async def analyze_btc_wallet(self, address: str) -> dict:
-        """Анализ Bitcoin кошелька"""
-        # Проверка баланса и транзакций
-        balance_info = self.btc_checker.check_address_balance(address)
-        transactions = self.btc_checker.get_address_transactions(address, limit=100)
-        
-        if not balance_info['success']:
-            return {'error': 'Не удалось получить данные'}
-        
-        # Анализ происхождения средств
-        origin_analysis = self.origin_analyzer.analyze_btc_origin(transactions)
-        
-        # Расчет общего риска
-        total_risk = self.calculate_total_risk(balance_info, origin_analysis)
-        
-        return {
-            'chain': 'BTC',
-            'balance': balance_info,
-            'transactions': transactions[:10],  # Последние 10 транзакций
-            'origin_analysis': origin_analysis,
-            'total_risk': total_risk,
-            'risk_factors': self.identify_risk_factors(origin_analysis)
-        }
-    
-    def calculate_total_risk(self, balance_info: dict, origin_analysis: dict) -> float:
-        """Расчет общего процента риска"""
-        base_risk = 0
+    async def handle_watch(self, message: types.Message):
+        """/watch <адрес> — добавить в мониторинг, /watch — список отслеживаемых"""
+        user_id = message.from_user.id
+        parts = message.text.split()
+        if len(parts) < 2:
+            addresses = self.watchlist.addresses(user_id)
+            if not addresses:
+                await message.answer("Использование: /watch <BTC адрес>")
+                return
+            lines = []
+            for address in addresses:
+                risk = self.watchlist.risk(address)
+                lines.append(f"• <code>{address}</code> — " + (f"{risk}%" if risk is not None else "оценивается"))
+            await message.answer("<b>👁 ОТСЛЕЖИВАЕМЫЕ АДРЕСА:</b>\n" + "\n".join(lines), parse_mode='HTML')
+            return
         
-        # Риск от происхождения средств
-        for category, data in origin_analysis.items():
-            base_risk += data['risk_contribution']
+        address = parts[1]
+        validation = self.validator.validate_address(address)
+        if not validation['is_valid'] or validation['chain'] != 'BTC':
+            await message.answer("❌ Мониторинг доступен только для BTC адресов.")
+            return
         
-        # Дополнительные факторы риска
-        if balance_info['transaction_count'] > 1000:
-            base_risk += 15  # Высокая активность
+        from watchlist import WATCH_LIMITS
         
-        if balance_info['balance_btc'] > 10:
-            base_risk -= 10  # Крупный баланс (менее рискованно)
+        tier = self.get_user_tier(user_id)
+        if self.watchlist.count(user_id) >= WATCH_LIMITS.get(tier, 0):
+            await message.answer(f"🚫 На тарифе можно отслеживать до {WATCH_LIMITS.get(tier, 0)} адресов: /subscription")
+            return
         
-        # Ограничение 0-100%
-        return max(0, min(100, base_risk))
+        if self.watchlist.add(address, user_id):
+            await message.answer(f"👁 Адрес добавлен в мониторинг. Оповещение придёт, "
+                                 f"если риск пересечёт {self.watchlist.threshold:.0f}%.")
+        else:
+            await message.answer("Этот адрес уже отслеживается.")
+    
+    async def handle_unwatch(self, message: types.Message):
+        """/unwatch <адрес> — убрать из мониторинга"""
+        parts = message.text.split()
+        if len(parts) < 2:
+            await message.answer("Использование: /unwatch <адрес>")
+        elif self.watchlist.remove(parts[1], message.from_user.id):
+            await message.answer("✅ Адрес удалён из мониторинга.")
+        else:
+            await message.answer("Адрес не отслеживается.")
+    
+    async def send_watch_alert(self, user_id: int, address: str, alert: dict):
+        """Оповещение мониторинга (вызывается из Watchlist)"""
+        direction = "вырос" if alert['rising'] else "снизился"
+        await self.bot.send_message(
+            user_id,
+            f"{alert['emoji']} <b>МОНИТОРИНГ:</b> риск адреса <code>{address}</code> {direction}\n"
+            f"{alert['previous_risk']}% → <b>{alert['risk']}%</b> ({alert['level']})\n"
+            f"Подробнее: /analyze {address}",
+            parse_mode='HTML')
+    
+    def get_user_tier(self, user_id) -> str:
+        return self.subscriptions.tier(user_id)
+    
+    async def analyze_wallet(self, chain: str, address: str) -> dict:
+        """Анализ в зависимости от сети (выполняется воркером очереди)"""
+        if chain == 'BTC':
+            return await self.analyze_btc_wallet(address)
+        return {'error': f'Анализ {chain} не поддерживается'}
+    
+    @metrics.timed('balance')
+    async def get_balance(self, address: str) -> dict:
+        """Баланс адреса через кэш и batcher"""
+        balance_info = self.balance_cache.get(address)
+        if balance_info is None:
+            balance_info = await self.balance_batcher.check_address_balance(address)
+            if balance_info['success']:
+                self.balance_cache.set(address, balance_info)
+        return balance_info
+    
+    @metrics.timed('analyze_btc_wallet')
+    async def analyze_btc_wallet(self, address: str) -> dict:
+        """Анализ Bitcoin кошелька"""
+        cached = self.report_cache.get(address)
+        if cached is not None:
+            return cached
+        
+        result = await self.wallet_analyzer.analyze_btc(address)
+        if 'error' not in result:
+            self.report_cache.set(address, result)
+        return result
     
+    @metrics.timed('report')
     def generate_risk_report(self, address: str, analysis: dict) -> str:
         """Генерация HTML отчета"""
+        from wallet_analysis import risk_level
+        
         risk_pct = analysis.get('total_risk', 0)
         
         # Определение уровня риска
-        if risk_pct <= 20:
-            risk_level = "НИЗКИЙ"
-            emoji = "🟢"
-            color = "#10B981"
-        elif risk_pct <= 50:
-            risk_level = "УМЕРЕННЫЙ"
-            emoji = "🟡"
-            color = "#F59E0B"
-        elif risk_pct <= 75:
-            risk_level = "ВЫСОКИЙ"
-            emoji = "🔴"
-            color = "#EF4444"
-        else:
-            risk_level = "КРИТИЧЕСКИЙ"
-            emoji = "☣️"
-            color = "#7C3AED"
+        level, emoji, color = risk_level(risk_pct)
         
         # Прогресс-бар
         progress = "█" * int(risk_pct / 5) + "░" * (20 - int(risk_pct / 5))
@@ -187,17 +467,27 @@ class RiskAnalyzerBot:
 
 <b>📍 Адрес:</b> <code>{address[:15]}...{address[-10:]}</code>
 <b>📊 Общий риск:</b> <span style="color: {color}"><b>{risk_pct}%</b></span>
-<b>🏷️ Уровень:</b> {risk_level}
+<b>🏷️ Уровень:</b> {level}
 
 [{progress}]
 
 <b>💰 БАЛАНС:</b>
 • Текущий: {analysis['balance'].get('balance_btc', 0):.8f} BTC
 • Всего транзакций: {analysis['balance'].get('transaction_count', 0)}
-
-<b>🏷️ КАТЕГОРИИ ПРОИСХОЖДЕНИЯ:</b>
 """
         
+        # Последние транзакции — прямо из колонок TxBatch (сатоши, время эпохи)
+        recent = analysis.get('transactions')
+        if recent is not None and len(recent):
+            wallet_id = recent.find(address)
+            report += "\n<b>🕒 ПОСЛЕДНИЕ ТРАНЗАКЦИИ:</b>"
+            for i in range(min(3, len(recent))):
+                day = datetime.fromtimestamp(recent.times[i]).strftime("%d.%m.%Y")
+                report += f"\n• {day}: {recent.net_value(i, wallet_id) / SATOSHI:+.8f} BTC"
+            report += "\n"
+        
+        report += "\n<b>🏷️ КАТЕГОРИИ ПРОИСХОЖДЕНИЯ:</b>\n"
+        
         # Добавление категорий
         origin_data = analysis.get('origin_analysis', {})
         for i, (category, data) in enumerate(list(origin_data.items())[:5], 1):
@@ -275,6 +565,9 @@ class RiskAnalyzerBot:
             tier = data.split("_")[1]
             await self.process_subscription_payment(callback, tier)
         
+        elif data.startswith("check_payment_"):
+            await self.check_payment(callback, data[len("check_payment_"):])
+        
         elif data == "quick_analyze":
             await callback.message.answer(
                 "Введите адрес кошелька для анализа:\n\n"
@@ -311,7 +604,9 @@ class RiskAnalyzerBot:
         amount_btc = tier_prices[tier]
         external_id = f"sub_{callback.from_user.id}_{int(datetime.now().timestamp())}"
         
-        payment_result = self.payment_processor.create_payment_link(
+        # requests блокирует — выполняется в отдельном потоке, а не в цикле бота
+        payment_result = await asyncio.to_thread(
+            self.payment_processor.create_payment_link,
             amount_btc=amount_btc,
             description=f"Подписка {tier_names[tier]} на RiskAnalyzer",
             user_id=callback.from_user.id,
@@ -319,6 +614,8 @@ class RiskAnalyzerBot:
         )
         
         if payment_result['success']:
+            self.payment_webhook.register_order(payment_result['payment_id'], external_id,
+                                                callback.from_user.id, tier)
             payment_text = f"""
 💳 <b>ОПЛАТА ПОДПИСКИ {tier_names[tier].upper()}</b>
 
@@ -343,13 +640,119 @@ class RiskAnalyzerBot:
         else:
             await callback.message.answer(f"❌ Ошибка создания счёта: {payment_result.get('error', 'Unknown error')}")
 
-async def main():
+    async def activate_subscription(self, user_id: int, tier: str, order: dict):
+        """Активация подписки после оплаты (вызывается из PaymentWebhookServer)"""
+        self.subscriptions.set_tier(user_id, tier)
+        try:
+            await self.bot.send_message(user_id, f"✅ Оплата получена, тариф {tier.upper()} активирован.")
+        except Exception as e:
+            logging.warning(f"Activation notice to {user_id} failed: {e}")
+    
+    async def check_payment(self, callback: types.CallbackQuery, external_id: str):
+        """Кнопка «Проверить статус»: внеочередная сверка одного заказа"""
+        order_id = self.payment_webhook.find_order(external_id)
+        if order_id is None:
+            await callback.message.answer("✅ Платёж уже обработан.")
+        elif await self.payment_webhook.reconcile([order_id]):
+            await callback.message.answer("✅ Оплата найдена, подписка активируется.")
+        else:
+            await callback.message.answer("⏳ Оплата пока не поступила. Подписка активируется автоматически.")
+
+def _api_keys(value: str) -> dict:
+    """'ключ:user_id,ключ:user_id' -> {ключ: user_id}"""
+    keys = {}
+    for item in filter(None, value.split(',')):
+        key, _, user_id = item.partition(':')
+        keys[key.strip()] = int(user_id)
+    return keys
+
+# Параметры RiskAnalyzerBot, которые задаются при запуске: (флаг, переменная окружения, тип, справка)
+OPTIONS = (
+    ('--token', 'BOT_TOKEN', str, "токен Telegram бота"),
+    ('--metrics-port', 'METRICS_PORT', int, "порт /metrics Prometheus (без него метрики выключены)"),
+    ('--webhook-port', 'WEBHOOK_PORT', int, "порт вебхуков WalletPay (без него — только сверка)"),
+    ('--api-port', 'API_PORT', int, "порт bulk API тарифа Business"),
+    ('--api-keys', 'API_KEYS', _api_keys, "ключи bulk API: ключ:user_id,ключ:user_id"),
+    ('--subscriptions-path', 'SUBSCRIPTIONS_PATH', str, "sqlite подписок и ожидающих оплат"),
+    ('--watchlist-path', 'WATCHLIST_PATH', str, "sqlite отслеживаемых адресов"),
+    ('--watch-budget', 'WATCH_BUDGET', float, "запросов к API в секунду на мониторинг"),
+    ('--chain-index-path', 'CHAIN_INDEX_PATH', str, "локальный индекс цепочки (chain_index.py)"),
+    ('--cache-path', 'CACHE_PATH', str, "sqlite для кэшей балансов, истории и отчётов"),
+    ('--labels-path', 'LABELS_PATH', str, "CSV меток адресов kind,pattern,category"),
+    ('--label-db-path', 'LABEL_DB_PATH', str, "бинарная база меток (label_db.py)"),
+)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Флаги запуска; значение по умолчанию каждого — из переменной окружения"""
+    parser = argparse.ArgumentParser(description="Telegram бот оценки риска кошельков")
+    for flag, env, type_, help_text in OPTIONS:
+        parser.add_argument(flag, type=type_, default=os.environ.get(env), help=f"{help_text} (${env})")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="замерить время старта и ленивых подсистем и выйти")
+    args = parser.parse_args(argv)
+    if not args.token and not args.profile_startup:
+        parser.error("--token or $BOT_TOKEN is required")
+    return args
+
+
+def bot_options(args: argparse.Namespace) -> dict:
+    """Заданные параметры OPTIONS -> аргументы RiskAnalyzerBot (незаданные — по умолчанию)"""
+    names = (flag[2:].replace('-', '_') for flag, *_ in OPTIONS)
+    return {name: getattr(args, name) for name in names if getattr(args, name) is not None}
+
+
+async def main(args: argparse.Namespace):
     """Основная функция запуска бота"""
-    bot = RiskAnalyzerBot(token="YOUR_BOT_TOKEN")
+    bot = RiskAnalyzerBot(**bot_options(args))
+    metrics_runner = await metrics.start_http_server(bot.metrics_port) if bot.metrics_port else None
+    bot.subscriptions.start()
+    if bot.cache_backend is not None:
+        bot.cache_backend.start()
+    if bot.webhook_port:
+        await bot.payment_webhook.start(bot.webhook_port)
+    else:
+        bot.payment_webhook.start_background()
+    if bot.api_port:
+        await bot.bulk_api.start(bot.api_port)
+    bot.watchlist.start()
+    
+    startup_ms = (time.perf_counter() - _FRAMEWORK) * 1000
+    logging.info(f"Startup took {startup_ms:.0f} ms (+ {(_FRAMEWORK - _STARTED) * 1000:.0f} ms importing aiogram)")
+    if startup_ms > STARTUP_BUDGET_MS:
+        logging.warning(f"Startup over budget: {startup_ms:.0f} ms > {STARTUP_BUDGET_MS} ms")
     
     # Запуск бота
-    await bot.dp.start_polling(bot.bot)
+    try:
+        await bot.dp.start_polling(bot.bot)
+    finally:
+        await bot.close()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+
+def profile_startup(budget_ms: float = STARTUP_BUDGET_MS) -> int:
+    """Время импортов, создания бота и каждой ленивой подсистемы; 1 — если бюджет превышен.
+
+    Строка подсистемы — её первое обращение: импорт модуля и создание объекта.
+    """
+    rows = [('import aiogram', _FRAMEWORK - _STARTED), ('import bot modules', _IMPORTED - _FRAMEWORK)]
+    start = time.perf_counter()
+    bot = RiskAnalyzerBot(token="0:profile")
+    rows.append(('RiskAnalyzerBot()', time.perf_counter() - start))
+    ready = time.perf_counter() - _FRAMEWORK
+    for name in LAZY_SUBSYSTEMS:
+        start = time.perf_counter()
+        getattr(bot, name)
+        rows.append((f'  lazy {name}', time.perf_counter() - start))
+    asyncio.run(bot.close())
+    for name, seconds in rows:
+        print(f"{name:28s} {seconds * 1000:8.1f} ms")
+    print(f"{'ready to respond':28s} {ready * 1000:8.1f} ms  (budget {budget_ms:.0f} ms, excluding aiogram)")
+    return 1 if ready * 1000 > budget_ms else 0
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.profile_startup:
+        sys.exit(profile_startup())
     logging.basicConfig(level=logging.INFO)
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main(args))
\ No newline at end of file
@@ -0,0 +1,244 @@
+"""Метрики бота в формате Prometheus: гистограммы задержек по этапам,
+счётчики ошибок апстрима, gauge запросов в работе, статистика кэшей.
+
+По умолчанию сбор выключен: stage()/inflight()/upstream() возвращают общий no-op
+контекст, а декоратор @timed делает одну проверку флага на вызов.
+Включается metrics.enable(); отдаётся через start_http_server().
+"""
+import asyncio
+import functools
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Границы гистограмм задержек, секунды
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+PREFIX = 'owrs_'
+
+
+def _labels(names: Tuple[str, ...], values: Tuple) -> str:
+    if not names:
+        return ''
+    pairs = ','.join(f'{n}="{str(v)}"'.replace('\n', ' ') for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name, self.help, self.labelnames = PREFIX + name, help, tuple(labelnames)
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        return [f'{self.name}{_labels(self.labelnames, k)} {v}' for k, v in self.values.items()]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        self.values[labels] = value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = PREFIX + name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # по ключу меток: [счётчики по корзинам (+Inf последней), сумма]
+        self.values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames + ("le",), key + (bound,))} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {total}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {cumulative}')
+        return lines
+
+
+class Registry:
+    """Набор метрик и коллекторов, которые опрашиваются при каждом scrape"""
+
+    def __init__(self):
+        self.enabled = False
+        self.metrics: List = []
+        self.collectors: List[Callable[[], Iterable[str]]] = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.add(Histogram('stage_seconds', 'Latency of analysis stages', ['stage']))
+STAGE_ERRORS = REGISTRY.add(Counter('stage_errors_total', 'Exceptions raised by analysis stages', ['stage']))
+INFLIGHT = REGISTRY.add(Gauge('inflight', 'Requests currently in progress', ['stage']))
+UPSTREAM_SECONDS = REGISTRY.add(Histogram('upstream_seconds', 'Latency of upstream API calls', ['endpoint']))
+UPSTREAM_ERRORS = REGISTRY.add(Counter('upstream_errors_total', 'Failed upstream API calls', ['endpoint', 'kind']))
+ANALYZE_TOTAL = REGISTRY.add(Counter('analyze_total', '/analyze requests by chain and outcome', ['chain', 'outcome']))
+
+
+def enable(enabled: bool = True):
+    REGISTRY.enabled = enabled
+
+
+class _Noop:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _Noop()
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'errors', 'start')
+
+    def __init__(self, histogram: Histogram, labels: Tuple, errors: Counter = None):
+        self.histogram, self.labels, self.errors = histogram, labels, errors
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        if exc_type is not None and self.errors is not None:
+            self.errors.inc(*self.labels)
+        return False
+
+
+class _Inflight:
+    __slots__ = ('stage',)
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        INFLIGHT.inc(self.stage)
+        return self
+
+    def __exit__(self, *exc):
+        INFLIGHT.dec(self.stage)
+        return False
+
+
+def timed(stage: str):
+    """Декоратор замера этапа для обычных и async функций"""
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                if not REGISTRY.enabled:
+                    return await fn(*args, **kwargs)
+                with _Timer(STAGE_SECONDS, (stage,), STAGE_ERRORS):
+                    return await fn(*args, **kwargs)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not REGISTRY.enabled:
+                    return fn(*args, **kwargs)
+                with _Timer(STAGE_SECONDS, (stage,), STAGE_ERRORS):
+                    return fn(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def stage(name: str):
+    """Контекст замера этапа внутри функции (no-op при выключенных метриках)"""
+    return _Timer(STAGE_SECONDS, (name,), STAGE_ERRORS) if REGISTRY.enabled else _NOOP
+
+
+def inflight(name: str):
+    """Контекст для gauge запросов в работе"""
+    return _Inflight(name) if REGISTRY.enabled else _NOOP
+
+
+def upstream(endpoint: str):
+    """Замер запроса к внешнему API; ошибки считаются вызывающим через upstream_error()"""
+    return _Timer(UPSTREAM_SECONDS, (endpoint,)) if REGISTRY.enabled else _NOOP
+
+
+def upstream_error(endpoint: str, exc: BaseException):
+    if REGISTRY.enabled:
+        if isinstance(exc, (asyncio.TimeoutError, TimeoutError)) or 'Timeout' in type(exc).__name__:
+            kind = 'timeout'
+        elif isinstance(getattr(exc, 'status', None), int):
+            kind = f'http_{exc.status}'
+        else:
+            kind = type(exc).__name__
+        UPSTREAM_ERRORS.inc(endpoint, kind)
+
+
+def count(counter: Counter, *labels):
+    if REGISTRY.enabled:
+        counter.inc(*labels)
+
+
+def cache_collector(caches: Iterable) -> Callable[[], List[str]]:
+    """Коллектор статистики TTLCache: читается только при scrape"""
+    caches = list(caches)
+
+    def collect() -> List[str]:
+        lines = []
+        for stat in ('hits', 'misses', 'evictions', 'expired'):
+            name = f'{PREFIX}cache_{stat}_total'
+            lines += [f'# TYPE {name} counter']
+            lines += [f'{name}{{cache="{c.name}"}} {c.stats[stat]}' for c in caches]
+        lines += [f'# TYPE {PREFIX}cache_hit_ratio gauge']
+        lines += [f'{PREFIX}cache_hit_ratio{{cache="{c.name}"}} {c.hit_rate()}' for c in caches]
+        lines += [f'# TYPE {PREFIX}cache_entries gauge']
+        lines += [f'{PREFIX}cache_entries{{cache="{c.name}"}} {len(c)}' for c in caches]
+        return lines
+
+    return collect
+
+
+async def start_http_server(port: int, host: str = '127.0.0.1', registry: Registry = REGISTRY):
+    """GET /metrics в текстовом формате Prometheus; возвращает AppRunner (runner.cleanup() для остановки)"""
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(text=registry.render(), content_type='text/plain', charset='utf-8',
+                            headers={'X-Content-Type-Options': 'nosniff'})
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
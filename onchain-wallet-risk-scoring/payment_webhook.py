@@ -0,0 +1,263 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+
+from bitcoin_payments import BitcoinPaymentProcessor
+
+# activate(user_id, tier, order) — включить подписку после оплаты
+Activator = Callable[[int, str, Dict], Awaitable[None]]
+
+PAID_STATUSES = {'PAID'}
+CLOSED_STATUSES = {'EXPIRED', 'CANCELLED', 'FAILED'}
+
+
+class PaymentWebhookServer:
+    """Приём вебхуков WalletPay и сверка заказов, для которых вебхук не пришёл.
+
+    Обработчик HTTP только проверяет подпись (hmac.compare_digest) и
+    свежесть WalletPay-Timestamp (не дальше `max_skew` секунд), отбрасывает
+    повторы по (id заказа, тип события) и кладёт событие в очередь — ответ
+    WalletPay уходит сразу, активация подписки выполняется отдельной задачей.
+    Заказ уходит из ожидающих только в конечном статусе (оплачен, отменён,
+    истёк). Reconciler раз в `reconcile_interval` секунд пачками по
+    `batch_size` запрашивает статусы заказов, ожидающих дольше
+    `reconcile_after` секунд.
+
+    С `db_path` ожидающие заказы хранятся в sqlite: после перезапуска вебхук
+    и сверка находят заказы, созданные до него. Запись отложенная, как в
+    SubscriptionStore: новые и закрытые заказы пишутся одной транзакцией
+    раз в `flush_interval` секунд в отдельном потоке, не в обработчике.
+    """
+
+    def __init__(self, processor: BitcoinPaymentProcessor, activate: Activator,
+                 path: str = '/wpay/webhook', reconcile_interval: float = 60,
+                 reconcile_after: float = 300, batch_size: int = 50, order_ttl: float = 3600,
+                 max_seen: int = 100000, max_skew: float = 300, db_path: Optional[str] = None,
+                 flush_interval: float = 1.0, clock: Callable[[], float] = time.time):
+        self.processor = processor
+        self.activate = activate
+        self.path = path
+        self.reconcile_interval = reconcile_interval
+        self.reconcile_after = reconcile_after
+        self.batch_size = batch_size
+        self.order_ttl = order_ttl
+        self.max_seen = max_seen
+        self.max_skew = max_skew
+        self.flush_interval = flush_interval
+        self.clock = clock
+        # id заказа -> {'external_id', 'user_id', 'tier', 'created_at'}
+        self.pending: Dict[str, Dict] = {}
+        self._seen: "OrderedDict[tuple, None]" = OrderedDict()  # обработанные (id заказа, тип события)
+        self._events: asyncio.Queue = asyncio.Queue()
+        self._tasks = []
+        self._runner = None
+        self._dirty: Dict[str, Optional[tuple]] = {}  # id заказа -> строка payment_orders или None — удалить
+        self._writing = None
+        self.stats = {'received': 0, 'bad_signature': 0, 'stale': 0, 'duplicates': 0, 'activated': 0,
+                      'failed': 0, 'reconciled': 0, 'expired': 0}
+        self.db = None
+        if db_path:
+            # flush выполняется в отдельном потоке, но всегда не больше одного сразу
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS payment_orders (
+                    order_id TEXT PRIMARY KEY, external_id TEXT NOT NULL, user_id INTEGER NOT NULL,
+                    tier TEXT NOT NULL, created_at REAL NOT NULL)
+            """)
+            self.db.commit()
+            for order_id, external_id, user_id, tier, created_at in self.db.execute(
+                    "SELECT * FROM payment_orders"):
+                self.pending[order_id] = {'external_id': external_id, 'user_id': user_id,
+                                          'tier': tier, 'created_at': created_at}
+
+    def register_order(self, order_id: str, external_id: str, user_id: int, tier: str):
+        """Запомнить созданный заказ до прихода вебхука"""
+        order = {'external_id': external_id, 'user_id': user_id, 'tier': tier, 'created_at': self.clock()}
+        self.pending[str(order_id)] = order
+        if self.db is not None:
+            self._dirty[str(order_id)] = (str(order_id), external_id, user_id, tier, order['created_at'])
+
+    def _finish(self, order_id: str):
+        """Заказ в конечном статусе: больше не ожидается"""
+        self.pending.pop(order_id, None)
+        if self.db is not None:
+            self._dirty[order_id] = None
+
+    def find_order(self, external_id: str) -> Optional[str]:
+        for order_id, order in self.pending.items():
+            if order['external_id'] == external_id:
+                return order_id
+        return None
+
+    def _accept(self, order_id: str, event_type: str, payload: Dict) -> bool:
+        """Поставить событие в очередь, если такое событие заказа ещё не обработано"""
+        key = (order_id, event_type)
+        if key in self._seen:
+            self.stats['duplicates'] += 1
+            return False
+        self._seen[key] = None
+        while len(self._seen) > self.max_seen:
+            self._seen.popitem(last=False)
+        self._events.put_nowait((order_id, event_type, payload))
+        return True
+
+    def _fresh(self, timestamp: str) -> bool:
+        """Timestamp не дальше max_skew секунд от текущего времени (единицы — по числу цифр)"""
+        if not timestamp.isdigit():
+            return False
+        seconds = int(timestamp) / 10 ** max(0, len(timestamp) - 10)  # мс, мкс, нс -> секунды
+        return abs(self.clock() - seconds) <= self.max_skew
+
+    async def handle_webhook(self, request):
+        from aiohttp import web
+
+        body = await request.read()
+        timestamp = request.headers.get('WalletPay-Timestamp')
+        if not self.processor.verify_signature(request.method, request.path, timestamp, body,
+                                               request.headers.get('Walletpay-Signature')):
+            self.stats['bad_signature'] += 1
+            return web.Response(status=401, text='bad signature')
+        if not self._fresh(timestamp):
+            # подписанный, но старый запрос — повтор перехваченного вебхука
+            self.stats['stale'] += 1
+            return web.Response(status=401, text='stale timestamp')
+        try:
+            events = json.loads(body)
+        except ValueError:
+            return web.Response(status=400, text='bad json')
+        for event in events if isinstance(events, list) else [events]:
+            payload = event.get('payload') or {}
+            if 'id' not in payload:
+                continue
+            self.stats['received'] += 1
+            self._accept(str(payload['id']), event.get('type', ''), payload)
+        # WalletPay повторяет доставку, пока не получит 200
+        return web.Response(text='OK')
+
+    async def _consume(self):
+        while True:
+            order_id, event_type, payload = await self._events.get()
+            order = self.pending.get(order_id)
+            try:
+                if order is None:
+                    logging.warning(f"Payment event for unknown order {order_id}")
+                elif event_type == 'ORDER_PAID' or payload.get('status') in PAID_STATUSES:
+                    await self.activate(order['user_id'], order['tier'], {'order_id': order_id, **payload})
+                    self.stats['activated'] += 1
+                    self._finish(order_id)
+                elif payload.get('status') in CLOSED_STATUSES:
+                    self.stats['expired'] += 1
+                    self._finish(order_id)
+                # прочие события (ORDER_FAILED с незавершённым статусом и т.п.) заказ не закрывают
+            except Exception as e:
+                # заказ остаётся в ожидании: повтор вебхука или reconciler попробуют снова
+                logging.error(f"Subscription activation failed for order {order_id}: {e}")
+                self.stats['failed'] += 1
+                self._seen.pop((order_id, event_type), None)
+            finally:
+                self._events.task_done()
+
+    async def reconcile(self, order_ids=None) -> int:
+        """Одна сверка: статусы ожидающих заказов пачками; возвращает число найденных оплат"""
+        now = self.clock()
+        if order_ids is None:
+            order_ids = [order_id for order_id, order in self.pending.items()
+                         if now - order['created_at'] >= self.reconcile_after]
+        found = 0
+        for i in range(0, len(order_ids), self.batch_size):
+            statuses = await self.processor.check_payment_statuses(order_ids[i:i + self.batch_size])
+            for order_id, status in statuses.items():
+                order = self.pending.get(order_id)
+                if order is None or not status.get('success'):
+                    continue
+                if status['status'] in PAID_STATUSES:
+                    if self._accept(order_id, 'ORDER_PAID', {'id': order_id, **status}):
+                        self.stats['reconciled'] += 1
+                        found += 1
+                elif status['status'] in CLOSED_STATUSES or now - order['created_at'] > self.order_ttl:
+                    self._finish(order_id)
+                    self.stats['expired'] += 1
+        return found
+
+    def _take_dirty(self) -> Dict[str, Optional[tuple]]:
+        dirty, self._dirty = self._dirty, {}
+        return dirty
+
+    def _write(self, dirty: Dict[str, Optional[tuple]]):
+        with self.db:
+            self.db.executemany("DELETE FROM payment_orders WHERE order_id = ?",
+                                [(order_id,) for order_id, row in dirty.items() if row is None])
+            self.db.executemany("INSERT OR REPLACE INTO payment_orders VALUES (?, ?, ?, ?, ?)",
+                                [row for row in dirty.values() if row is not None])
+
+    def flush(self) -> int:
+        """Записать изменения синхронно; возвращает число заказов"""
+        if self.db is None or not self._dirty:
+            return 0
+        dirty = self._take_dirty()
+        self._write(dirty)
+        return len(dirty)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._dirty:
+                dirty = self._take_dirty()
+                self._writing = asyncio.ensure_future(asyncio.to_thread(self._write, dirty))
+                try:
+                    # shield: остановка цикла не должна бросать запись на середине
+                    await asyncio.shield(self._writing)
+                except Exception as e:
+                    logging.error(f"Payment orders flush failed: {e}")
+                    # более новые изменения заказов за время записи не перетираются
+                    self._dirty = {**dirty, **self._dirty}
+
+    async def _reconcile_loop(self):
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logging.warning(f"Payment reconciliation failed: {e}")
+
+    def start_background(self):
+        """Запустить обработку событий и периодическую сверку (без HTTP-сервера)"""
+        if not self._tasks:
+            self._tasks = [asyncio.ensure_future(self._consume()),
+                           asyncio.ensure_future(self._reconcile_loop())]
+            if self.db is not None:
+                self._tasks.append(asyncio.ensure_future(self._flush_loop()))
+
+    async def start(self, port: int, host: str = '0.0.0.0'):
+        from aiohttp import web
+
+        self.start_background()
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_webhook)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+    async def drain(self):
+        """Дождаться обработки всех принятых событий"""
+        await self._events.join()
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._writing is not None:
+            await asyncio.gather(self._writing, return_exceptions=True)
+        await self.processor.close()
+        if self.db is not None:
+            self.flush()
+            self.db.close()
+            self.db = None
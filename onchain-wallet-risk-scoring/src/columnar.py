@@ -0,0 +1,136 @@
+import argparse, json, os, shutil
+import pandas as pd, numpy as np
+
+# Column store next to the CSV: <file>.cols/ with meta.json plus one raw
+# little-endian file per column, so readers can np.memmap and skip columns.
+#   date              int64 epoch ns
+#   tx_hash           utf-8 blob + int64 offsets
+#   other text cols   int32 dictionary codes (-1 = missing) + dictionary in meta
+#   numeric cols      float64
+FORMAT_VERSION = 1
+STRING_COLS = {'tx_hash'}
+TEXT_COLS = ['tx_hash', 'token', 'direction', 'counterparty', 'tags']
+
+def cache_path(path):
+    return path if path.endswith('.cols') else path + '.cols'
+
+def _source_stamp(path):
+    st = os.stat(path)
+    return {'source_size': st.st_size, 'source_mtime_ns': st.st_mtime_ns}
+
+def is_fresh(path):
+    cols = cache_path(path)
+    meta_path = os.path.join(cols, 'meta.json')
+    if not os.path.exists(meta_path):
+        return False
+    if cols == path:
+        return True
+    with open(meta_path) as f:
+        meta = json.load(f)
+    return meta.get('version') == FORMAT_VERSION and os.path.exists(path) and \
+        all(meta.get(k) == v for k, v in _source_stamp(path).items())
+
+def _schema(path):
+    sample = pd.read_csv(path, nrows=1000, dtype={c:str for c in TEXT_COLS})
+    dtypes = {}
+    for col in sample.columns:
+        if col == 'date':
+            continue
+        if col in STRING_COLS:
+            dtypes[col] = 'str'
+        elif col in TEXT_COLS or not pd.api.types.is_numeric_dtype(sample[col]):
+            dtypes[col] = 'dict'
+        else:
+            # later chunks may hold NaNs the sample did not
+            dtypes[col] = 'float64'
+    return list(sample.columns), dtypes
+
+def ingest(path, chunksize=1_000_000):
+    """Convert a transaction CSV into the column store; returns its directory."""
+    out = cache_path(path)
+    tmp = out + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    order, kinds = _schema(path)
+    read_dtypes = {c:(str if k in ('str', 'dict') else k) for c, k in kinds.items()}
+    dictionaries = {c:{} for c, k in kinds.items() if k == 'dict'}
+    files = {c:open(os.path.join(tmp, c + '.bin'), 'wb') for c in order}
+    blobs = {c:open(os.path.join(tmp, c + '.data.bin'), 'wb') for c, k in kinds.items() if k == 'str'}
+    blob_pos = {c:0 for c in blobs}
+    for c in blobs:
+        np.zeros(1, dtype='<i8').tofile(files[c])
+    n = 0
+    for chunk in pd.read_csv(path, parse_dates=['date'], dtype=read_dtypes, chunksize=chunksize):
+        n += len(chunk)
+        for c in order:
+            col = chunk[c]
+            if c == 'date':
+                col.values.astype('datetime64[ns]').astype('<i8').tofile(files[c])
+            elif kinds[c] == 'str':
+                encoded = [v.encode() if isinstance(v, str) else b'' for v in col.values]
+                lengths = np.fromiter((len(b) for b in encoded), dtype='<i8', count=len(encoded))
+                (blob_pos[c] + np.cumsum(lengths)).tofile(files[c])
+                blob_pos[c] += int(lengths.sum())
+                blobs[c].write(b''.join(encoded))
+            elif kinds[c] == 'dict':
+                local, uniques = pd.factorize(col)
+                mapping = dictionaries[c]
+                to_global = np.array([mapping.setdefault(u, len(mapping)) for u in uniques] + [-1], dtype='<i4')
+                to_global[local].tofile(files[c])
+            else:
+                col.values.astype(kinds[c]).tofile(files[c])
+    for f in list(files.values()) + list(blobs.values()):
+        f.close()
+    columns = {}
+    for c in order:
+        if c == 'date':
+            columns[c] = {'kind':'date', 'dtype':'<i8'}
+        elif kinds[c] == 'str':
+            columns[c] = {'kind':'str', 'dtype':'<i8'}
+        elif kinds[c] == 'dict':
+            columns[c] = {'kind':'dict', 'dtype':'<i4', 'dictionary':list(dictionaries[c])}
+        else:
+            columns[c] = {'kind':'num', 'dtype':np.dtype(kinds[c]).str}
+    meta = {'version':FORMAT_VERSION, 'n_rows':n, 'order':order, 'columns':columns, **_source_stamp(path)}
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    shutil.rmtree(out, ignore_errors=True)
+    os.replace(tmp, out)
+    return out
+
+def read_columns(path, columns=None):
+    """Memory-map the column store, materializing only the requested columns."""
+    cols_dir = cache_path(path)
+    with open(os.path.join(cols_dir, 'meta.json')) as f:
+        meta = json.load(f)
+    n = meta['n_rows']
+    data = {}
+    for c in (columns or meta['order']):
+        spec = meta['columns'][c]
+        mm = np.memmap(os.path.join(cols_dir, c + '.bin'), dtype=spec['dtype'], mode='r',
+                       shape=(n + (spec['kind'] == 'str'),)) if n else np.zeros(n + (spec['kind'] == 'str'), spec['dtype'])
+        if spec['kind'] == 'date':
+            data[c] = pd.Series(mm.view('datetime64[ns]'), copy=False)
+        elif spec['kind'] == 'dict':
+            data[c] = pd.Categorical.from_codes(np.asarray(mm), spec['dictionary'])
+        elif spec['kind'] == 'str':
+            blob = np.memmap(os.path.join(cols_dir, c + '.data.bin'), dtype='u1', mode='r') \
+                if mm[-1] else np.zeros(0, 'u1')
+            raw = blob.tobytes()
+            data[c] = [raw[a:b].decode() for a, b in zip(mm[:-1], mm[1:])]
+        else:
+            data[c] = mm
+    return pd.DataFrame(data)
+
+def main():
+    p = argparse.ArgumentParser(description='ingest transaction CSVs into the column store')
+    p.add_argument('paths', nargs='+')
+    p.add_argument('--chunksize', type=int, default=1_000_000)
+    p.add_argument('--force', action='store_true')
+    args = p.parse_args()
+    for path in args.paths:
+        if args.force or not is_fresh(path):
+            print(f'{path} -> {ingest(path, args.chunksize)}')
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,56 @@
+import json, sqlite3
+
+from stream import FactorAccumulator
+
+class WalletStateStore:
+    """Persisted FactorAccumulator per wallet, in sqlite.
+
+    Scalars live in one row per wallet; counterparty counts are a separate
+    table so a re-score only reads and writes the counterparties it touches.
+    """
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.executescript('''
+            CREATE TABLE IF NOT EXISTS wallet_state (wallet TEXT PRIMARY KEY, state TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS wallet_counterparty (
+                wallet TEXT NOT NULL, counterparty TEXT NOT NULL, n INTEGER NOT NULL,
+                PRIMARY KEY (wallet, counterparty)) WITHOUT ROWID;
+        ''')
+
+    def load(self, wallet, counterparties=()):
+        row = self.db.execute('SELECT state FROM wallet_state WHERE wallet=?', (wallet,)).fetchone()
+        if row is None:
+            return FactorAccumulator()
+        acc = FactorAccumulator.from_dict(json.loads(row[0]))
+        cps = [str(c) for c in counterparties]
+        for i in range(0, len(cps), 500):
+            batch = cps[i:i+500]
+            acc.counterparties.update(self.db.execute(
+                f'SELECT counterparty, n FROM wallet_counterparty WHERE wallet=? AND counterparty IN ({",".join("?"*len(batch))})',
+                [wallet] + batch).fetchall())
+        return acc
+
+    def save(self, wallet, acc):
+        with self.db:
+            self.db.execute('INSERT OR REPLACE INTO wallet_state VALUES (?, ?)',
+                            (wallet, json.dumps(acc.to_dict(counterparties=False))))
+            self.db.executemany('INSERT OR REPLACE INTO wallet_counterparty VALUES (?, ?, ?)',
+                                [(wallet, str(k), int(v)) for k, v in acc.counterparties.items()])
+
+    def close(self):
+        self.db.close()
+
+def rescore(store, wallet, txs):
+    """Fold new txs into the wallet's stored state; returns (score, label, factors).
+
+    txs must not predate the newest tx already folded in; rebuild the state from
+    full history (an empty store + all txs) if they do.
+    """
+    txs = txs.sort_values('date', kind='mergesort')
+    acc = store.load(wallet, txs['counterparty'].dropna().unique())
+    if len(txs) and acc.last_ns is not None and txs['date'].values[:1].astype('datetime64[ns]').astype('int64')[0] < acc.last_ns:
+        raise ValueError(f'{wallet}: new txs predate stored state, re-score from full history')
+    acc.update(txs)
+    store.save(wallet, acc)
+    return acc.score()
@@ -0,0 +1,115 @@
+import os, sys, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from score import SCORE_COLUMNS, load_txs, score_wallet, score_wallets
+
+FACTORS = ('low_liquidity', 'fresh_contracts', 'direction_entropy', 'time_bursts')
+RESULT_COLUMNS = ('wallet', 'overall_score', 'label') + FACTORS + ('n_txs', 'error')
+
+def _wallet_rows(df, wallet_col):
+    return [(str(getattr(r, wallet_col)), int(r.overall_score), r.label,
+             *(float(getattr(r, k)) for k in FACTORS), int(r.n_txs), '')
+            for r in score_wallets(df, wallet_col).itertuples(index=False)]
+
+def _error_row(path, e):
+    return (os.path.splitext(os.path.basename(path))[0], None, None, *(None for _ in FACTORS), None, f'{type(e).__name__}: {e}')
+
+def _score_paths(paths, wallet_col):
+    # runs in a worker: plain tuples back, never DataFrames, to keep pickling cheap
+    rows = []
+    for path in paths:
+        try:
+            if wallet_col:
+                rows.extend(_wallet_rows(load_txs(path, SCORE_COLUMNS + [wallet_col]), wallet_col))
+            else:
+                df = load_txs(path, SCORE_COLUMNS)
+                score, label, factors = score_wallet(df)
+                wallet = os.path.splitext(os.path.basename(path))[0]
+                rows.append((wallet, score, label, *(float(factors[k]) for k in FACTORS), int(len(df)), ''))
+        except Exception as e:
+            rows.append(_error_row(path, e))
+    return rows
+
+def _score_shard(df, wallet_col, path):
+    try:
+        return _wallet_rows(df, wallet_col)
+    except Exception as e:
+        return [_error_row(path, e)]
+
+def _shards(df, wallet_col, n_shards):
+    # every wallet's rows land in exactly one shard, so per-wallet factors are
+    # unchanged; also returns the sorted wallets score_wallets would list
+    import numpy as np, pandas as pd
+    codes, wallets = pd.factorize(np.asarray(df[wallet_col]), sort=True)
+    shard = codes % n_shards
+    return [df[shard == i] for i in range(n_shards)], wallets
+
+def list_inputs(data):
+    if os.path.isdir(data):
+        return sorted(os.path.join(data, f) for f in os.listdir(data) if f.endswith('.csv'))
+    return [data]
+
+def score_files(paths, workers=None, wallet_col=None, files_per_task=None, progress=sys.stderr):
+    """Score many transaction files across a process pool.
+
+    Files are sent to workers in small batches; results come back as
+    RESULT_COLUMNS tuples in input order regardless of completion order.
+    With wallet_col and fewer files than workers (say one big CSV), each
+    file is split into wallet shards scored across the pool instead, and its
+    rows are merged back in wallet order, as score_wallets returns them.
+    """
+    workers = workers or os.cpu_count() or 1
+    if wallet_col and 1 < workers and len(paths) < workers:
+        return _score_sharded(paths, workers, wallet_col, progress)
+    # a few tasks per worker keeps the pool balanced without per-file IPC
+    files_per_task = files_per_task or max(1, min(64, len(paths) // (workers*4) or 1))
+    tasks = [paths[i:i+files_per_task] for i in range(0, len(paths), files_per_task)]
+    results = [None]*len(tasks)
+    start, done_files = time.perf_counter(), 0
+    if workers == 1:
+        done = ((i, _score_paths(t, wallet_col)) for i, t in enumerate(tasks))
+        for i, rows in done:
+            results[i] = rows
+            done_files += len(tasks[i])
+            _report(progress, done_files, len(paths), start)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_score_paths, t, wallet_col):i for i, t in enumerate(tasks)}
+            for fut in as_completed(futures):
+                i = futures[fut]
+                results[i] = fut.result()
+                done_files += len(tasks[i])
+                _report(progress, done_files, len(paths), start)
+    return [row for rows in results for row in rows]
+
+def _score_sharded(paths, workers, wallet_col, progress):
+    n_shards = max(2, workers // max(len(paths), 1))
+    results, start = [], time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # the next file loads here while the pool scores the previous one's shards
+        groups = []
+        for path in paths:
+            try:
+                shards, wallets = _shards(load_txs(path, SCORE_COLUMNS + [wallet_col]), wallet_col, n_shards)
+            except Exception as e:
+                groups.append(([], [_error_row(path, e)], {}))
+                continue
+            futures = [pool.submit(_score_shard, df, wallet_col, path) for df in shards if len(df)]
+            groups.append((futures, [], {str(w): i for i, w in enumerate(wallets)}))
+        for done_files, (futures, rows, rank) in enumerate(groups, 1):
+            for fut in futures:
+                rows.extend(fut.result())
+            rows.sort(key=lambda row: rank.get(row[0], -1))
+            results.extend(rows)
+            _report(progress, done_files, len(paths), start)
+    return results
+
+def _report(progress, done, total, start):
+    if progress is None:
+        return
+    elapsed = time.perf_counter() - start
+    rate = done/elapsed if elapsed else 0.0
+    progress.write(f'\r{done}/{total} files  {rate:.1f} files/s')
+    if done == total:
+        progress.write('\n')
+    progress.flush()
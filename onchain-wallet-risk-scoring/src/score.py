@@ -1,10 +1,22 @@
+import time
+_T0 = time.perf_counter()
 import argparse, json, os
-import pandas as pd, numpy as np
+# pandas/numpy are imported inside the functions that use them: --help and
+# cron runs that fail argument checks never pay for them
 
-def load_txs(path):
-    df = pd.read_csv(path, parse_dates=['date'])
+# columns the factor_* functions read
+SCORE_COLUMNS = ['date', 'usd_value', 'direction', 'counterparty']
+
+def load_txs(path, columns=None):
+    import pandas as pd
+    import columnar
+    if columnar.is_fresh(path):
+        df = columnar.read_columns(path, columns)
+    else:
+        df = pd.read_csv(path, parse_dates=['date'], usecols=columns)
     df['usd_value'] = df['usd_value'].fillna(0.0)
-    return df.sort_values('date')
+    # stable, so same-timestamp txs keep file order (stream.py relies on it)
+    return df.sort_values('date', kind='mergesort')
 
 def factor_low_liquidity(df):
     # proxy: many txs in tokens with small $ value per trade
@@ -14,6 +26,7 @@ def factor_low_liquidity(df):
 def factor_fresh_contracts(df):
     # proxy: many unique counterparties used once
     counts = df['counterparty'].value_counts()
+    counts = counts[counts>0]  # categorical columns also list unused categories
     fresh_ratio = (counts==1).mean()
     return fresh_ratio
 
@@ -26,12 +39,40 @@ def factor_direction_entropy(df):
 
 def factor_time_bursts(df):
     # multiple txs within 1 minute windows
+    import numpy as np
     ts = df['date'].sort_values().values.astype('datetime64[s]').astype('int64')
     if len(ts)<2: return 0.0
     diffs = np.diff(ts)
     burst = (diffs<=60).mean()
     return burst
 
+WEIGHTS = {'low_liquidity':0.25,'fresh_contracts':0.25,'direction_entropy':0.25,'time_bursts':0.25}
+
+# score < 33 is GREEN, < 66 AMBER, otherwise RED
+LABELS = ['GREEN', 'AMBER', 'RED']
+LABEL_BOUNDS = [33, 66]
+
+def label_for(score):
+    return 'GREEN' if score<LABEL_BOUNDS[0] else ('AMBER' if score<LABEL_BOUNDS[1] else 'RED')
+
+def labels_for(scores):
+    # vectorised label_for over an array of scores
+    import numpy as np
+    return np.array(LABELS)[np.searchsorted(LABEL_BOUNDS, scores, side='right')]
+
+def scores_for(frame):
+    # vectorised combine_factors: overall score per row of factor columns
+    import numpy as np
+    raw = 0
+    for k, w in WEIGHTS.items():
+        raw = raw + frame[k].values*w
+    return (np.clip(raw, 0, 1)*100).astype(int)
+
+def combine_factors(factors):
+    raw = sum(factors[k]*WEIGHTS[k] for k in factors)
+    score = int(min(max(raw,0),1)*100)
+    return score, label_for(score), factors
+
 def score_wallet(df):
     factors = {
         'low_liquidity': factor_low_liquidity(df),
@@ -39,21 +80,149 @@ def score_wallet(df):
         'direction_entropy': factor_direction_entropy(df),
         'time_bursts': factor_time_bursts(df),
     }
-    weights = {'low_liquidity':0.25,'fresh_contracts':0.25,'direction_entropy':0.25,'time_bursts':0.25}
-    raw = sum(factors[k]*weights[k] for k in factors)
-    score = int(min(max(raw,0),1)*100)
-    label = 'GREEN' if score<33 else ('AMBER' if score<66 else 'RED')
-    return score, label, factors
+    return combine_factors(factors)
+
+def score_wallets(df, wallet_col='wallet'):
+    # batch mode: all four factors for every wallet in a few bincount passes,
+    # so cost grows with total rows, not with the number of wallets
+    import pandas as pd, numpy as np
+    codes, wallets = pd.factorize(np.asarray(df[wallet_col]), sort=True)
+    n = len(wallets)
+    ts_full = df['date'].values.astype('datetime64[ns]').astype('int64')
+    # stable (wallet, date) order, same as load_txs + per-wallet slicing
+    order = np.lexsort((ts_full, codes))
+    codes = codes[order]
+    n_txs = np.bincount(codes, minlength=n)
+
+    usd = df['usd_value'].fillna(0.0).values[order]
+    low = np.bincount(codes, weights=np.abs(usd)<50, minlength=n) / np.maximum(n_txs, 1)
+
+    cp_codes, cps = pd.factorize(df['counterparty'].values[order])
+    valid = cp_codes>=0
+    pair, pair_n = np.unique(codes[valid].astype('int64')*max(len(cps),1) + cp_codes[valid], return_counts=True)
+    pair_wallet = pair // max(len(cps),1)
+    n_cp = np.bincount(pair_wallet, minlength=n)
+    n_once = np.bincount(pair_wallet, weights=pair_n==1, minlength=n)
+    fresh = np.where(n_cp>0, n_once/np.maximum(n_cp, 1), 0.0)
+
+    dirs = df['direction'].values[order]
+    d = np.where(dirs=='in', 1, np.where(dirs=='out', 0, -1))
+    dc, dv = codes[d>=0], d[d>=0]
+    n_dir = np.bincount(dc, minlength=n)
+    flip = (dc[1:]==dc[:-1]) & (dv[1:]!=dv[:-1])
+    flips = np.bincount(dc[1:][flip], minlength=n)
+    entropy = np.where(n_dir>=3, flips/np.maximum(n_dir-1, 1), 0.0)
+
+    ts = df['date'].values[order].astype('datetime64[s]').astype('int64')
+    burst = (codes[1:]==codes[:-1]) & (np.diff(ts)<=60)
+    bursts = np.bincount(codes[1:][burst], minlength=n)
+    bursty = np.where(n_txs>=2, bursts/np.maximum(n_txs-1, 1), 0.0)
+
+    out = pd.DataFrame({
+        wallet_col: wallets,
+        'low_liquidity': low,
+        'fresh_contracts': fresh,
+        'direction_entropy': entropy,
+        'time_bursts': bursty,
+    })
+    score = scores_for(out)
+    out.insert(1, 'overall_score', score)
+    out.insert(2, 'label', labels_for(score))
+    out['n_txs'] = n_txs
+    return out
+
+def profile_startup(budget_ms=None):
+    # wall time from module start, then each deferred import a scoring run pays for
+    import importlib
+    rows = [('score.py + argparse', time.perf_counter() - _T0)]
+    for name in ('numpy', 'pandas', 'columnar'):
+        t = time.perf_counter()
+        importlib.import_module(name)
+        rows.append((f'import {name}', time.perf_counter() - t))
+    total = time.perf_counter() - _T0
+    for name, dt in rows:
+        print(f'{name:24s} {dt*1e3:8.1f} ms')
+    print(f'{"total":24s} {total*1e3:8.1f} ms' + (f'  (budget {budget_ms:.0f} ms)' if budget_ms else ''))
+    return 1 if budget_ms and total*1e3 > budget_ms else 0
 
 def main():
     p = argparse.ArgumentParser()
-    p.add_argument('--data', required=True)
+    p.add_argument('--data', help='transaction CSV (or a directory of them with --workers)')
     p.add_argument('--out', default='outputs/report.json')
     p.add_argument('--explain', action='store_true')
+    p.add_argument('--wallet-col', help='score every wallet in the file, one report row per wallet')
+    p.add_argument('--stream', action='store_true', help='chunked scoring for files larger than RAM')
+    p.add_argument('--memory-limit', type=int, default=256, help='MB budget for --stream')
+    p.add_argument('--cache', action='store_true', help='ingest into the column store first if missing or stale')
+    p.add_argument('--state', help='sqlite wallet-state db: fold --data in as new txs for --wallet')
+    p.add_argument('--wallet', help='wallet id for --state')
+    p.add_argument('--profile-startup', action='store_true', help='time the imports a scoring run needs and exit')
+    p.add_argument('--startup-budget', type=float, help='ms; with --profile-startup exit 1 when over budget')
+    p.add_argument('--workers', type=int, help='process-pool batch mode: --data is a directory of CSVs, one row per file (or per wallet with --wallet-col)')
+    p.add_argument('--window', help='rolling risk time series: window length (e.g. 7D, 12h), one CSV row per window')
+    p.add_argument('--step', default='1D', help='spacing of window ends for --window')
     args = p.parse_args()
+    if args.profile_startup:
+        raise SystemExit(profile_startup(args.startup_budget))
+    if not args.data:
+        p.error('--data is required')
+    if args.state and not args.wallet:
+        p.error('--state requires --wallet')
+    if args.window and (args.state or args.stream or args.workers is not None):
+        p.error('--window cannot be combined with --state, --stream or --workers')
 
     os.makedirs('outputs', exist_ok=True)
-    df = load_txs(args.data)
+    if args.workers is not None:
+        import csv
+        from parallel import RESULT_COLUMNS, list_inputs, score_files
+        rows = score_files(list_inputs(args.data), workers=args.workers or None, wallet_col=args.wallet_col)
+        out = args.out if args.out.endswith('.csv') else os.path.splitext(args.out)[0] + '.csv'
+        with open(out, 'w', newline='') as f:
+            w = csv.writer(f)
+            w.writerow(RESULT_COLUMNS)
+            w.writerows(rows)
+        failed = sum(1 for r in rows if r[-1])
+        print(f'scored {len(rows)-failed} wallets ({failed} failed) -> {out}')
+        return
+    if args.stream:
+        from stream import score_stream
+        score, label, factors, n = score_stream(args.data, memory_limit=args.memory_limit*2**20,
+                                                flagged_path='outputs/flagged.csv' if args.explain else None)
+        report = {'overall_score':score, 'label':label, 'factors':factors, 'n_txs':n}
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+        print(json.dumps(report, indent=2))
+        return
+    if args.cache:
+        import columnar
+        if not columnar.is_fresh(args.data):
+            columnar.ingest(args.data)
+    columns = None if args.explain else SCORE_COLUMNS + ([args.wallet_col] if args.wallet_col else [])
+    df = load_txs(args.data, columns)
+    if args.state:
+        from incremental import WalletStateStore, rescore
+        store = WalletStateStore(args.state)
+        score, label, factors = rescore(store, args.wallet, df)
+        report = {'wallet':args.wallet, 'overall_score':score, 'label':label, 'factors':factors,
+                  'n_txs':store.load(args.wallet).n, 'n_new_txs':int(len(df))}
+        store.close()
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+        print(json.dumps(report, indent=2))
+        return
+    if args.window:
+        from windowed import score_windows
+        report = score_windows(df, args.window, args.step, wallet_col=args.wallet_col)
+        out = args.out if args.out.endswith('.csv') else os.path.splitext(args.out)[0] + '_windows.csv'
+        report.to_csv(out, index=False)
+        print(f'scored {len(report)} windows, {len(df)} txs -> {out}')
+        return
+    if args.wallet_col:
+        report = score_wallets(df, args.wallet_col)
+        out = args.out if args.out.endswith('.csv') else os.path.splitext(args.out)[0] + '.csv'
+        report.to_csv(out, index=False)
+        print(f'scored {len(report)} wallets, {len(df)} txs -> {out}')
+        return
     score, label, factors = score_wallet(df)
 
     report = {'overall_score':score, 'label':label, 'factors':factors, 'n_txs':int(len(df))}
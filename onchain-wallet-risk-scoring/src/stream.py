@@ -0,0 +1,190 @@
+import os, tempfile
+import pandas as pd, numpy as np
+
+from score import combine_factors
+
+def _to_seconds(ts_ns):
+    # same truncation as factor_time_bursts
+    return ts_ns.astype('datetime64[ns]').astype('datetime64[s]').astype('int64')
+
+def _dir_codes(directions):
+    return np.where(directions=='in', 1, np.where(directions=='out', 0, -1)).astype('int8')
+
+class FactorAccumulator:
+    """Running state for the four score.py factors.
+
+    Order-free parts (small-value count, counterparty counts) take chunks in any
+    order; the direction flips and time bursts need txs fed in date order via
+    add_ordered().
+    """
+
+    SCALARS = ('n', 'n_small', 'n_cp', 'n_once', 'n_dir', 'flips', 'last_dir', 'n_ts', 'bursts', 'last_ts', 'last_ns')
+
+    def __init__(self):
+        self.n = 0
+        self.n_small = 0
+        # fresh_contracts needs only these two scalars; the map may be partial
+        # (incremental.py loads just the counterparties a new batch touches)
+        self.counterparties = {}
+        self.n_cp = 0
+        self.n_once = 0
+        self.n_dir = 0
+        self.flips = 0
+        self.last_dir = None
+        self.n_ts = 0
+        self.bursts = 0
+        self.last_ts = None
+        self.last_ns = None
+
+    def add_unordered(self, usd_value, counterparty):
+        self.n += len(usd_value)
+        self.n_small += int((np.abs(usd_value)<50).sum())
+        for cp, k in pd.Series(counterparty).value_counts().items():
+            if not k:
+                continue
+            before = self.counterparties.get(cp, 0)
+            self.counterparties[cp] = before + k
+            self.n_cp += before==0
+            self.n_once += (before+k==1) - (before==1)
+
+    def add_ordered(self, ts_ns, dirs):
+        ts = _to_seconds(ts_ns)
+        if len(ts):
+            if self.last_ts is not None:
+                ts = np.concatenate(([self.last_ts], ts))
+            self.bursts += int((np.diff(ts)<=60).sum())
+            self.n_ts += len(ts_ns)
+            self.last_ts = int(ts[-1])
+            self.last_ns = int(ts_ns[-1])
+        dv = dirs[dirs>=0]
+        if len(dv):
+            if self.last_dir is not None:
+                dv = np.concatenate(([self.last_dir], dv))
+            self.flips += int((dv[1:]!=dv[:-1]).sum())
+            self.n_dir += int((dirs>=0).sum())
+            self.last_dir = int(dv[-1])
+
+    def update(self, df):
+        # df must be date-sorted and continue where the previous chunk ended
+        self.add_unordered(df['usd_value'].fillna(0.0).values, df['counterparty'].values)
+        self.add_ordered(df['date'].values.astype('datetime64[ns]').astype('int64'),
+                         _dir_codes(df['direction'].values))
+
+    def factors(self):
+        return {
+            'low_liquidity': self.n_small/self.n if self.n else float('nan'),
+            'fresh_contracts': self.n_once/self.n_cp if self.n_cp else float('nan'),
+            'direction_entropy': self.flips/(self.n_dir-1) if self.n_dir>=3 else 0.0,
+            'time_bursts': self.bursts/(self.n_ts-1) if self.n_ts>=2 else 0.0,
+        }
+
+    def score(self):
+        return combine_factors(self.factors())
+
+    def to_dict(self, counterparties=True):
+        state = {k:getattr(self, k) for k in self.SCALARS}
+        if counterparties:
+            state['counterparties'] = {str(k):int(v) for k, v in self.counterparties.items()}
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        acc = cls()
+        for k in cls.SCALARS:
+            setattr(acc, k, state[k])
+        acc.counterparties = dict(state.get('counterparties', {}))
+        return acc
+
+def rows_for_budget(path, memory_limit, sample_rows=1000):
+    # parsed-row footprint from a sample, x3 headroom for read_csv buffers
+    sample = pd.read_csv(path, nrows=sample_rows, parse_dates=['date'])
+    per_row = max(sample.memory_usage(deep=True).sum() / max(len(sample), 1), 1)
+    return max(int(memory_limit // (per_row*3)), 1000)
+
+def _merge_runs(runs, block, acc):
+    # k-way merge of sorted (ts, dir) runs in bounded blocks; ties keep file order
+    cursors = [0]*len(runs)
+    while True:
+        bufs, bound = [], None
+        for r, (ts, dirs) in enumerate(runs):
+            c = cursors[r]
+            if c>=len(ts):
+                continue
+            end = min(c+block, len(ts))
+            bufs.append((r, c, np.asarray(ts[c:end]), np.asarray(dirs[c:end])))
+            if end<len(ts):
+                key = (int(ts[end-1]), r, end-1)
+                bound = key if bound is None or key<bound else bound
+        if not bufs:
+            return
+        ts_out, dir_out, run_out, pos_out = [], [], [], []
+        for r, c, ts, dirs in bufs:
+            pos = np.arange(c, c+len(ts))
+            if bound is None:
+                keep = np.ones(len(ts), dtype=bool)
+            else:
+                bts, br, bpos = bound
+                keep = (ts<bts) | ((ts==bts) & ((r<br) | ((r==br) & (pos<=bpos))))
+            n_keep = int(keep.sum())
+            cursors[r] = c + n_keep
+            ts_out.append(ts[:n_keep]); dir_out.append(dirs[:n_keep])
+            run_out.append(np.full(n_keep, r)); pos_out.append(pos[:n_keep])
+        ts_all, run_all, pos_all = np.concatenate(ts_out), np.concatenate(run_out), np.concatenate(pos_out)
+        order = np.lexsort((pos_all, run_all, ts_all))
+        acc.add_ordered(ts_all[order], np.concatenate(dir_out)[order])
+
+def score_stream(path, memory_limit=256*2**20, chunksize=None, spill_dir=None, flagged_path=None):
+    """Score a CSV too large for load_txs in bounded memory.
+
+    Returns (score, label, factors, n_txs), identical to score_wallet(load_txs(path)).
+    Date-sorted files are scored in one pass with nothing spilled; from the
+    first out-of-order chunk on, the (date, direction) columns are spilled as
+    sorted runs (the sorted prefix is re-read once) and merged.
+    """
+    chunksize = chunksize or rows_for_budget(path, memory_limit)
+    acc, ordered = FactorAccumulator(), FactorAccumulator()
+    in_order, prev_ts = True, None
+    if flagged_path and os.path.exists(flagged_path):
+        os.remove(flagged_path)
+    with tempfile.TemporaryDirectory(dir=spill_dir) as tmp:
+        run_paths = []
+
+        def spill(ts, dirs):
+            order = np.argsort(ts, kind='stable')
+            run = os.path.join(tmp, f'run{len(run_paths)}')
+            np.save(run + '.ts.npy', ts[order]); np.save(run + '.dir.npy', dirs[order])
+            run_paths.append(run)
+
+        for i, chunk in enumerate(pd.read_csv(path, parse_dates=['date'], chunksize=chunksize)):
+            chunk['usd_value'] = chunk['usd_value'].fillna(0.0)
+            acc.add_unordered(chunk['usd_value'].values, chunk['counterparty'].values)
+            ts = chunk['date'].values.astype('datetime64[ns]').astype('int64')
+            dirs = _dir_codes(chunk['direction'].values)
+            if in_order and len(ts):
+                in_order = bool((np.diff(ts)>=0).all()) and (prev_ts is None or ts[0]>=prev_ts)
+                prev_ts = ts[-1]
+                if in_order:
+                    # the common case: nothing hits the disk
+                    ordered.add_ordered(ts, dirs)
+                else:
+                    # first out-of-order chunk: the sorted prefix was never spilled, so re-read it
+                    prefix = pd.read_csv(path, parse_dates=['date'], usecols=['date', 'direction'],
+                                         chunksize=chunksize, nrows=i*chunksize) if i else ()
+                    for old in prefix:
+                        spill(old['date'].values.astype('datetime64[ns]').astype('int64'),
+                              _dir_codes(old['direction'].values))
+            if not in_order:
+                spill(ts, dirs)
+            if flagged_path:
+                flagged = chunk[chunk['usd_value'].abs()<50]
+                flagged.to_csv(flagged_path, mode='a', index=False, header=not os.path.exists(flagged_path))
+            del chunk
+        if not in_order:
+            runs = [(np.load(r + '.ts.npy', mmap_mode='r'), np.load(r + '.dir.npy', mmap_mode='r')) for r in run_paths]
+            ordered = FactorAccumulator()
+            _merge_runs(runs, max(chunksize // max(len(runs), 1), 1024), ordered)
+            del runs
+    acc.n_dir, acc.flips, acc.last_dir = ordered.n_dir, ordered.flips, ordered.last_dir
+    acc.n_ts, acc.bursts, acc.last_ts, acc.last_ns = ordered.n_ts, ordered.bursts, ordered.last_ts, ordered.last_ns
+    score, label, factors = acc.score()
+    return score, label, factors, acc.n
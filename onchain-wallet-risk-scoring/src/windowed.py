@@ -0,0 +1,119 @@
+import numpy as np, pandas as pd
+
+from score import LABELS, labels_for, scores_for
+
+FACTORS = ('low_liquidity', 'fresh_contracts', 'direction_entropy', 'time_bursts')
+
+def _window_bounds(ts, window, step):
+    # window ends on step boundaries (epoch-aligned) from the first tx until past the
+    # last one; window k covers [end_k - window, end_k). Both edges only move forward,
+    # so [lo, hi) come from two searchsorted passes instead of a rescan per window
+    start = ts[0] - ts[0] % step
+    ends = np.arange(start + step, ts[-1] + step + 1, step, dtype='int64')
+    lo = np.searchsorted(ts, ends - window, side='left')
+    hi = np.searchsorted(ts, ends, side='left')
+    return ends, lo, hi
+
+def _prefix(flags):
+    out = np.zeros(len(flags) + 1, dtype='int64')
+    np.cumsum(flags, out=out[1:])
+    return out
+
+def _fresh_counts(cp, lo, hi):
+    # sliding distinct / seen-once counterparty counts: each row enters and leaves once
+    counts = [0] * (int(cp.max()) + 1 if len(cp) else 0)
+    cp = cp.tolist()
+    n_cp, n_once = np.zeros(len(lo), dtype='int64'), np.zeros(len(lo), dtype='int64')
+    l = h = distinct = once = 0
+    for k, (a, b) in enumerate(zip(lo.tolist(), hi.tolist())):
+        while h < b:
+            c = cp[h]
+            if c >= 0:
+                v = counts[c]
+                counts[c] = v + 1
+                if v == 0:
+                    distinct += 1; once += 1
+                elif v == 1:
+                    once -= 1
+            h += 1
+        while l < a:
+            c = cp[l]
+            if c >= 0:
+                v = counts[c]
+                counts[c] = v - 1
+                if v == 1:
+                    distinct -= 1; once -= 1
+                elif v == 2:
+                    once += 1
+            l += 1
+        n_cp[k], n_once[k] = distinct, once
+    return n_cp, n_once
+
+def score_windows(df, window='7D', step='1D', wallet_col=None, min_txs=1):
+    """Rolling-window risk time series: the four score.py factors for every window.
+
+    One row per (wallet, window end) with at least min_txs txs in
+    [window_end - window, window_end). Factors match score_wallet on the same
+    slice (fresh_contracts is 0 when a window has no counterparties, as in
+    score_wallets). Counts come from prefix sums over the date-sorted rows and
+    a two-pointer pass for counterparties, so cost is linear in rows + windows.
+    """
+    window_ns, step_ns = pd.Timedelta(window).value, pd.Timedelta(step).value
+    if window_ns <= 0 or step_ns <= 0:
+        raise ValueError('window and step must be positive')
+    ts = df['date'].values.astype('datetime64[ns]').astype('int64')
+    if wallet_col:
+        codes, wallets = pd.factorize(np.asarray(df[wallet_col]), sort=True)
+        order = np.lexsort((ts, codes))
+        codes = codes[order]
+    else:
+        order = np.argsort(ts, kind='stable')
+        codes, wallets = np.zeros(len(ts), dtype='int64'), None
+    ts = ts[order]
+
+    small = _prefix(np.abs(df['usd_value'].fillna(0.0).values[order]) < 50)
+    secs = ts // 10**9  # same truncation as factor_time_bursts
+    # pair i is (i-1, i); pairs across wallets never fall inside one window
+    burst = _prefix(np.concatenate(([False], np.diff(secs) <= 60)))
+    dirs = df['direction'].values[order]
+    d = np.where(dirs == 'in', 1, np.where(dirs == 'out', 0, -1))
+    valid = _prefix(d >= 0)  # valid[i]: directed txs before row i
+    dv = d[d >= 0]
+    flip = _prefix(np.concatenate(([False], dv[1:] != dv[:-1])))
+    cp, _ = pd.factorize(df['counterparty'].values[order])
+
+    head = [wallet_col] if wallet_col else []
+    if not len(ts):
+        return pd.DataFrame(columns=head + ['window_start', 'window_end', 'n_txs',
+                                            'overall_score', 'label', *FACTORS])
+    starts = np.flatnonzero(np.concatenate(([True], codes[1:] != codes[:-1])))
+    stops = np.append(starts[1:], len(codes))
+    bounds = []
+    for a, b in zip(starts.tolist(), stops.tolist()):
+        ends, lo, hi = _window_bounds(ts[a:b], window_ns, step_ns)
+        bounds.append((np.full(len(ends), codes[a]), ends, lo + a, hi + a))
+    wallet_codes, ends, lo, hi = (np.concatenate(x) for x in zip(*bounds))
+
+    n = hi - lo
+    nz = np.maximum(n, 1)
+    low = (small[hi] - small[lo]) / nz
+    n_cp, n_once = _fresh_counts(cp, lo, hi)
+    fresh = np.where(n_cp > 0, n_once / np.maximum(n_cp, 1), 0.0)
+    va, vb = valid[lo], valid[hi]
+    n_dir = vb - va
+    flips = flip[vb] - flip[np.minimum(va + 1, vb)]
+    entropy = np.where(n_dir >= 3, flips / np.maximum(n_dir - 1, 1), 0.0)
+    bursts = burst[hi] - burst[np.minimum(lo + 1, hi)]
+    bursty = np.where(n >= 2, bursts / np.maximum(n - 1, 1), 0.0)
+
+    out = pd.DataFrame({'window_start': pd.to_datetime(ends - window_ns),
+                        'window_end': pd.to_datetime(ends), 'n_txs': n,
+                        'low_liquidity': low, 'fresh_contracts': fresh,
+                        'direction_entropy': entropy, 'time_bursts': bursty})
+    if wallet_col:
+        out.insert(0, wallet_col, wallets[wallet_codes])
+    score = scores_for(out)
+    out.insert(out.columns.get_loc('n_txs') + 1, 'overall_score', score)
+    out.insert(out.columns.get_loc('overall_score') + 1, 'label',
+               pd.Categorical(labels_for(score), categories=LABELS))
+    return out[out['n_txs'] >= min_txs].reset_index(drop=True)
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from typing import Callable, Dict, Optional
+
+# Лимиты в сутки по тарифам и видам запросов; None — без ограничений
+# ('api' — адресов через bulk API, bulk_api.py)
+QUOTAS = {
+    'free': {'analyze': 3},
+    'pro': {'analyze': None},
+    'business': {'analyze': None, 'api': 1000},
+}
+SUBSCRIPTION_DAYS = 30
+DAY = 86400
+
+
+class _User:
+    __slots__ = ('tier', 'expires_at', 'buckets')
+
+    def __init__(self, tier: str = 'free', expires_at: float = 0.0, buckets: Dict = None):
+        self.tier = tier
+        self.expires_at = expires_at
+        self.buckets = buckets or {}  # вид запроса -> [токены, время обновления]
+
+
+class SubscriptionStore:
+    """Тарифы и суточные квоты пользователей в памяти с отложенной записью в sqlite.
+
+    Проверка квоты — token bucket на пользователя и вид запроса (ёмкость =
+    суточный лимит, пополнение равномерно за сутки): словарь и пара float,
+    без обращения к БД. Изменённые пользователи помечаются dirty и пишутся
+    одной транзакцией раз в `flush_interval` секунд; при старте всё
+    состояние читается из файла. Без `path` хранится только в памяти.
+    """
+
+    def __init__(self, path: Optional[str] = None, quotas: Dict = None, flush_interval: float = 1.0,
+                 clock: Callable[[], float] = time.time):
+        self.quotas = quotas or QUOTAS
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self._users: Dict[int, _User] = {}
+        self._dirty = set()
+        self._task = None
+        self._writing = None
+        self.db = None
+        if path:
+            # flush выполняется в отдельном потоке, но всегда не больше одного сразу
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS subscriptions (
+                    user_id INTEGER PRIMARY KEY, tier TEXT NOT NULL,
+                    expires_at REAL NOT NULL, buckets TEXT NOT NULL)
+            """)
+            self.db.commit()
+            for user_id, tier, expires_at, buckets in self.db.execute("SELECT * FROM subscriptions"):
+                self._users[user_id] = _User(tier, expires_at, json.loads(buckets))
+
+    def __len__(self):
+        return len(self._users)
+
+    def tier(self, user_id) -> str:
+        """Действующий тариф (по истечении подписки — 'free')"""
+        user = self._users.get(user_id)
+        if user is None or (user.tier != 'free' and user.expires_at <= self.clock()):
+            return 'free'
+        return user.tier
+
+    def expires_at(self, user_id) -> Optional[float]:
+        user = self._users.get(user_id)
+        return user.expires_at if user is not None and self.tier(user_id) != 'free' else None
+
+    def set_tier(self, user_id, tier: str, days: float = SUBSCRIPTION_DAYS):
+        """Активировать или продлить тариф; продление того же тарифа прибавляется к остатку"""
+        if tier not in self.quotas:
+            raise ValueError(f"unknown tier: {tier}")
+        now = self.clock()
+        user = self._users.get(user_id)
+        if user is None:
+            user = self._users[user_id] = _User()
+        start = user.expires_at if user.tier == tier and user.expires_at > now else now
+        user.tier = tier
+        user.expires_at = start + days * DAY
+        user.buckets.clear()  # новые лимиты начинаются с полной ёмкости
+        self._dirty.add(user_id)
+
+    def _limit(self, user_id, kind: str):
+        return self.quotas.get(self.tier(user_id), {}).get(kind, 0)
+
+    def try_consume(self, user_id, kind: str = 'analyze', cost: float = 1) -> bool:
+        """Списать запрос из квоты; False — лимит исчерпан"""
+        limit = self._limit(user_id, kind)
+        if limit is None:
+            return True
+        if not limit:
+            return False
+        now = self.clock()
+        user = self._users.get(user_id)
+        if user is None:
+            user = self._users[user_id] = _User()
+        bucket = user.buckets.get(kind)
+        if bucket is None:
+            tokens = limit
+        else:
+            tokens = min(limit, bucket[0] + (now - bucket[1]) * limit / DAY)
+        if tokens < cost:
+            return False
+        user.buckets[kind] = [tokens - cost, now]
+        self._dirty.add(user_id)
+        return True
+
+    def refund(self, user_id, kind: str = 'analyze', cost: float = 1):
+        """Вернуть списанное (запрос отклонён не по вине пользователя)"""
+        limit = self._limit(user_id, kind)
+        user = self._users.get(user_id)
+        if not limit or user is None or kind not in user.buckets:
+            return
+        bucket = user.buckets[kind]
+        bucket[0] = min(limit, bucket[0] + cost)
+        self._dirty.add(user_id)
+
+    def remaining(self, user_id, kind: str = 'analyze') -> Optional[int]:
+        """Сколько запросов доступно сейчас (None — без ограничений)"""
+        limit = self._limit(user_id, kind)
+        if limit is None:
+            return None
+        user = self._users.get(user_id)
+        bucket = user.buckets.get(kind) if user is not None else None
+        if bucket is None:
+            return limit
+        return int(min(limit, bucket[0] + (self.clock() - bucket[1]) * limit / DAY))
+
+    def _take_dirty(self) -> list:
+        rows = []
+        for user_id in self._dirty:
+            user = self._users[user_id]
+            rows.append((user_id, user.tier, user.expires_at, json.dumps(user.buckets)))
+        self._dirty = set()
+        return rows
+
+    def _write(self, rows: list):
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO subscriptions VALUES (?, ?, ?, ?)", rows)
+
+    def flush(self) -> int:
+        """Записать изменения синхронно; возвращает число строк"""
+        if self.db is None or not self._dirty:
+            return 0
+        rows = self._take_dirty()
+        self._write(rows)
+        return len(rows)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._dirty:
+                rows = self._take_dirty()
+                self._writing = asyncio.ensure_future(asyncio.to_thread(self._write, rows))
+                try:
+                    # shield: остановка цикла не должна бросать запись на середине
+                    await asyncio.shield(self._writing)
+                except Exception as e:
+                    logging.error(f"Subscription flush failed: {e}")
+                    self._dirty.update(row[0] for row in rows)
+
+    def start(self):
+        """Периодическая запись в фоне (нужен запущенный event loop)"""
+        if self.db is not None and self._task is None:
+            self._task = asyncio.ensure_future(self._flush_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._writing is not None:
+            await asyncio.gather(self._writing, return_exceptions=True)
+        if self.db is not None:
+            self.flush()
+            self.db.close()
+            self.db = None
@@ -0,0 +1,202 @@
+"""Генераторы синтетических данных для проверки и замеров без сети."""
+import asyncio
+import hashlib
+import json
+import random
+from typing import Dict, Iterator, List, Tuple
+
+
+def synthetic_tx_graph(n_addresses: int = 1000, n_txs: int = 5000, seed: int = 0,
+                       label_counts: Dict[str, int] = None) -> Tuple[Dict[str, List[Dict]], Dict[str, str]]:
+    """Граф транзакций в формате get_address_transactions.
+
+    Средства текут от адресов с меньшим номером к большим, так что у адресов
+    с большим номером есть многошаговая история. Метки получают первые
+    адреса (источники). Возвращает ({адрес: его транзакции}, {адрес: категория}).
+    """
+    rng = random.Random(seed)
+    label_counts = label_counts if label_counts is not None else {'exchange': 10, 'mixer': 3, 'darknet': 2}
+    addresses = [f"1syn{i:07d}" for i in range(n_addresses)]
+    labels, i = {}, 0
+    for category, count in label_counts.items():
+        for _ in range(count):
+            if i < n_addresses:
+                labels[addresses[i]] = category
+                i += 1
+
+    by_address: Dict[str, List[Dict]] = {a: [] for a in addresses}
+    for t in range(n_txs):
+        hi = rng.randrange(2, n_addresses)
+        senders = rng.sample(range(hi), k=min(rng.randint(1, 3), hi))
+        receivers = {rng.randrange(min(senders) + 1, n_addresses) for _ in range(rng.randint(1, 3))}
+        inputs = [{'address': addresses[s], 'value': round(rng.uniform(0.01, 2), 8)} for s in senders]
+        total = sum(inp['value'] for inp in inputs)
+        outputs = [{'address': addresses[r], 'value': round(total / len(receivers) * 0.999, 8), 'spent': False}
+                   for r in receivers]
+        tx = {'hash': f"synthtx{t:08d}", 'time': 1_600_000_000 + t * 60, 'confirmations': t,
+              'inputs': inputs, 'outputs': outputs}
+        for address in {inp['address'] for inp in inputs} | {out['address'] for out in outputs}:
+            by_address[address].append(tx)
+    return by_address, labels
+
+
+def graph_fetcher(by_address: Dict[str, List[Dict]], delay: float = 0.0, calls: List = None):
+    """Fetcher для TaintEngine поверх synthetic_tx_graph (delay — имитация сети)"""
+    async def fetch(addresses: List[str]) -> Dict[str, List[Dict]]:
+        if calls is not None:
+            calls.append(list(addresses))
+        if delay:
+            await asyncio.sleep(delay)
+        return {a: by_address.get(a, []) for a in addresses}
+
+    return fetch
+
+
+def synthetic_tx_frame(n_rows: int, n_counterparties: int = None, burstiness: float = 0.1,
+                       seed: int = 0, start: str = '2025-01-01'):
+    """Таблица транзакций в формате data/sample_tx.csv (pandas DataFrame).
+
+    n_counterparties — размер пула контрагентов (по умолчанию n_rows // 3),
+    частоты убывают по Ципфу, так что часть контрагентов встречается один раз.
+    burstiness — доля транзакций, идущих меньше чем через минуту после предыдущей.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    n_counterparties = max(1, n_counterparties or n_rows // 3)
+    gaps = np.where(rng.random(n_rows) < burstiness,
+                    rng.integers(0, 61, n_rows), rng.exponential(3600, n_rows).astype(np.int64) + 61)
+    dates = np.datetime64(start, 's') + np.cumsum(gaps).astype('timedelta64[s]')
+    cp = (rng.zipf(1.3, n_rows) - 1) % n_counterparties
+    return pd.DataFrame({
+        'date': dates,
+        'tx_hash': pd.Series(rng.integers(0, 2**40, n_rows)).map('0x{:010x}'.format),
+        'token': rng.choice(np.array(['USDT', 'ETH', 'RABBIT']), n_rows),
+        'amount': rng.random(n_rows) * 10,
+        'usd_value': np.where(rng.random(n_rows) < 0.02, np.nan, rng.lognormal(4, 1.5, n_rows)),
+        'direction': rng.choice(np.array(['in', 'out', 'self']), n_rows, p=[0.45, 0.45, 0.1]),
+        'counterparty': pd.Series(cp).map('0x{:06x}'.format),
+        'tags': '',
+    })
+
+
+def write_tx_csv(path: str, n_rows: int, chunk_rows: int = 1_000_000, seed: int = 0, **kwargs) -> int:
+    """synthetic_tx_frame кусками в CSV — для таблиц больше памяти (до 100M строк)"""
+    import pandas as pd
+
+    written, chunk, start = 0, 0, kwargs.pop('start', '2025-01-01')
+    while written < n_rows:
+        df = synthetic_tx_frame(min(chunk_rows, n_rows - written), seed=seed + chunk, start=start, **kwargs)
+        df.to_csv(path, mode='w' if chunk == 0 else 'a', header=chunk == 0, index=False)
+        start = str(df['date'].iloc[-1] + pd.Timedelta(seconds=1))
+        written += len(df)
+        chunk += 1
+    return written
+
+
+_B58 = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+
+def synthetic_btc_addresses(n: int, seed: int = 0) -> List[str]:
+    """Валидные (по контрольной сумме) P2PKH адреса из случайных hash160"""
+    rng = random.Random(seed)
+    addresses = []
+    for _ in range(n):
+        payload = b'\x00' + rng.randbytes(20)
+        raw = payload + hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:4]
+        num, chars = int.from_bytes(raw, 'big'), []
+        while num:
+            num, rem = divmod(num, 58)
+            chars.append(_B58[rem])
+        zeros = len(raw) - len(raw.lstrip(b'\x00'))  # каждый ведущий нулевой байт — '1'
+        addresses.append('1' * zeros + ''.join(reversed(chars)))
+    return addresses
+
+
+def synthetic_rawaddr(address: str, n_tx: int = 50, seed: int = 0, labeled_share: float = 0.3) -> Dict:
+    """Ответ blockchain.info /rawaddr для адреса (суммы в сатоши).
+
+    Около половины транзакций входящие; доля labeled_share отправителей
+    попадает под префиксы и подстроки FundsOriginAnalyzer.KNOWN_ADDRESSES,
+    часть сумм — в диапазон награды за блок.
+    """
+    rng = random.Random(seed)
+    labeled = ['1LDsyn', '3J9syn', 'bc1qsyn', '1Miningsyn', '1Poolsyn']
+    received = sent = 0
+    txs = []
+    for t in range(n_tx):
+        incoming = rng.random() < 0.5
+        if incoming:
+            prefix = rng.choice(labeled) if rng.random() < labeled_share else '1src'
+            sender = f"{prefix}{rng.randrange(10 ** 6):06d}"
+            value = 625_000_000 + rng.randrange(10 ** 7) if rng.random() < 0.05 else rng.randrange(10 ** 4, 10 ** 9)
+            inputs = [{'prev_out': {'addr': sender, 'value': value + 1000, 'spent': True}}]
+            outs = [{'addr': address, 'value': value, 'spent': rng.random() < 0.5}]
+            received += value
+        else:
+            value = rng.randrange(10 ** 4, 10 ** 8)
+            inputs = [{'prev_out': {'addr': address, 'value': value + 1000, 'spent': True}}]
+            outs = [{'addr': f"1dst{rng.randrange(10 ** 6):06d}", 'value': value, 'spent': False}]
+            sent += value + 1000
+        txs.append({'hash': f"{seed:08x}{t:056x}", 'time': 1_700_000_000 - t * 600,
+                    'block_height': 900_000 - t, 'result': value if incoming else -value,
+                    'inputs': inputs, 'out': outs})
+    return {'address': address, 'n_tx': n_tx, 'total_received': received, 'total_sent': sent,
+            'final_balance': received - sent, 'txs': txs}
+
+
+def synthetic_chain(n_blocks: int = 100, txs_per_block: int = 50, n_addresses: int = 1000, seed: int = 0,
+                    start_height: int = 0, start_time: int = 1_600_000_000) -> Iterator[Dict]:
+    """Блоки в формате blockchain.info /rawblock (суммы в сатоши), от старых к новым.
+
+    Монеты сохраняются: блок начинается с coinbase (награда майнеру из первых
+    десяти адресов), остальные транзакции тратят 1-3 непотраченных выхода
+    одного владельца и платят 1-2 получателям со сдачей минус комиссия.
+    Балансы, посчитанные по всей цепочке, равны сумме непотраченных выходов.
+    """
+    rng = random.Random(seed)
+    addresses = synthetic_btc_addresses(n_addresses, seed=seed)
+    utxos: Dict[str, List[int]] = {}  # адрес -> суммы непотраченных выходов
+    for height in range(start_height, start_height + n_blocks):
+        time = start_time + height * 600
+        miner = addresses[rng.randrange(min(10, n_addresses))]
+        reward = 625_000_000
+        txs = [{'hash': f"{seed:08x}{height:024x}{0:032x}", 'time': time, 'block_height': height,
+                'inputs': [], 'out': [{'addr': miner, 'value': reward, 'spent': False, 'n': 0}]}]
+        utxos.setdefault(miner, []).append(reward)
+        owners = [a for a, coins in utxos.items() if coins]
+        for t in range(1, txs_per_block):
+            sender = rng.choice(owners)
+            coins = utxos[sender]
+            if not coins:
+                continue
+            spent = [coins.pop(rng.randrange(len(coins))) for _ in range(min(rng.randint(1, 3), len(coins)))]
+            total = sum(spent)
+            fee = min(total // 100, 10_000)
+            outputs, left = [], total - fee
+            for _ in range(rng.randint(1, 2)):
+                value = rng.randrange(1, left + 1) if left > 1 else left
+                outputs.append((rng.choice(addresses), value))
+                left -= value
+                if not left:
+                    break
+            if left:
+                outputs.append((sender, left))
+            for address, value in outputs:
+                utxos.setdefault(address, []).append(value)
+            txs.append({'hash': f"{seed:08x}{height:024x}{t:032x}", 'time': time, 'block_height': height,
+                        'inputs': [{'prev_out': {'addr': sender, 'value': value, 'spent': True}} for value in spent],
+                        'out': [{'addr': address, 'value': value, 'spent': False, 'n': n}
+                                for n, (address, value) in enumerate(outputs)]})
+        yield {'hash': f"{seed:08x}{height:056x}", 'height': height, 'time': time, 'tx': txs}
+
+
+def write_chain(path: str, n_blocks: int, **kwargs) -> int:
+    """synthetic_chain в NDJSON (блок на строку) для chain_index.py; возвращает число транзакций"""
+    n_txs = 0
+    with open(path, 'w') as f:
+        for block in synthetic_chain(n_blocks, **kwargs):
+            f.write(json.dumps(block, separators=(',', ':')) + '\n')
+            n_txs += len(block['tx'])
+    return n_txs
@@ -0,0 +1,199 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from funds_origin import FundsOriginAnalyzer
+
+# fetch(addresses) -> {адрес: транзакции в формате get_address_transactions}
+Fetcher = Callable[[List[str]], Awaitable[Dict[str, List[Dict]]]]
+
+
+def checker_fetcher(checker, limit: int = 50, concurrency: int = 20) -> Fetcher:
+    """Fetcher поверх AsyncBitcoinAddressChecker.get_address_transactions"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch_one(address: str):
+        async with semaphore:
+            return await checker.get_address_transactions(address, limit=limit)
+
+    async def fetch(addresses: List[str]) -> Dict[str, List[Dict]]:
+        results = await asyncio.gather(*(fetch_one(a) for a in addresses))
+        return dict(zip(addresses, results))
+
+    return fetch
+
+
+def incoming_edges(address: str, transactions: Iterable[Dict]) -> Dict[str, float]:
+    """Сколько средств пришло на адрес от каждого отправителя.
+
+    Полученная сумма делится между входами транзакции пропорционально их
+    стоимости; транзакции, где адрес сам среди входов (сдача), пропускаются.
+    """
+    edges: Dict[str, float] = {}
+    for tx in transactions:
+        inputs = [inp for inp in tx.get('inputs', []) if inp.get('address')]
+        if any(inp['address'] == address for inp in inputs):
+            continue
+        received = sum(out.get('value', 0) for out in tx.get('outputs', []) if out.get('address') == address)
+        total_in = sum(inp.get('value', 0) for inp in inputs)
+        if received <= 0 or total_in <= 0:
+            continue
+        for inp in inputs:
+            edges[inp['address']] = edges.get(inp['address'], 0) + received * inp.get('value', 0) / total_in
+    return edges
+
+
+class TaintEngine:
+    """Многошаговое распространение риска по графу транзакций назад от адреса.
+
+    Граф раскрывается по уровням (frontier): все адреса очередного шага
+    запрашиваются одной пачкой, пока не исчерпан лимит шагов или узлов.
+    Входящие рёбра хранятся в CSR-массивах (indptr/indices/weights), риск
+    распространяется матричными операциями по всем узлам сразу.
+
+    mode='haircut' — доля категории пропорциональна доле средств;
+    mode='poison'  — любая примесь категории передаётся целиком.
+    Адреса с меткой — источники (не раскрываются дальше); средства, чьё
+    происхождение не выяснено за max_hops шагов, попадают в 'unresolved'.
+    """
+
+    def __init__(self, fetch: Fetcher, labeler: Optional[Callable[[str], Optional[str]]] = None,
+                 max_hops: int = 3, node_budget: int = 500, mode: str = 'haircut',
+                 fetch_batch: int = 50):
+        if mode not in ('haircut', 'poison'):
+            raise ValueError(f"unknown taint mode: {mode}")
+        self.fetch = fetch
+        self.labeler = labeler or FundsOriginAnalyzer().lookup_label
+        self.max_hops = max_hops
+        self.node_budget = node_budget
+        self.mode = mode
+        self.fetch_batch = fetch_batch
+        self.categories = list(FundsOriginAnalyzer.CATEGORIES)
+        self.weights = np.array([FundsOriginAnalyzer.CATEGORIES[c]['risk_weight'] for c in self.categories])
+        # Раскрытые адреса и их входящие рёбра общие для всех запросов движка
+        self._ids: Dict[str, int] = {}
+        self._addresses: List[str] = []
+        self._labels: List[int] = []  # индекс категории или -1
+        self._incoming: Dict[int, Dict[int, float]] = {}
+        self._memo: Dict[tuple, Dict] = {}
+        self.stats = {'fetched': 0, 'fetch_calls': 0, 'memo_hits': 0}
+
+    def _node(self, address: str) -> int:
+        node = self._ids.get(address)
+        if node is None:
+            node = self._ids[address] = len(self._addresses)
+            self._addresses.append(address)
+            label = self.labeler(address)
+            self._labels.append(self.categories.index(label) if label in self.categories else -1)
+        return node
+
+    async def _expand(self, target: int) -> tuple:
+        """Раскрыть граф от target по уровням.
+
+        Возвращает (глубина, обрезано ли по бюджету, раскрытых узлов в графе
+        этого запроса, из них запрошено сейчас); бюджет — на новые запросы.
+        """
+        frontier, seen = [target], {target}
+        truncated, expanded, fetched_now = False, 0, 0
+        for hop in range(self.max_hops):
+            todo = [n for n in frontier if self._labels[n] < 0 and n not in self._incoming]
+            budget = self.node_budget - fetched_now
+            if len(todo) > budget:
+                todo, truncated = todo[:max(budget, 0)], True
+            fetched_now += len(todo)
+            for i in range(0, len(todo), self.fetch_batch):
+                batch = [self._addresses[n] for n in todo[i:i + self.fetch_batch]]
+                self.stats['fetch_calls'] += 1
+                self.stats['fetched'] += len(batch)
+                fetched = await self.fetch(batch)
+                for address in batch:
+                    edges = incoming_edges(address, fetched.get(address) or [])
+                    self._incoming[self._ids[address]] = {self._node(src): value for src, value in edges.items()
+                                                           if src != address}
+            next_frontier = []
+            for n in frontier:
+                if n in self._incoming:
+                    expanded += 1
+                for src in self._incoming.get(n, ()):
+                    if src not in seen:
+                        seen.add(src)
+                        next_frontier.append(src)
+            if not next_frontier:
+                return hop + 1, truncated, expanded, fetched_now
+            frontier = next_frontier
+        return self.max_hops, truncated, expanded, fetched_now
+
+    def _csr(self):
+        n = len(self._addresses)
+        dst, src, val = [], [], []
+        for d, edges in self._incoming.items():
+            for s, v in edges.items():
+                dst.append(d)
+                src.append(s)
+                val.append(v)
+        dst = np.array(dst, dtype=np.int64)
+        order = np.argsort(dst, kind='stable')
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(dst, minlength=n), out=indptr[1:])
+        return indptr, np.array(src, dtype=np.int64)[order], np.array(val, dtype=float)[order]
+
+    def _propagate(self, hops: int) -> np.ndarray:
+        """Экспозиция (узлы x категории+unresolved) после `hops` шагов"""
+        n, k = len(self._addresses), len(self.categories)
+        indptr, indices, weights = self._csr()
+        labels = np.array(self._labels, dtype=np.int64)
+        labeled = labels >= 0
+        has_in = indptr[1:] > indptr[:-1]
+
+        base = np.zeros((n, k + 1))
+        base[np.flatnonzero(labeled), labels[labeled]] = 1.0
+        base[~labeled, k] = 1.0  # пока ничего не известно — всё unresolved
+        exposure = base.copy()
+        if not has_in.any():
+            return exposure
+        starts = indptr[:-1][has_in]
+        update = has_in & ~labeled
+        # доля каждого ребра во входящем потоке узла (строки CSR)
+        share = weights / np.repeat(np.add.reduceat(weights, starts), np.diff(indptr)[has_in])
+        for _ in range(hops):
+            contrib = exposure[indices]
+            if self.mode == 'haircut':
+                mixed = np.add.reduceat(contrib * share[:, None], starts, axis=0)
+            else:
+                mixed = np.maximum.reduceat(contrib, starts, axis=0)
+            exposure = base.copy()
+            exposure[update] = mixed[update[has_in]]
+        return exposure
+
+    async def analyze(self, address: str) -> Dict:
+        """Экспозиция адреса по категориям и итоговый риск 0..1"""
+        key = (address, self.max_hops, self.mode)
+        if key in self._memo:
+            self.stats['memo_hits'] += 1
+            return self._memo[key]
+        target = self._node(address)
+        depth, truncated, expanded, fetched = await self._expand(target)
+        exposure = self._propagate(self.max_hops)[target]
+        known = exposure[:-1]
+        if self.mode == 'haircut':
+            risk = float(known @ self.weights)
+        else:
+            risk = float((known * self.weights).max()) if len(known) else 0.0
+        result = {
+            'address': address,
+            'mode': self.mode,
+            'taint': round(risk, 4),
+            'exposure': {cat: round(float(v), 4) for cat, v in zip(self.categories, known) if v > 0},
+            'unresolved': round(float(exposure[-1]), 4),
+            'hops': depth,
+            'nodes_expanded': expanded,
+            'nodes_fetched': fetched,
+            'truncated': truncated,
+        }
+        self._memo[key] = result
+        return result
+
+    async def analyze_many(self, addresses: List[str]) -> List[Dict]:
+        """Несколько адресов подряд: раскрытый граф и мемо переиспользуются"""
+        return [await self.analyze(address) for address in addresses]
@@ -0,0 +1,34 @@
+import random
+
+import address_validaitor
+from address_validaitor import AddressValidator, keccak256, keccak256_many
+
+
+def test_keccak256_known_vectors():
+    assert keccak256(b'').hex() == 'c5d2460186f7233c927e7db2dcc703c0e500b653ca82273b7bfad8045d85a470'
+    assert keccak256(b'abc').hex() == '4e03657aea45a94fc7d47ba826c8d667c0d1e6e33a64a036ec44f58fa12d6c45'
+
+
+def test_keccak256_many_matches_single():
+    rng = random.Random(0)
+    items = [bytes(rng.getrandbits(8) for _ in range(n)) for n in list(range(136)) + [136, 300]]
+    assert keccak256_many(items) == [keccak256(data) for data in items]
+
+
+def test_eip55_checksum_single_and_batch():
+    good = ['0x5aAeb6053F3E94C9b9A09f33669435E7Ef1BeAed', '0xfB6916095ca1df60bB79Ce92cE3Ea74c37c5d359',
+            '0xdbF03B407c01E7cD3CBea99509d93f8DDDC8C6FB', '0xD1220A0cf47c7B9Be7A2E6BA89F429762e7b9aDb']
+    # одна буква в другом регистре
+    bad = []
+    for address in good:
+        i = next(i for i in range(2, 42) if address[i].isalpha())
+        bad.append(address[:i] + address[i].swapcase() + address[i + 1:])
+    for address in good:
+        assert AddressValidator.validate_address(address) == {'is_valid': True, 'chain': 'ETH', 'details': {}}
+    for address in bad:
+        assert not AddressValidator.validate_address(address)['is_valid']
+
+    address_validaitor._EIP55_DIGESTS.clear()
+    batch = (good + bad) * 10
+    results = AddressValidator.validate_addresses(batch)
+    assert [r['is_valid'] for r in results] == [address in good for address in batch]
@@ -0,0 +1,58 @@
+import asyncio
+import socket
+
+from async_bitcoin_checker import AsyncBitcoinAddressChecker
+from bitcoin_checker import parse_balance
+from cache import TTLCache
+from fake_blockchain import FakeBlockchainInfo
+from synthetic import synthetic_btc_addresses
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def test_balances_and_paginated_history_over_one_session():
+    address = synthetic_btc_addresses(1, seed=11)[0]
+
+    async def run():
+        fake = FakeBlockchainInfo(n_tx=130)
+        await fake.start(free_port())
+        checker = AsyncBitcoinAddressChecker(api_url=fake.api_url, pool_size=4)
+        cache = TTLCache('transactions')
+        try:
+            balance = await checker.check_address_balance(address)
+            session = checker._session
+            pages = [batch async for batch in checker.iter_address_batches(
+                address, page_size=50, max_txs=120, page_cache=cache)]
+            calls = dict(fake.calls)
+            # повтор: первая страница — из page_cache
+            again = [batch async for batch in checker.iter_address_batches(
+                address, page_size=50, max_txs=120, page_cache=cache)]
+            return balance, pages, again, calls, dict(fake.calls), checker._session is session, fake
+        finally:
+            await checker.close()
+            await fake.close()
+
+    balance, pages, again, calls, calls_again, same_session, fake = asyncio.run(run())
+    raw = fake._rawaddr(address)
+    assert balance == parse_balance(address, raw)
+    assert [len(page) for page in pages] == [50, 50, 20]
+    assert [h for page in pages for h in page.hashes] == [tx['hash'] for tx in raw['txs'][:120]]
+    assert [h for page in again for h in page.hashes] == [h for page in pages for h in page.hashes]
+    assert calls['rawaddr'] == 3 and calls_again['rawaddr'] == 5
+    assert same_session
+
+
+def test_unreachable_api_reports_failure():
+    async def run():
+        checker = AsyncBitcoinAddressChecker(api_url=f'http://127.0.0.1:{free_port()}', timeout=2)
+        try:
+            return await checker.check_address_balance('1BvBMSEYstWetqTFn5Au4m4GFg7xJaNVN2')
+        finally:
+            await checker.close()
+
+    result = asyncio.run(run())
+    assert result['success'] is False and result['error']
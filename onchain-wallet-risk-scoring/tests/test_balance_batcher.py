@@ -0,0 +1,51 @@
+import asyncio
+
+from balance_batcher import BalanceBatcher
+from synthetic import synthetic_btc_addresses
+
+
+class FakeChecker:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.batches = []
+
+    async def check_balances(self, addresses):
+        self.batches.append(list(addresses))
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise ConnectionError('upstream down')
+        return {address: {'success': True, 'address': address} for address in addresses}
+
+
+def test_concurrent_lookups_are_coalesced_and_deduplicated():
+    addresses = synthetic_btc_addresses(230, seed=12)
+    checker = FakeChecker()
+
+    async def run():
+        batcher = BalanceBatcher(checker, window=0.05)
+        # параллельные /analyze, часть адресов запрашивается дважды
+        requested = addresses + addresses[:20]
+        results = await asyncio.gather(*(batcher.check_address_balance(a) for a in requested))
+        await batcher.close()
+        return requested, results, batcher.stats
+
+    requested, results, stats = asyncio.run(run())
+    assert [r['address'] for r in results] == requested
+    assert sorted(len(batch) for batch in checker.batches) == [30, 100, 100]
+    assert sorted(a for batch in checker.batches for a in batch) == sorted(addresses)
+    assert stats['deduplicated'] == 20 and stats['upstream_calls'] == 3
+
+
+def test_upstream_error_answers_every_waiter():
+    checker = FakeChecker(fail=True)
+
+    async def run():
+        batcher = BalanceBatcher(checker)
+        results = await asyncio.gather(*(batcher.check_address_balance(a)
+                                         for a in synthetic_btc_addresses(3, seed=13)))
+        await batcher.close()
+        return results
+
+    results = asyncio.run(run())
+    assert len(checker.batches) == 1
+    assert all(r == {'success': False, 'error': 'upstream down'} for r in results)
@@ -0,0 +1,53 @@
+import argparse
+import json
+
+import pandas as pd
+
+import bench
+from address_validaitor import AddressValidator
+from synthetic import synthetic_btc_addresses, synthetic_chain, synthetic_rawaddr, synthetic_tx_frame, write_tx_csv
+
+
+def test_generators_are_seeded_and_consistent(tmp_path):
+    assert synthetic_tx_frame(300, seed=18).equals(synthetic_tx_frame(300, seed=18))
+    addresses = synthetic_btc_addresses(50, seed=18)
+    assert all(check['is_valid'] and check['chain'] == 'BTC' for check in AddressValidator.validate_addresses(addresses))
+
+    raw = synthetic_rawaddr(addresses[0], n_tx=40, seed=18)
+    assert len(raw['txs']) == raw['n_tx'] == 40
+    assert raw['final_balance'] == raw['total_received'] - raw['total_sent']
+
+    # write_tx_csv: куски продолжают друг друга по времени
+    path = str(tmp_path / 'txs.csv')
+    assert write_tx_csv(path, 2500, chunk_rows=1000, seed=18) == 2500
+    dates = pd.read_csv(path, parse_dates=['date'])['date']
+    assert len(dates) == 2500 and dates.is_monotonic_increasing
+
+    # монеты в synthetic_chain сохраняются: выпущено = непотрачено + комиссии
+    minted = fees = unspent = 0
+    for block in synthetic_chain(n_blocks=20, txs_per_block=20, n_addresses=50, seed=18):
+        for tx in block['tx']:
+            paid_in = sum(inp['prev_out']['value'] for inp in tx['inputs'])
+            paid_out = sum(out['value'] for out in tx['out'])
+            if tx['inputs']:
+                fees += paid_in - paid_out
+                unspent -= paid_in
+            else:
+                minted += paid_out
+            unspent += paid_out
+    assert minted == unspent + fees
+
+
+def test_run_and_compare(tmp_path):
+    args = argparse.Namespace(sizes=[500], repeat=1, seed=0, counterparties=None, burstiness=0.1,
+                              btc_max=0, only='score_wallet,load_txs')
+    result = bench.run(args)
+    assert sorted(r['name'] for r in result['results']) == ['load_txs', 'score_wallet']
+    assert all(r['size'] == 500 and 0 < r['best_s'] <= r['median_s'] for r in result['results'])
+
+    old, new = tmp_path / 'old.json', tmp_path / 'new.json'
+    old.write_text(json.dumps(result))
+    slower = {**result, 'results': [{**r, 'best_s': r['best_s'] * 2} for r in result['results']]}
+    new.write_text(json.dumps(slower))
+    assert bench.compare(str(old), str(old), threshold=1.1) == 0
+    assert bench.compare(str(old), str(new), threshold=1.1) == 1
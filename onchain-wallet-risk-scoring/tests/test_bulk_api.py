@@ -0,0 +1,114 @@
+import asyncio
+import json
+
+from bulk_api import BulkAnalysisAPI
+from job_queue import AnalysisQueue
+from subscriptions import SubscriptionStore
+from synthetic import synthetic_btc_addresses
+
+
+def fake_result(address):
+    return {'total_risk': 10, 'balance': {'balance_btc': 0.5, 'transaction_count': 3},
+            'origin_analysis': {}, 'risk_factors': []}
+
+
+async def post(api, body, key='k'):
+    from aiohttp import web
+    from aiohttp.test_utils import TestClient, TestServer
+
+    app = web.Application()
+    app.router.add_post(api.path, api.handle_analyze)
+    async with TestClient(TestServer(app)) as client:
+        response = await client.post(api.path, json=body, headers={'X-API-Key': key})
+        text = await response.text()
+        if response.status != 200:
+            return response.status, json.loads(text)
+        return response.status, [json.loads(line) for line in text.splitlines()]
+
+
+def business_store(now):
+    store = SubscriptionStore(quotas={'business': {'api': 10}, 'free': {}}, clock=lambda: now[0])
+    store.set_tier(1, 'business')
+    return store
+
+
+def test_quota_charged_per_address_and_refunded_for_failures():
+    now = [1_000_000.0]
+    store = business_store(now)
+    good, bad = synthetic_btc_addresses(6, seed=1)[:4], synthetic_btc_addresses(6, seed=1)[4:]
+
+    async def analyze(chain, address):
+        if address in bad:
+            raise RuntimeError('upstream down')
+        return fake_result(address)
+
+    api = BulkAnalysisAPI(analyze, store, {'k': 1})
+    # повтор и невалидный адрес квоту не расходуют
+    status, lines = asyncio.run(post(api, {'addresses': good + bad + [good[0], 'nope']}))
+    assert status == 200
+    summary = lines[-1]['summary']
+    assert (summary['ok'], summary['error'], summary['invalid']) == (5, 2, 1)
+    assert store.remaining(1, 'api') == 10 - len(good)
+
+    status, body = asyncio.run(post(api, {'addresses': synthetic_btc_addresses(7, seed=2)}))
+    assert status == 429 and body['required'] == 7 and body['remaining'] == 6
+
+
+def test_bulk_runs_through_shared_queue():
+    now = [1_000_000.0]
+    store = business_store(now)
+    addresses = synthetic_btc_addresses(10, seed=3)
+    running, peak = [0], [0]
+
+    async def analyze(chain, address):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        return fake_result(address)
+
+    async def run():
+        queue = AnalysisQueue(workers=4, max_queue=50, per_user_tier={'bulk': 3})
+        api = BulkAnalysisAPI(analyze, store, {'k': 1}, per_request=8, queue=queue)
+        try:
+            return await post(api, {'addresses': addresses}), queue.stats
+        finally:
+            await queue.close()
+
+    (status, lines), stats = asyncio.run(run())
+    assert status == 200 and lines[-1]['summary']['ok'] == 10
+    assert stats['submitted'] == 10 and stats['completed'] == 10
+    # задачи идут от владельца ключа: его per-user лимит меньше и воркеров, и per_request
+    assert peak[0] == 3
+
+
+def test_bulk_yields_to_interactive_jobs():
+    now = [1_000_000.0]
+    store = business_store(now)
+    addresses = synthetic_btc_addresses(4, seed=5)
+    order = []
+
+    async def run():
+        first = asyncio.Event()
+
+        async def analyze(chain, address):
+            order.append(address)
+            first.set()
+            await asyncio.sleep(0.01)
+            return fake_result(address)
+
+        queue = AnalysisQueue(workers=1, max_queue=2, per_user_tier={'bulk': 2})
+        api = BulkAnalysisAPI(analyze, store, {'k': 1}, queue=queue)
+        try:
+            bulk = asyncio.ensure_future(post(api, {'addresses': addresses}))
+            await first.wait()
+            # бесплатный /analyze, пока bulk-задача выполняется, а следующая ждёт в очереди
+            ticket = queue.submit(('BTC', 'interactive'), lambda: analyze('BTC', 'interactive'), user_id=99)
+            await ticket.result()
+            return await bulk, queue.stats
+        finally:
+            await queue.close()
+
+    (status, lines), stats = asyncio.run(run())
+    assert status == 200 and lines[-1]['summary']['ok'] == 4
+    assert order[1] == 'interactive' and stats['shed'] == 0
@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+from cache import SqliteCacheBackend, TTLCache
+from tx_batch import TxBatch
+
+
+def test_ttl_expiry_and_lru_eviction():
+    now = [1000.0]
+    cache = TTLCache('t', maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1  # 'a' становится самой свежей
+    cache.set('c', 3)
+    assert cache.get('b') is None and cache.stats['evictions'] == 1
+    assert cache.get('a') == 1 and cache.get('c') == 3
+
+    now[0] += 10
+    assert cache.get('a') is None
+    assert cache.stats['expired'] == 1 and cache.stats['hits'] == 3 and cache.stats['misses'] == 2
+
+
+def test_backend_survives_restart_without_blocking_writes(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    batch = TxBatch()
+    batch.append('h1', 1_600_000_000, 7, [('1Payer', 30_000)], [('1Wallet', 20_000, False)])
+    now = [time.time()]  # просроченные записи удаляются при открытии по реальным часам
+
+    async def first_run():
+        backend = SqliteCacheBackend(path, flush_interval=0.01)
+        backend.start()
+        pages = TTLCache('transactions', ttl=60, backend=backend, clock=lambda: now[0])
+        reports = TTLCache('report', ttl=60, backend=backend, clock=lambda: now[0])
+        pages.set('1Wallet:0:50', (1, batch))
+        reports.set('1Wallet', {'total_risk': 12.5, 'risk_factors': ['x']})
+        reports.set('gone', {'total_risk': 1})
+        reports.delete('gone')
+        # до записи файл даже не открыт, но второй кэш того же backend уже видит значения
+        assert backend.db is None
+        assert TTLCache('report', backend=backend, clock=lambda: now[0]).get('1Wallet')['total_risk'] == 12.5
+        await asyncio.sleep(0.05)
+        assert backend.db.execute("SELECT COUNT(*) FROM cache").fetchone()[0] == 2
+        await backend.close()
+
+    asyncio.run(first_run())
+
+    backend = SqliteCacheBackend(path)
+    pages = TTLCache('transactions', ttl=60, backend=backend, clock=lambda: now[0])
+    reports = TTLCache('report', ttl=60, backend=backend, clock=lambda: now[0])
+    n_tx, cached = pages.get('1Wallet:0:50')
+    assert n_tx == 1 and isinstance(cached, TxBatch)
+    assert cached.to_dicts() == batch.to_dicts() and cached.find('1Payer') == batch.find('1Payer')
+    assert reports.get('1Wallet') == {'total_risk': 12.5, 'risk_factors': ['x']}
+    assert reports.get('gone') is None
+    now[0] += 60
+    assert TTLCache('report', backend=backend, clock=lambda: now[0]).get('1Wallet') is None
+    asyncio.run(backend.close())
@@ -0,0 +1,143 @@
+import asyncio
+from collections import defaultdict
+
+import pytest
+
+from async_bitcoin_checker import AsyncBitcoinAddressChecker
+from bitcoin_checker import BitcoinAddressChecker
+from chain_index import ChainIndex, iter_txs
+from synthetic import synthetic_chain, synthetic_rawaddr, write_chain
+
+
+def chain_totals(blocks):
+    """{адрес: [n_tx, получено, отправлено]} прямым проходом по блокам"""
+    totals = defaultdict(lambda: [0, 0, 0])
+    for block in blocks:
+        for tx in iter_txs(block):
+            touched = set()
+            for inp in tx['inputs']:
+                totals[inp['prev_out']['addr']][2] += inp['prev_out']['value']
+                touched.add(inp['prev_out']['addr'])
+            for out in tx['out']:
+                totals[out['addr']][1] += out['value']
+                touched.add(out['addr'])
+            for address in touched:
+                totals[address][0] += 1
+    return totals
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = ChainIndex(str(tmp_path / 'chain.db'), batch_size=500)
+    yield index
+    index.close()
+
+
+def test_balances_match_chain_totals(index, tmp_path):
+    path = str(tmp_path / 'blocks.ndjson')
+    n_txs = write_chain(path, 60, txs_per_block=40, n_addresses=300, seed=3)
+    assert index.ingest_file(path) == n_txs
+    assert index.ingest_file(path) == 0  # повторная загрузка ничего не удваивает
+    assert index.height() == 59
+
+    totals = chain_totals(synthetic_chain(60, txs_per_block=40, n_addresses=300, seed=3))
+    balances = index.balances(list(totals))
+    assert len(balances) == len(totals)
+    for address, (n_tx, received, sent) in totals.items():
+        assert balances[address] == {'final_balance': received - sent, 'n_tx': n_tx,
+                                     'total_received': received, 'total_sent': sent}
+        assert received >= sent
+
+
+def test_incremental_append_extends_the_tip(index):
+    blocks = list(synthetic_chain(30, txs_per_block=20, n_addresses=100, seed=5))
+    index.ingest_objects(blocks[:20])
+    assert index.height() == 19
+    index.ingest_objects(blocks[25:])  # пропуск 20..24: tip не двигается
+    assert index.height() == 19
+    index.ingest_objects(blocks[20:25])
+    assert index.height() == 29
+
+    totals = chain_totals(blocks)
+    address = max(totals, key=lambda a: totals[a][0])
+    pages, offset = [], 0
+    while True:
+        page = index.rawaddr(address, limit=7, offset=offset)['txs']
+        if not page:
+            break
+        pages += page
+        offset += 7
+    assert len(pages) == totals[address][0]
+    assert [tx['time'] for tx in pages] == sorted((tx['time'] for tx in pages), reverse=True)
+    assert sum(tx['result'] for tx in pages) == index.balance(address)['final_balance']
+
+
+def test_full_chain_answers_unseen_addresses_as_empty(index):
+    index.ingest_objects(synthetic_chain(5, txs_per_block=5, n_addresses=20))
+    assert index.balance('1NeverSeen') == {'final_balance': 0, 'n_tx': 0, 'total_received': 0, 'total_sent': 0}
+    assert index.rawaddr('1NeverSeen')['txs'] == []
+
+
+def test_rawaddr_covers_only_its_own_address(index):
+    raw = synthetic_rawaddr('1Owner', n_tx=30, seed=1)
+    counterparty = raw['txs'][0]['inputs'][0]['prev_out']['addr']
+    index.ingest_objects([raw])
+    assert index.balance('1Owner')['n_tx'] == 30
+    assert index.balance(counterparty) is None
+    assert index.rawaddr(counterparty) is None
+
+    partial = synthetic_rawaddr('1Partial', n_tx=100, seed=2)
+    partial['txs'] = partial['txs'][:50]  # одна страница из двух
+    index.ingest_objects([partial])
+    assert index.balance('1Partial') is None
+
+
+def test_stale_index_is_not_used(tmp_path):
+    now = [1_600_000_000 + 10 * 600]
+    index = ChainIndex(str(tmp_path / 'chain.db'), max_age=3600, clock=lambda: now[0])
+    index.ingest_objects(synthetic_chain(10, txs_per_block=5, n_addresses=20))
+    assert index.balance('1NeverSeen') is not None
+    now[0] += 7200  # новых блоков два часа нет
+    assert index.balance('1NeverSeen') is None
+    index.close()
+
+
+def test_checkers_go_upstream_only_for_uncovered(index, monkeypatch):
+    raw = synthetic_rawaddr('1Owner', n_tx=30, seed=1)
+    counterparty = raw['txs'][0]['inputs'][0]['prev_out']['addr']
+    index.ingest_objects([raw])
+    calls = []
+
+    async def remote(self, path, params=None, timeout=None):
+        calls.append((path, params))
+        if path == '/balance':
+            return {a: {'final_balance': 7, 'n_tx': 1, 'total_received': 7, 'total_sent': 0}
+                    for a in params['active'].split('|')}
+        return {'n_tx': 0, 'txs': []}
+
+    monkeypatch.setattr(AsyncBitcoinAddressChecker, '_get_remote', remote)
+
+    async def run():
+        checker = AsyncBitcoinAddressChecker(index=index)
+        owner = await checker.check_address_balance('1Owner')
+        history = await checker.get_address_transactions('1Owner', limit=10)
+        assert calls == []
+        other = await checker.check_address_balance(counterparty)
+        multiple = await checker.check_multiple_addresses(['1Owner', counterparty])
+        await checker.close()
+        return owner, history, other, multiple
+
+    owner, history, other, multiple = asyncio.run(run())
+    assert owner['transaction_count'] == 30 and len(history) == 10
+    assert other['balance_satoshi'] == 7
+    assert calls[-1] == ('/balance', {'active': counterparty})
+    assert multiple['addresses_checked'] == 2
+
+    sync_calls = []
+    monkeypatch.setattr(BitcoinAddressChecker, '_get_json',
+                        lambda self, endpoint, url, timeout: sync_calls.append(url) or {})
+    checker = BitcoinAddressChecker(index=index)
+    assert checker.check_address_balance('1Owner')['transaction_count'] == 30
+    assert sync_calls == []
+    assert checker.check_address_balance(counterparty)['success'] is False
+    assert len(sync_calls) == 1
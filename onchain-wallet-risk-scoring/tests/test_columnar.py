@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import columnar
+from score import SCORE_COLUMNS, load_txs, score_wallet
+from synthetic import synthetic_tx_frame
+
+
+def test_column_store_roundtrip_and_scores(tmp_path):
+    path = str(tmp_path / 'txs.csv')
+    df = synthetic_tx_frame(3000, seed=7)
+    df.loc[df.index[5:9], 'counterparty'] = None
+    df.to_csv(path, index=False)
+    from_csv = load_txs(path)
+    assert not columnar.is_fresh(path)
+
+    # словари текстовых колонок копятся через границы чанков
+    columnar.ingest(path, chunksize=700)
+    assert columnar.is_fresh(path)
+    stored = columnar.read_columns(path)
+    assert list(stored.columns) == list(df.columns)
+    assert list(stored['tx_hash']) == list(df['tx_hash'])
+    assert (stored['date'].values == df['date'].values).all()
+    assert np.allclose(stored['usd_value'], df['usd_value'], equal_nan=True)
+    assert list(stored['counterparty'].astype(object).fillna('-')) == list(df['counterparty'].fillna('-'))
+
+    from_store = load_txs(path, SCORE_COLUMNS)
+    assert list(from_store.columns) == SCORE_COLUMNS
+    score, label, factors = score_wallet(from_csv)
+    cached = score_wallet(from_store)
+    assert cached[:2] == (score, label) and cached[2] == pytest.approx(factors)
+
+
+def test_changed_csv_makes_store_stale(tmp_path):
+    path = str(tmp_path / 'txs.csv')
+    synthetic_tx_frame(200, seed=8).to_csv(path, index=False)
+    columnar.ingest(path)
+    pd.concat([pd.read_csv(path)] * 2).to_csv(path, index=False)
+    assert not columnar.is_fresh(path)
+    assert len(load_txs(path)) == 400
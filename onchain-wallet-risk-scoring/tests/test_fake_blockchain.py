@@ -0,0 +1,70 @@
+import asyncio
+import json
+import socket
+
+from async_bitcoin_checker import AsyncBitcoinAddressChecker
+from bulk_api import BulkAnalysisAPI
+from fake_blockchain import FakeBlockchainInfo
+from funds_origin import FundsOriginAnalyzer
+from job_queue import AnalysisQueue
+from subscriptions import SubscriptionStore
+from synthetic import synthetic_btc_addresses
+from tx_batch import SATOSHI
+from wallet_analysis import WalletAnalyzer
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def test_bulk_api_streams_ndjson_against_stub():
+    addresses = synthetic_btc_addresses(20, seed=4)
+    body = addresses + ['not-an-address', addresses[0]]
+
+    async def run():
+        import aiohttp
+
+        fake = FakeBlockchainInfo(n_tx=40)
+        await fake.start(free_port())
+        checker = AsyncBitcoinAddressChecker(api_url=fake.api_url, pool_size=8)
+        analyzer = WalletAnalyzer(checker, FundsOriginAnalyzer(), max_history=40)
+        subscriptions = SubscriptionStore()
+        subscriptions.set_tier(1, 'business')
+        queue = AnalysisQueue(workers=4, per_user_tier={'bulk': 8})
+        api = BulkAnalysisAPI(lambda chain, address: analyzer.analyze_btc(address), subscriptions, {'k': 1},
+                              per_request=8, queue=queue)
+        port = free_port()
+        await api.start(port, host='127.0.0.1')
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.post(f'http://127.0.0.1:{port}/v1/analyze', json={'addresses': body},
+                                        headers={'X-API-Key': 'k'}) as response:
+                    assert response.headers['Content-Type'] == 'application/x-ndjson'
+                    lines = [json.loads(line) async for line in response.content]
+            return lines, fake, subscriptions.remaining(1, 'api')
+        finally:
+            await api.close()
+            await queue.close()
+            await checker.close()
+            await fake.close()
+
+    lines, fake, remaining = asyncio.run(run())
+    summary = lines.pop()['summary']
+    assert {k: summary[k] for k in ('total', 'ok', 'error', 'invalid')} == {'total': 22, 'ok': 21, 'error': 0,
+                                                                            'invalid': 1}
+    assert sorted(line['index'] for line in lines) == list(range(len(body)))
+    by_index = {line['index']: line for line in lines}
+    assert by_index[20] == {'index': 20, 'address': 'not-an-address', 'status': 'invalid'}
+    for index, address in enumerate(addresses):
+        line = by_index[index]
+        raw = fake._rawaddr(address)
+        assert line['status'] == 'ok' and line['chain'] == 'BTC'
+        assert line['balance_btc'] == raw['final_balance'] / SATOSHI
+        assert line['transaction_count'] == raw['n_tx']
+        assert 0 <= line['total_risk'] <= 100
+    assert by_index[21] == {**by_index[0], 'index': 21}
+    # повтор анализируется один раз: история каждого адреса — одна страница
+    assert fake.calls['rawaddr'] == len(addresses)
+    assert remaining == 1000 - len(addresses)
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from funds_origin import FundsOriginAnalyzer
+from synthetic import synthetic_btc_addresses
+
+
+def test_arrays_path_matches_per_transaction_path():
+    rng = np.random.default_rng(17)
+    pool = synthetic_btc_addresses(200, seed=17) + ['1LDexchange', '3J9hot', '1MiningPoolX', 'bc1qmixer0', '']
+    addresses = rng.choice(np.array(pool, dtype=object), 5000).tolist()
+    amounts = rng.lognormal(0, 1.5, 5000)
+    amounts[::97] = 6.3  # похоже на награду за блок
+    records = [{'address': a, 'amount': float(x)} for a, x in zip(addresses, amounts)]
+
+    analyzer = FundsOriginAnalyzer()
+    expected = analyzer.analyze_btc_origin(records)
+    result = analyzer.analyze_btc_origin_arrays(addresses, amounts)
+    assert list(result) == list(expected)
+    assert {'exchange', 'mining', 'unknown'} <= set(result)
+    for category, data in expected.items():
+        got = result[category]
+        assert got['transaction_count'] == data['transaction_count']
+        assert got['total_amount'] == pytest.approx(data['total_amount'])
+        for key in ('tx_percentage', 'amount_percentage', 'risk_contribution'):
+            assert got[key] == pytest.approx(data[key], abs=0.1)
+
+
+def test_arrays_path_empty_input():
+    assert FundsOriginAnalyzer().analyze_btc_origin_arrays([], np.zeros(0)) == {}
@@ -0,0 +1,25 @@
+import pytest
+
+from incremental import WalletStateStore, rescore
+from score import score_wallet
+from synthetic import synthetic_tx_frame
+
+
+def test_rescore_in_batches_matches_full_history(tmp_path):
+    path = str(tmp_path / 'state.db')
+    df = synthetic_tx_frame(3000, seed=9, burstiness=0.3)
+    df['usd_value'] = df['usd_value'].fillna(0.0)
+    # новые транзакции приходят пачками, хранилище открывается заново для каждой
+    for start, end in ((0, 1000), (1000, 1001), (1001, 3000)):
+        store = WalletStateStore(path)
+        score, label, factors = rescore(store, 'w', df.iloc[start:end])
+        store.close()
+
+    full = score_wallet(df)
+    assert (score, label) == full[:2] and factors == pytest.approx(full[2])
+
+    store = WalletStateStore(path)
+    assert store.load('w').n == 3000 and store.load('other').n == 0
+    with pytest.raises(ValueError):
+        rescore(store, 'w', df.iloc[:10])
+    store.close()
@@ -0,0 +1,36 @@
+import pytest
+
+from funds_origin import FundsOriginAnalyzer
+from label_db import LabelDatabase, build
+from synthetic import synthetic_btc_addresses
+
+
+def test_lookup_roundtrip_and_first_label_wins(tmp_path):
+    path = str(tmp_path / 'labels.db')
+    addresses = synthetic_btc_addresses(3000, seed=15)
+    categories = ['exchange', 'mixer', 'darknet', 'gambling']
+    labels = [(address, categories[i % 4]) for i, address in enumerate(addresses)]
+    eth = '0x5aAeb6053F3E94C9b9A09f33669435E7Ef1BeAed'
+    # повтор адреса: остаётся первая метка
+    assert build(path, labels + [(addresses[0], 'mining'), (eth, 'exchange'), ('', 'mixer')]) == 3001
+
+    db = LabelDatabase(path)
+    try:
+        assert len(db) == 3001 and db.categories == categories + ['mining']
+        assert db.get_batch(addresses) == [category for _, category in labels]
+        # ETH адреса регистронезависимы
+        assert db.get(eth.lower()) == 'exchange' and eth.upper().replace('0X', '0x') in db
+        unknown = synthetic_btc_addresses(50, seed=16)
+        assert db.get_batch(unknown) == [None] * 50 and db.get('') is None
+
+        analyzer = FundsOriginAnalyzer(label_db=db)
+        assert analyzer.lookup_label(addresses[1]) == 'mixer'
+    finally:
+        db.close()
+
+
+def test_rejects_foreign_file(tmp_path):
+    path = tmp_path / 'not.db'
+    path.write_bytes(b'SQLite format 3\0' + bytes(100))
+    with pytest.raises(ValueError):
+        LabelDatabase(str(path))
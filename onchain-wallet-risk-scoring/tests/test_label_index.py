@@ -0,0 +1,43 @@
+import random
+
+from label_index import AddressLabelIndex
+
+
+def naive_classify(rules, address):
+    # эталон: перебор всех правил в порядке точный адрес, самый длинный префикс, первая подстрока
+    for kind, pattern, category in rules:
+        if kind == 'exact' and pattern == address:
+            return category
+    prefixes = [(len(p), -i, c) for i, (k, p, c) in enumerate(rules) if k == 'prefix' and address.startswith(p)]
+    if prefixes:
+        return max(prefixes)[2]
+    for kind, pattern, category in rules:
+        if kind == 'substring' and pattern in address:
+            return category
+    return None
+
+
+def test_matches_brute_force_on_random_rules():
+    rng = random.Random(14)
+
+    def word(lo, hi):
+        return ''.join(rng.choice('abc') for _ in range(rng.randint(lo, hi)))
+
+    rules = [(rng.choice(['exact', 'prefix', 'substring']), word(1, 4), f'cat{i}') for i in range(60)]
+    index = AddressLabelIndex.from_rows(rules)
+    addresses = [word(0, 12) for _ in range(2000)]
+    assert index.classify_batch(addresses) == [naive_classify(rules, a) for a in addresses]
+
+
+def test_load_csv_and_incremental_rules(tmp_path):
+    path = tmp_path / 'labels.csv'
+    path.write_text('kind,pattern,category\n'
+                    'prefix,1LD,exchange\n'
+                    'exact,1LDexactly,darknet\n'
+                    'substring,mix,mixer\n')
+    index = AddressLabelIndex.load_csv(str(path))
+    assert index.classify_batch(['1LDexactly', '1LDother', '3xmixy', '3abc', None]) == \
+        ['darknet', 'exchange', 'mixer', None, None]
+    # правило после build() учитывается при следующем поиске
+    index.add_prefix('3a', 'gambling')
+    assert index.classify('3abc') == 'gambling'
@@ -0,0 +1,116 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import main_bot
+import metrics
+
+
+def test_options_from_flags_and_environment(monkeypatch, tmp_path):
+    monkeypatch.setenv('BOT_TOKEN', '1:test')
+    monkeypatch.setenv('METRICS_PORT', '9100')
+    monkeypatch.setenv('API_KEYS', 'k1:5,k2:6')
+    args = main_bot.parse_args(['--watchlist-path', str(tmp_path / 'watch.db'),
+                                '--chain-index-path', str(tmp_path / 'chain.db'), '--api-port', '8088'])
+    options = main_bot.bot_options(args)
+    assert options == {'token': '1:test', 'metrics_port': 9100, 'api_port': 8088, 'api_keys': {'k1': 5, 'k2': 6},
+                       'watchlist_path': str(tmp_path / 'watch.db'), 'chain_index_path': str(tmp_path / 'chain.db')}
+
+    bot = main_bot.RiskAnalyzerBot(**{**options, 'metrics_port': None})
+    assert bot.api_keys == {'k1': 5, 'k2': 6}
+    assert bot.btc_checker.index is bot.chain_index
+    assert bot.watchlist.db is not None
+    asyncio.run(bot.close())
+
+
+class FakeMessage:
+    def __init__(self, text, user_id=7):
+        self.text = text
+        self.from_user = type('User', (), {'id': user_id})()
+        self.chat = type('Chat', (), {'id': user_id})()
+        self.message_id = 1
+        self.answers = []
+
+    async def answer(self, text, **kwargs):
+        self.answers.append(text)
+        return self
+
+
+def test_eth_rejected_before_quota_and_queue():
+    async def run():
+        bot = main_bot.RiskAnalyzerBot(token='1:test')
+        message = FakeMessage('/analyze 0x5aAeb6053F3E94C9b9A09f33669435E7Ef1BeAed')
+        await bot.handle_analyze(message)
+        try:
+            return message.answers, bot.subscriptions.remaining(7), bot.analysis_queue.stats['submitted']
+        finally:
+            await bot.close()
+
+    answers, remaining, submitted = asyncio.run(run())
+    assert 'ETH' in answers[-1] and remaining == 3 and submitted == 0
+
+
+def test_quota_refunded_when_analysis_fails():
+    async def run():
+        bot = main_bot.RiskAnalyzerBot(token='1:test')
+
+        async def broken(address):
+            raise RuntimeError('worker crashed')
+
+        bot.analyze_btc_wallet = broken
+        message = FakeMessage('/analyze 1BvBMSEYstWetqTFn5Au4m4GFg7xJaNVN2')
+        await bot.handle_analyze(message)
+        try:
+            return message.answers, bot.subscriptions.remaining(7)
+        finally:
+            await bot.close()
+
+    answers, remaining = asyncio.run(run())
+    assert answers[-1].startswith('❌ Ошибка анализа') and remaining == 3
+
+
+def test_error_result_is_reported_and_refunded(monkeypatch):
+    monkeypatch.setattr(metrics.REGISTRY, 'enabled', True)
+    monkeypatch.setattr(metrics.ANALYZE_TOTAL, 'values', {})
+
+    async def run():
+        bot = main_bot.RiskAnalyzerBot(token='1:test')
+        deleted = []
+
+        async def delete_message(chat_id, message_id):
+            deleted.append(message_id)
+
+        async def unavailable(address):
+            return {'error': 'Не удалось получить данные'}
+
+        bot.analyze_btc_wallet = unavailable
+        bot.bot.delete_message = delete_message
+        message = FakeMessage('/analyze 1BvBMSEYstWetqTFn5Au4m4GFg7xJaNVN2')
+        await bot.handle_analyze(message)
+        try:
+            return message.answers, deleted, bot.subscriptions.remaining(7)
+        finally:
+            await bot.close()
+
+    answers, deleted, remaining = asyncio.run(run())
+    assert answers[-1].startswith('❌ Не удалось проанализировать') and deleted == [1] and remaining == 3
+    assert metrics.ANALYZE_TOTAL.values == {('BTC', 'error'): 1}
+
+
+def test_startup_within_budget_and_subsystems_lazy():
+    root = os.path.dirname(os.path.abspath(main_bot.__file__))
+    # отдельный процесс: холодный старт, в sys.modules ничего от других тестов
+    loaded = subprocess.run(
+        [sys.executable, '-c', "import sys, main_bot; print(' '.join(sorted(sys.modules)))"],
+        cwd=root, capture_output=True, text=True, check=True).stdout.split()
+    for module in ('address_validaitor', 'bulk_api', 'funds_origin', 'payment_webhook', 'watchlist', 'numpy'):
+        assert module not in loaded
+
+    profile = subprocess.run([sys.executable, 'main_bot.py', '--profile-startup'],
+                             cwd=root, capture_output=True, text=True)
+    rows = {line.rsplit(None, 2)[0].strip(): float(line.rsplit(None, 2)[1])
+            for line in profile.stdout.splitlines() if line.endswith(' ms')}
+    assert profile.returncode == 0, profile.stdout
+    # импорт модуля подсистемы замеряется при её первом обращении, а не при импорте main_bot
+    assert rows['lazy validator'] > 0 and rows['lazy payment_webhook'] > 0
@@ -0,0 +1,96 @@
+import asyncio
+import socket
+
+import pytest
+
+import metrics
+from cache import TTLCache
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(metrics.REGISTRY, 'enabled', True)
+    for metric in (metrics.STAGE_SECONDS, metrics.STAGE_ERRORS, metrics.UPSTREAM_ERRORS):
+        monkeypatch.setattr(metric, 'values', {})
+
+
+def test_disabled_collection_records_nothing(monkeypatch):
+    monkeypatch.setattr(metrics.REGISTRY, 'enabled', False)
+    monkeypatch.setattr(metrics.STAGE_SECONDS, 'values', {})
+
+    @metrics.timed('t_off')
+    def work():
+        return 1
+
+    assert work() == 1 and metrics.stage('t_off') is metrics._NOOP
+    assert metrics.STAGE_SECONDS.values == {}
+
+
+def test_stages_errors_and_upstream_kinds(enabled):
+    @metrics.timed('t_sync')
+    def work():
+        return 'ok'
+
+    @metrics.timed('t_async')
+    async def failing():
+        raise RuntimeError('boom')
+
+    assert work() == 'ok'
+    with pytest.raises(RuntimeError):
+        asyncio.run(failing())
+    with metrics.stage('t_block'):
+        pass
+    assert set(metrics.STAGE_SECONDS.values) == {('t_sync',), ('t_async',), ('t_block',)}
+    assert metrics.STAGE_ERRORS.values == {('t_async',): 1}
+
+    metrics.upstream_error('balance', asyncio.TimeoutError())
+    metrics.upstream_error('balance', type('HTTPError', (Exception,), {'status': 429})())
+    metrics.upstream_error('rawaddr', ConnectionResetError())
+    assert metrics.UPSTREAM_ERRORS.values == {('balance', 'timeout'): 1, ('balance', 'http_429'): 1,
+                                              ('rawaddr', 'ConnectionResetError'): 1}
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram('h', 'test', ['stage'], buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, 'x')
+    lines = histogram.render()
+    assert lines[:3] == ['owrs_h_bucket{stage="x",le="0.1"} 2', 'owrs_h_bucket{stage="x",le="1"} 3',
+                         'owrs_h_bucket{stage="x",le="+Inf"} 4']
+    assert lines[-1] == 'owrs_h_count{stage="x"} 4'
+
+
+def test_http_endpoint_serves_metrics_and_cache_stats():
+    registry = metrics.Registry()
+    counter = registry.add(metrics.Counter('requests_total', 'test', ['chain']))
+    counter.inc('BTC', amount=2)
+    cache = TTLCache('balance')
+    cache.set('a', 1)
+    cache.get('a')
+    cache.get('b')
+    registry.collectors.append(metrics.cache_collector([cache]))
+
+    async def run():
+        import aiohttp
+
+        port = free_port()
+        runner = await metrics.start_http_server(port, registry=registry)
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f'http://127.0.0.1:{port}/metrics') as response:
+                    return response.status, await response.text()
+        finally:
+            await runner.cleanup()
+
+    status, text = asyncio.run(run())
+    lines = text.splitlines()
+    assert status == 200
+    assert '# TYPE owrs_requests_total counter' in lines and 'owrs_requests_total{chain="BTC"} 2' in lines
+    assert 'owrs_cache_hits_total{cache="balance"} 1' in lines
+    assert 'owrs_cache_hit_ratio{cache="balance"} 0.5' in lines
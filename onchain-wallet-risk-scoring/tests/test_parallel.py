@@ -0,0 +1,23 @@
+import numpy as np
+
+from parallel import score_files
+from synthetic import synthetic_tx_frame
+
+
+def test_single_csv_sharded_by_wallet(tmp_path):
+    df = synthetic_tx_frame(3000, seed=1)
+    df['wallet'] = np.random.default_rng(1).integers(0, 57, len(df))
+    path = tmp_path / 'txs.csv'
+    df.to_csv(path, index=False)
+
+    serial = score_files([str(path)], workers=1, wallet_col='wallet', progress=None)
+    sharded = score_files([str(path)], workers=4, wallet_col='wallet', progress=None)
+    assert len(serial) == 57
+    # целые кошельки: порядок числовой, как у score_wallets, а не строковый
+    assert [row[0] for row in serial] == [str(w) for w in range(57)]
+    assert sharded == serial
+
+
+def test_sharded_missing_file_reports_error(tmp_path):
+    rows = score_files([str(tmp_path / 'missing.csv')], workers=2, wallet_col='wallet', progress=None)
+    assert len(rows) == 1 and rows[0][0] == 'missing' and rows[0][-1].startswith('FileNotFoundError')
@@ -0,0 +1,155 @@
+import asyncio
+import socket
+import time
+
+from bitcoin_payments import BitcoinPaymentProcessor
+from fake_walletpay import FakeWalletPay
+from payment_webhook import PaymentWebhookServer
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def setup(db_path=None, fake=None):
+    """FakeWalletPay + PaymentWebhookServer на свободных портах; activated — список активаций"""
+    activated = []
+
+    async def activate(user_id, tier, order):
+        activated.append((user_id, tier, order['order_id']))
+
+    webhook_port = free_port()
+    if fake is None:
+        fake = FakeWalletPay('test-key')
+        await fake.start(free_port())
+    fake.webhook_url = f'http://127.0.0.1:{webhook_port}/wpay/webhook'
+    processor = BitcoinPaymentProcessor('test-key', 'store', base_url=fake.base_url)
+    server = PaymentWebhookServer(processor, activate, reconcile_after=0, db_path=db_path)
+    await server.start(webhook_port, host='127.0.0.1')
+    return fake, server, processor, activated
+
+
+async def create_order(server, processor, user_id, tier):
+    result = await asyncio.to_thread(processor.create_payment_link, 0.001, 'test', user_id, f'sub_{user_id}')
+    assert result['success']
+    server.register_order(result['payment_id'], f'sub_{user_id}', user_id, tier)
+    return result['payment_id']
+
+
+def test_webhook_and_reconcile_activate_once():
+    async def run():
+        fake, server, processor, activated = await setup()
+        try:
+            first = await create_order(server, processor, 1, 'pro')
+            second = await create_order(server, processor, 2, 'business')
+            await fake.pay(first, repeat=2)
+            await fake.pay(second, notify=False)
+            await server.drain()
+            assert await server.reconcile() == 1
+            await server.drain()
+            assert await server.reconcile() == 0
+            return activated, server.stats, dict(server.pending)
+        finally:
+            await server.close()
+            await fake.close()
+
+    activated, stats, pending = asyncio.run(run())
+    assert sorted(activated) == [(1, 'pro', '1'), (2, 'business', '2')]
+    assert stats['duplicates'] == 1
+    assert pending == {}
+
+
+def test_pending_orders_survive_restart(tmp_path):
+    db_path = str(tmp_path / 'subscriptions.db')
+
+    async def run():
+        fake, server, processor, activated = await setup(db_path)
+        order_id = await create_order(server, processor, 7, 'pro')
+        await server.close()
+
+        _, restarted, _, activated = await setup(db_path, fake=fake)
+        try:
+            assert order_id in restarted.pending
+            await fake.pay(order_id)
+            await restarted.drain()
+            return activated, dict(restarted.pending)
+        finally:
+            await restarted.close()
+            await fake.close()
+
+    activated, pending = asyncio.run(run())
+    assert activated == [(7, 'pro', '1')]
+    assert pending == {}
+
+
+def test_non_terminal_event_does_not_close_order():
+    async def run():
+        fake, server, processor, activated = await setup()
+        try:
+            order_id = await create_order(server, processor, 3, 'pro')
+            status = await fake.send_webhook([{'type': 'ORDER_FAILED',
+                                               'payload': {'id': int(order_id), 'status': 'ACTIVE'}}])
+            assert status == 200
+            await server.drain()
+            assert order_id in server.pending
+            await fake.pay(order_id)
+            await server.drain()
+            return activated
+        finally:
+            await server.close()
+            await fake.close()
+
+    assert asyncio.run(run()) == [(3, 'pro', '1')]
+
+
+def test_forged_and_stale_webhooks_are_rejected():
+    async def run():
+        fake, server, processor, activated = await setup()
+        try:
+            order_id = await create_order(server, processor, 4, 'pro')
+            event = [{'type': 'ORDER_PAID', 'payload': {'id': int(order_id), 'status': 'PAID'}}]
+            forged = await fake.send_webhook(event, signature='AAAA')
+            stale = await fake.send_webhook(event, timestamp=str((time.time_ns() - 3600 * 10 ** 9) // 1000))
+            await server.drain()
+            return forged, stale, activated, server.stats
+        finally:
+            await server.close()
+            await fake.close()
+
+    forged, stale, activated, stats = asyncio.run(run())
+    assert (forged, stale) == (401, 401)
+    assert activated == []
+    assert stats['bad_signature'] == 1 and stats['stale'] == 1
+
+
+def test_orders_written_behind_the_handlers(tmp_path):
+    db_path = str(tmp_path / 'subscriptions.db')
+
+    async def activate(user_id, tier, order):
+        pass
+
+    def stored(server):
+        return [row[0] for row in server.db.execute("SELECT order_id FROM payment_orders ORDER BY order_id")]
+
+    async def run():
+        server = PaymentWebhookServer(BitcoinPaymentProcessor('test-key', 'store'), activate,
+                                      db_path=db_path, flush_interval=0.01)
+        server.start_background()
+        server.register_order('1', 'sub_1', 1, 'pro')
+        server.register_order('2', 'sub_2', 2, 'pro')
+        # в обработчике sqlite не трогается — заказы пишутся фоновой задачей
+        before = stored(server)
+        await asyncio.sleep(0.05)
+        written = stored(server)
+        server._finish('1')
+        server.register_order('3', 'sub_3', 3, 'business')
+        await server.close()  # несохранённое дописывается при остановке
+        return before, written
+
+    before, written = asyncio.run(run())
+    assert before == [] and written == ['1', '2']
+    restarted = PaymentWebhookServer(BitcoinPaymentProcessor('test-key', 'store'), activate, db_path=db_path)
+    assert sorted(restarted.pending) == ['2', '3']
+    restarted.db.close()
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from score import WEIGHTS, score_wallet, score_wallets
+from synthetic import synthetic_tx_frame
+
+
+def test_score_wallets_matches_score_wallet_per_wallet():
+    df = synthetic_tx_frame(4000, seed=6, burstiness=0.3)
+    rng = np.random.default_rng(6)
+    df['wallet'] = rng.choice(['w%d' % i for i in range(40)], len(df))
+    # кошельки из одной и двух транзакций: ветки n<2 и n_dir<3 факторов
+    df.loc[df.index[:3], 'wallet'] = ['solo', 'pair', 'pair']
+    df.loc[df.index[10:20], 'counterparty'] = None
+    df['usd_value'] = df['usd_value'].fillna(0.0)
+    df = df.sort_values('date', kind='mergesort')
+
+    out = score_wallets(df.sample(frac=1, random_state=6), 'wallet')
+    assert list(out['wallet']) == sorted(df['wallet'].unique())
+    for row in out.itertuples(index=False):
+        part = df[df['wallet'] == row.wallet]
+        score, label, factors = score_wallet(part)
+        assert (row.overall_score, row.label, row.n_txs) == (score, label, len(part))
+        for k in WEIGHTS:
+            assert getattr(row, k) == pytest.approx(factors[k])
@@ -0,0 +1,32 @@
+import pandas as pd
+import pytest
+
+import stream
+from score import load_txs, score_wallet
+from stream import score_stream
+from synthetic import synthetic_tx_frame
+
+
+def check(path, result):
+    df = load_txs(path)
+    score, label, factors = score_wallet(df)
+    assert result[:2] == (score, label) and result[3] == len(df)
+    assert result[2] == pytest.approx(factors)
+
+
+def test_sorted_file_is_not_spilled(tmp_path, monkeypatch):
+    path = str(tmp_path / 'sorted.csv')
+    synthetic_tx_frame(5000, seed=4).to_csv(path, index=False)
+    saves = []
+    monkeypatch.setattr(stream.np, 'save', lambda *args: saves.append(args[0]))
+    check(path, score_stream(path, chunksize=700))
+    assert saves == []
+
+
+@pytest.mark.parametrize('swap_at', [0, 3500])
+def test_unsorted_file_matches_score_wallet(tmp_path, swap_at):
+    df = synthetic_tx_frame(5000, seed=5)
+    # порядок ломается с первого чанка или только в середине файла
+    path = str(tmp_path / 'unsorted.csv')
+    pd.concat([df.iloc[:swap_at], df.iloc[swap_at:].sample(frac=1, random_state=1)]).to_csv(path, index=False)
+    check(path, score_stream(path, chunksize=700))
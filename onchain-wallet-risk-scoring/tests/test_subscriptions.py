@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from subscriptions import DAY, SubscriptionStore
+
+
+def test_token_bucket_refills_over_the_day():
+    now = [1_000_000.0]
+    store = SubscriptionStore(clock=lambda: now[0])
+    assert [store.try_consume(1) for _ in range(4)] == [True, True, True, False]
+    store.refund(1)
+    assert store.remaining(1) == 1
+    now[0] += DAY / 3  # пополнение: лимит 3 в сутки — один запрос за треть суток
+    assert store.remaining(1) == 2
+
+    store.set_tier(2, 'pro', days=1)
+    assert store.tier(2) == 'pro' and store.remaining(2) is None and store.try_consume(2)
+    now[0] += DAY
+    assert store.tier(2) == 'free' and store.expires_at(2) is None
+    with pytest.raises(ValueError):
+        store.set_tier(2, 'platinum')
+
+
+def test_quotas_survive_restart(tmp_path):
+    path = str(tmp_path / 'subscriptions.db')
+    now = [1_000_000.0]
+
+    async def run():
+        store = SubscriptionStore(path, flush_interval=0.01, clock=lambda: now[0])
+        store.start()
+        store.set_tier(5, 'business')
+        assert store.try_consume(5, 'api', cost=400)
+        assert store.try_consume(6) and store.try_consume(6)
+        await asyncio.sleep(0.05)
+        # фоновая запись уже на диске: второй экземпляр видит её без close() первого
+        crashed = SubscriptionStore(path, clock=lambda: now[0])
+        seen = crashed.remaining(5, 'api'), crashed.remaining(6)
+        crashed.db.close()
+        assert store.try_consume(6)
+        await store.close()  # последнее списание дописывается при остановке
+        return seen
+
+    assert asyncio.run(run()) == (600, 1)
+    restarted = SubscriptionStore(path, clock=lambda: now[0])
+    assert restarted.tier(5) == 'business' and restarted.remaining(5, 'api') == 600
+    assert restarted.remaining(6) == 0 and not restarted.try_consume(6)
+    assert restarted.remaining(7) == 3
+    restarted.db.close()
@@ -0,0 +1,22 @@
+import asyncio
+
+from synthetic import graph_fetcher, synthetic_tx_graph
+from taint import TaintEngine
+
+
+def test_nodes_expanded_counts_this_query_only():
+    by_address, labels = synthetic_tx_graph(n_addresses=400, n_txs=1500, seed=3)
+    addresses = list(by_address)
+
+    def engine():
+        return TaintEngine(graph_fetcher(by_address), labeler=labels.get, max_hops=3, node_budget=10000)
+
+    shared = engine()
+    first, second = asyncio.run(shared.analyze_many([addresses[-1], addresses[-2]]))
+    alone = asyncio.run(engine().analyze(addresses[-2]))
+
+    assert first['nodes_expanded'] == first['nodes_fetched'] > 0
+    # граф первого запроса переиспользован, но в счёт второго не входит
+    assert second['nodes_expanded'] == alone['nodes_expanded'] < len(shared._incoming)
+    assert second['nodes_fetched'] < alone['nodes_fetched']
+    assert second['taint'] == alone['taint']
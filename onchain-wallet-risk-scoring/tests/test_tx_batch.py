@@ -0,0 +1,27 @@
+import bitcoin_checker
+import tx_batch
+from funds_origin import FundsOriginAnalyzer
+from tx_batch import TxBatch
+
+
+def test_single_satoshi_constant():
+    assert bitcoin_checker.SATOSHI is tx_batch.SATOSHI == 100_000_000
+
+
+def test_incoming_does_not_mutate_batch():
+    wallet = '1Wa11et'
+    batch = TxBatch()
+    batch.append('coinbase', 1_600_000_000, 1, [], [(wallet, 625_000_000, False)])
+    batch.append('payment', 1_600_000_600, 2, [('1Payer', 30_000), ('1Small', 5_000)], [(wallet, 20_000, False)])
+    before = list(batch.addresses)
+
+    sources, amounts = batch.incoming(wallet)
+    assert batch.addresses == before
+    assert [batch.addresses[s] if s >= 0 else None for s in sources] == [None, '1Payer']
+    assert amounts == [625_000_000, 20_000]
+
+    analyzer = FundsOriginAnalyzer()
+    stats = analyzer.new_category_stats()
+    analyzer.accumulate_btc_batch(stats, batch, wallet)
+    assert batch.addresses == before
+    assert stats['mining'] == {'count': 1, 'amount': 625_000_000}
@@ -0,0 +1,52 @@
+import asyncio
+
+from async_bitcoin_checker import AsyncBitcoinAddressChecker
+from cache import TTLCache
+from funds_origin import FundsOriginAnalyzer
+from synthetic import synthetic_rawaddr
+from wallet_analysis import WalletAnalyzer
+
+
+def offline_checker(monkeypatch, raw):
+    """AsyncBitcoinAddressChecker, у которого /rawaddr и /balance отвечает словарь raw"""
+    calls = []
+
+    async def remote(self, path, params=None, timeout=None):
+        calls.append(path)
+        if path == '/balance':
+            return {a: {k: raw[a][k] for k in ('final_balance', 'n_tx', 'total_received', 'total_sent')}
+                    for a in params['active'].split('|')}
+        data = raw[path.rsplit('/', 1)[1]]
+        offset, limit = int(params.get('offset', 0)), int(params['limit'])
+        return {**data, 'txs': data['txs'][offset:offset + limit]}
+
+    monkeypatch.setattr(AsyncBitcoinAddressChecker, '_get_remote', remote)
+    return AsyncBitcoinAddressChecker(), calls
+
+
+def test_only_first_history_page_is_cached(monkeypatch):
+    raw = {'1Deep': synthetic_rawaddr('1Deep', n_tx=1000, seed=4)}
+    checker, calls = offline_checker(monkeypatch, raw)
+    cache = TTLCache('transactions', maxsize=5000, ttl=300)
+    analyzer = WalletAnalyzer(checker, FundsOriginAnalyzer(), page_cache=cache)
+
+    async def run():
+        first = await analyzer.analyze_btc('1Deep')
+        second = await analyzer.analyze_btc('1Deep')
+        await checker.close()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert len(cache) == 1
+    assert calls.count('/rawaddr/1Deep') == 20 + 19  # второй анализ берёт из кэша только первую страницу
+    assert first['origin_analysis'] == second['origin_analysis']
+    assert len(first['transactions']) == 10
+
+
+def test_history_is_capped_at_max_history(monkeypatch):
+    raw = {'1Deep': synthetic_rawaddr('1Deep', n_tx=1000, seed=4)}
+    checker, calls = offline_checker(monkeypatch, raw)
+    analyzer = WalletAnalyzer(checker, FundsOriginAnalyzer(), max_history=120)
+    result = asyncio.run(analyzer.analyze_btc('1Deep'))
+    assert 'error' not in result
+    assert calls.count('/rawaddr/1Deep') == 3
@@ -0,0 +1,73 @@
+import asyncio
+import math
+
+from funds_origin import FundsOriginAnalyzer
+from synthetic import synthetic_rawaddr
+from tx_batch import SATOSHI, TxBatch
+from watchlist import PAGE_SIZE, Watchlist
+
+
+class FakeChecker:
+    """check_multiple_addresses и iter_address_batches поверх synthetic_rawaddr"""
+
+    def __init__(self, n_txs):
+        self.raw = {address: synthetic_rawaddr(address, n, seed=i) for i, (address, n) in enumerate(n_txs.items())}
+        self.pages = []  # время каждой запрошенной страницы истории
+
+    async def check_multiple_addresses(self, addresses):
+        return {'success': True, 'results': {
+            a: {'balance_btc': self.raw[a]['final_balance'] / SATOSHI, 'transaction_count': self.raw[a]['n_tx']}
+            for a in addresses if a in self.raw}}
+
+    async def iter_address_batches(self, address, page_size=50, max_txs=None, **kwargs):
+        txs = self.raw[address]['txs'][:max_txs]
+        for offset in range(0, len(txs), page_size):
+            self.pages.append(self.now[0])
+            yield TxBatch.from_rawaddr({'txs': txs[offset:offset + page_size]})
+
+
+def run_for(watchlist, now, seconds):
+    async def loop():
+        for _ in range(seconds):
+            now[0] += 1
+            await watchlist.step()
+
+    asyncio.run(loop())
+
+
+def test_history_longer_than_burst_is_scored_within_budget():
+    checker = FakeChecker({'1short': 40, '1long': 500, '1tail': 10})
+    now = checker.now = [0.0]
+    budget, share = 5.0, 0.5
+    watchlist = Watchlist(checker, FundsOriginAnalyzer(), notify=None, budget=budget, rescore_share=share,
+                          clock=lambda: now[0])
+    assert math.ceil(500 / PAGE_SIZE) > watchlist._rescores.burst
+    for address in checker.raw:
+        watchlist.add(address, user_id=1)
+
+    run_for(watchlist, now, 3600)
+
+    assert all(watchlist.risk(address) is not None for address in checker.raw)
+    assert watchlist.stats['rescores'] == 3
+    # средний темп истории не выше бюджета: запас burst плюс пополнение за прошедшее время
+    last = max(checker.pages)
+    assert len(checker.pages) <= watchlist._rescores.burst + budget * share * last + math.ceil(500 / PAGE_SIZE)
+
+
+def test_new_transactions_rescore_incrementally():
+    checker = FakeChecker({'1addr': 120})
+    now = checker.now = [0.0]
+    watchlist = Watchlist(checker, FundsOriginAnalyzer(), notify=None, clock=lambda: now[0])
+    watchlist.add('1addr', user_id=1)
+    run_for(watchlist, now, 10)
+    assert watchlist.risk('1addr') is not None
+    pages = len(checker.pages)
+
+    grown = synthetic_rawaddr('1addr', 130, seed=7)
+    raw = checker.raw['1addr']
+    raw['txs'] = grown['txs'][:10] + raw['txs']
+    raw['n_tx'] = 130
+    run_for(watchlist, now, 3600)
+
+    assert watchlist.stats['rescores'] == 2
+    assert len(checker.pages) == pages + 1  # только новые 10 транзакций
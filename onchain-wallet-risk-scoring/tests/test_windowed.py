@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from score import label_for, labels_for, score_wallet
+from synthetic import synthetic_tx_frame
+from windowed import FACTORS, score_windows
+
+
+def test_labels_for_matches_label_for():
+    scores = np.arange(0, 101)
+    assert list(labels_for(scores)) == [label_for(s) for s in scores]
+
+
+def test_windows_match_score_wallet_on_each_slice():
+    df = synthetic_tx_frame(1500, seed=2, burstiness=0.3)
+    df['wallet'] = np.random.default_rng(2).choice(['a', 'b', 'c'], len(df))
+    # как после load_txs
+    df['usd_value'] = df['usd_value'].fillna(0.0)
+    df = df.sort_values('date', kind='mergesort')
+    out = score_windows(df, window='2D', step='1D', wallet_col='wallet')
+    assert len(out) > 20
+    for row in out.iloc[::7].itertuples(index=False):
+        part = df[(df['wallet'] == row.wallet) & (df['date'] >= row.window_start) & (df['date'] < row.window_end)]
+        score, label, factors = score_wallet(part)
+        assert row.n_txs == len(part)
+        assert (row.overall_score, row.label) == (score, label)
+        for k in FACTORS:
+            assert getattr(row, k) == pytest.approx(factors[k])
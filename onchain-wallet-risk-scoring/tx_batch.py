@@ -0,0 +1,191 @@
+import sys
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SATOSHI = 100_000_000  # 1 BTC в сатоши (целое: суммы в батче — int64)
+
+
+class TxBatch:
+    """Пачка транзакций в виде колонок (structure of arrays).
+
+    Вместо словаря на транзакцию и на каждый вход/выход — несколько array:
+    суммы в сатоши (int64), время в секундах эпохи (int64), адреса —
+    номера в словаре батча `addresses` (строки интернируются, одинаковый
+    адрес из разных страниц — один объект). Входы и выходы хранятся подряд,
+    in_start/out_start — границы по транзакциям (как indptr в CSR).
+
+    Словари в формате get_address_transactions строятся только на краях:
+    tx(i), to_dicts().
+    """
+
+    __slots__ = ('hashes', 'times', 'heights', 'in_start', 'in_addr', 'in_value',
+                 'out_start', 'out_addr', 'out_value', 'out_spent', 'addresses', '_ids')
+
+    def __init__(self):
+        self.hashes: List[str] = []
+        self.times = array('q')
+        self.heights = array('q')
+        self.in_start = array('q', [0])
+        self.in_addr = array('i')
+        self.in_value = array('q')
+        self.out_start = array('q', [0])
+        self.out_addr = array('i')
+        self.out_value = array('q')
+        self.out_spent = array('b')
+        self.addresses: List[str] = []  # номер -> адрес; '' — адрес неизвестен
+        self._ids: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __getstate__(self):
+        # словарь номеров восстанавливается из addresses, в кэш не пишется
+        return {name: getattr(self, name) for name in self.__slots__ if name != '_ids'}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._ids = {address: i for i, address in enumerate(self.addresses)}
+
+    def to_state(self) -> Dict:
+        """Колонки списками — для JSON (постоянный кэш, cache.py)"""
+        return {name: value.tolist() if isinstance(value, array) else value
+                for name, value in self.__getstate__().items()}
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'TxBatch':
+        batch = cls()
+        columns = {}
+        for name, value in state.items():
+            empty = getattr(batch, name)
+            columns[name] = array(empty.typecode, value) if isinstance(empty, array) else list(value)
+        batch.__setstate__(columns)
+        return batch
+
+    def address_id(self, address: Optional[str]) -> int:
+        """Номер адреса в словаре батча (новый адрес добавляется)"""
+        address = address or ''
+        i = self._ids.get(address)
+        if i is None:
+            i = self._ids[address] = len(self.addresses)
+            self.addresses.append(sys.intern(address))
+        return i
+
+    def find(self, address: str) -> int:
+        """Номер адреса или -1, если его нет в батче"""
+        return self._ids.get(address, -1)
+
+    def append(self, tx_hash: str, time: int, height: int, inputs: Iterable[Tuple[Optional[str], int]],
+               outputs: Iterable[Tuple[Optional[str], int, bool]]):
+        """Добавить транзакцию: inputs — (адрес, сатоши), outputs — (адрес, сатоши, spent)"""
+        self.hashes.append(tx_hash)
+        self.times.append(int(time))
+        self.heights.append(int(height or 0))
+        for address, value in inputs:
+            self.in_addr.append(self.address_id(address))
+            self.in_value.append(value)
+        self.in_start.append(len(self.in_addr))
+        for address, value, spent in outputs:
+            self.out_addr.append(self.address_id(address))
+            self.out_value.append(value)
+            self.out_spent.append(bool(spent))
+        self.out_start.append(len(self.out_addr))
+
+    @classmethod
+    def from_rawaddr(cls, data: Dict) -> 'TxBatch':
+        """Ответ blockchain.info /rawaddr -> батч (без промежуточных словарей)"""
+        batch = cls()
+        for tx in data.get('txs', []):
+            batch.append(
+                tx['hash'], tx['time'], tx.get('block_height', 0),
+                ((inp['prev_out'].get('addr'), inp['prev_out'].get('value', 0))
+                 for inp in tx.get('inputs', []) if 'prev_out' in inp),
+                ((out.get('addr'), out.get('value', 0), out.get('spent', False)) for out in tx.get('out', [])))
+        return batch
+
+    def extend(self, other: 'TxBatch', limit: Optional[int] = None):
+        """Дописать первые `limit` транзакций другого батча (номера адресов перекодируются)"""
+        n = len(other) if limit is None else min(limit, len(other))
+        remap: Dict[int, int] = {}
+
+        def ids(source_ids):
+            for j in source_ids:
+                i = remap.get(j)
+                if i is None:
+                    i = remap[j] = self.address_id(other.addresses[j])
+                yield i
+
+        for i in range(n):
+            a, b = other.in_start[i], other.in_start[i + 1]
+            c, d = other.out_start[i], other.out_start[i + 1]
+            self.hashes.append(other.hashes[i])
+            self.times.append(other.times[i])
+            self.heights.append(other.heights[i])
+            self.in_addr.extend(ids(other.in_addr[a:b]))
+            self.in_value.extend(other.in_value[a:b])
+            self.in_start.append(len(self.in_addr))
+            self.out_addr.extend(ids(other.out_addr[c:d]))
+            self.out_value.extend(other.out_value[c:d])
+            self.out_spent.extend(other.out_spent[c:d])
+            self.out_start.append(len(self.out_addr))
+
+    def net_value(self, i: int, wallet_id: int) -> int:
+        """Изменение баланса кошелька в транзакции i, сатоши"""
+        value = 0
+        for j in range(self.out_start[i], self.out_start[i + 1]):
+            if self.out_addr[j] == wallet_id:
+                value += self.out_value[j]
+        for j in range(self.in_start[i], self.in_start[i + 1]):
+            if self.in_addr[j] == wallet_id:
+                value -= self.in_value[j]
+        return value
+
+    def incoming(self, wallet: str) -> Tuple[List[int], List[int]]:
+        """Поступления на кошелёк: (номер адреса-источника, сумма в сатоши) по транзакциям.
+
+        То же правило, что FundsOriginAnalyzer.btc_origin_records: транзакции,
+        где кошелёк среди входов, пропускаются; источник — вход с наибольшей суммой,
+        у транзакции без входов (coinbase) — -1. Батч не меняется: страницы
+        истории общие через кэш.
+        """
+        wallet_id = self.find(wallet)
+        sources, amounts = [], []
+        if wallet_id < 0:
+            return sources, amounts
+        in_addr, in_value, out_addr, out_value = self.in_addr, self.in_value, self.out_addr, self.out_value
+        for i in range(len(self.hashes)):
+            a, b = self.in_start[i], self.in_start[i + 1]
+            if wallet_id in in_addr[a:b]:
+                continue
+            c, d = self.out_start[i], self.out_start[i + 1]
+            received = 0
+            for j in range(c, d):
+                if out_addr[j] == wallet_id:
+                    received += out_value[j]
+            if received <= 0:
+                continue
+            if a < b:
+                sources.append(in_addr[max(range(a, b), key=in_value.__getitem__)])
+            else:
+                sources.append(-1)
+            amounts.append(received)
+        return sources, amounts
+
+    def tx(self, i: int) -> Dict:
+        """Транзакция i в формате get_address_transactions (BTC, datetime)"""
+        addresses = self.addresses
+        a, b = self.in_start[i], self.in_start[i + 1]
+        c, d = self.out_start[i], self.out_start[i + 1]
+        return {
+            'hash': self.hashes[i],
+            'time': datetime.fromtimestamp(self.times[i]),
+            'confirmations': self.heights[i],
+            'inputs': [{'address': addresses[self.in_addr[j]] or None, 'value': self.in_value[j] / SATOSHI}
+                       for j in range(a, b)],
+            'outputs': [{'address': addresses[self.out_addr[j]] or None, 'value': self.out_value[j] / SATOSHI,
+                         'spent': bool(self.out_spent[j])} for j in range(c, d)],
+        }
+
+    def to_dicts(self) -> List[Dict]:
+        return [self.tx(i) for i in range(len(self))]
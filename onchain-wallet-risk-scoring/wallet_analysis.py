@@ -0,0 +1,122 @@
+import asyncio
+import logging
+from contextlib import aclosing
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import metrics
+from async_bitcoin_checker import AsyncBitcoinAddressChecker
+from funds_origin import FundsOriginAnalyzer
+from tx_batch import TxBatch
+
+# Доля средств (%) из категории с весом риска от HIGH_RISK_WEIGHT, при которой она попадает в факторы
+HIGH_RISK_WEIGHT = 0.7
+HIGH_RISK_SHARE = 5
+UNKNOWN_SHARE = 50
+
+# Уровни риска: (верхняя граница %, название, emoji, цвет)
+RISK_LEVELS = (
+    (20, "НИЗКИЙ", "🟢", "#10B981"),
+    (50, "УМЕРЕННЫЙ", "🟡", "#F59E0B"),
+    (75, "ВЫСОКИЙ", "🔴", "#EF4444"),
+    (100, "КРИТИЧЕСКИЙ", "☣️", "#7C3AED"),
+)
+
+
+def risk_level(risk_pct: float) -> Tuple[str, str, str]:
+    """(название, emoji, цвет) уровня риска"""
+    for bound, name, emoji, color in RISK_LEVELS:
+        if risk_pct <= bound:
+            return name, emoji, color
+    return RISK_LEVELS[-1][1:]
+
+
+def calculate_total_risk(balance_info: dict, origin_analysis: dict) -> float:
+    """Расчет общего процента риска"""
+    base_risk = 0
+
+    # Риск от происхождения средств
+    for category, data in origin_analysis.items():
+        base_risk += data['risk_contribution']
+
+    # Дополнительные факторы риска
+    if balance_info['transaction_count'] > 1000:
+        base_risk += 15  # Высокая активность
+
+    if balance_info['balance_btc'] > 10:
+        base_risk -= 10  # Крупный баланс (менее рискованно)
+
+    # Ограничение 0-100%
+    return max(0, min(100, base_risk))
+
+
+def identify_risk_factors(origin_analysis: dict) -> List[str]:
+    """Текстовые факторы риска по результату анализа происхождения"""
+    factors = []
+    for category, data in origin_analysis.items():
+        weight = FundsOriginAnalyzer.CATEGORIES[category]['risk_weight']
+        if weight >= HIGH_RISK_WEIGHT and data['amount_percentage'] >= HIGH_RISK_SHARE:
+            factors.append(f"{data['name']}: {data['amount_percentage']}% средств")
+    unknown = origin_analysis.get('unknown')
+    if unknown is not None and unknown['amount_percentage'] > UNKNOWN_SHARE:
+        factors.append(f"Происхождение {unknown['amount_percentage']}% средств не установлено")
+    return factors
+
+
+class WalletAnalyzer:
+    """Конвейер анализа BTC кошелька: баланс, история, происхождение средств, риск.
+
+    Общий для бота и bulk API. Баланс берётся через `get_balance` (в боте —
+    кэш + BalanceBatcher), история читается страницами TxBatch и сразу
+    сворачивается в статистику по категориям; в результате остаются только
+    последние `recent` транзакций — тоже одним TxBatch ('transactions').
+    """
+
+    def __init__(self, checker: AsyncBitcoinAddressChecker, origin_analyzer: FundsOriginAnalyzer,
+                 get_balance: Optional[Callable[[str], Awaitable[Dict]]] = None,
+                 max_history: int = 5000, page_cache=None, recent: int = 10):
+        self.checker = checker
+        self.origin_analyzer = origin_analyzer
+        self.get_balance = get_balance or checker.check_address_balance
+        self.max_history = max_history
+        self.page_cache = page_cache
+        self.recent = recent
+
+    async def analyze_btc(self, address: str) -> dict:
+        """Анализ Bitcoin кошелька; при ошибке — {'error': ...}"""
+        # Баланс запрашивается параллельно с постраничной загрузкой истории
+        balance_task = asyncio.ensure_future(self.get_balance(address))
+        transactions = TxBatch()  # последние транзакции для отчёта
+
+        async def pages():
+            history = self.checker.iter_address_batches(
+                address, max_txs=self.max_history, page_cache=self.page_cache)
+            async with aclosing(history):  # отменить предзагрузку страниц при ошибке
+                async for batch in history:
+                    if len(transactions) < self.recent:
+                        transactions.extend(batch, self.recent - len(transactions))
+                    yield batch
+
+        # Анализ происхождения средств по всей истории, постранично и без словарей на транзакцию
+        try:
+            with metrics.stage('history_origin'):
+                origin_analysis = await self.origin_analyzer.analyze_btc_origin_batches(pages(), address)
+        except Exception as e:
+            logging.warning(f"History fetch failed for {address}: {e}")
+            balance_task.cancel()
+            return {'error': 'Не удалось получить данные'}
+
+        balance_info = await balance_task
+        if not balance_info['success']:
+            return {'error': 'Не удалось получить данные'}
+
+        with metrics.stage('total_risk'):
+            total_risk = calculate_total_risk(balance_info, origin_analysis)
+
+        return {
+            'chain': 'BTC',
+            'balance': balance_info,
+            'transactions': transactions,
+            'origin_analysis': origin_analysis,
+            'total_risk': total_risk,
+            'risk_factors': identify_risk_factors(origin_analysis)
+        }
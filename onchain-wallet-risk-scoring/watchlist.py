@@ -0,0 +1,321 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import sqlite3
+import time
+from array import array
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from async_bitcoin_checker import AsyncBitcoinAddressChecker
+from funds_origin import FundsOriginAnalyzer
+from wallet_analysis import calculate_total_risk, risk_level
+
+# Сколько адресов пользователь может отслеживать на тарифе
+WATCH_LIMITS = {'free': 3, 'pro': 100, 'business': 10000}
+
+# notify(user_id, address, alert) — отправить оповещение (в боте — сообщение в Telegram)
+Notifier = Callable[[int, str, Dict], Awaitable[None]]
+
+PAGE_SIZE = 50  # транзакций на страницу rawaddr
+CATEGORIES = list(FundsOriginAnalyzer.CATEGORIES)
+
+
+class _Bucket:
+    """Token bucket запросов к API: rate в секунду, не больше burst в запасе"""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate, self.burst, self.tokens, self.updated = rate, burst, burst, now
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, cost: float) -> bool:
+        # запрос дороже burst ждёт полного запаса и уводит баланс в минус: средний
+        # темп остаётся rate, а такой запрос не блокирует очередь навсегда
+        if self.tokens < min(cost, self.burst):
+            return False
+        self.tokens -= cost
+        return True
+
+
+class _Watch:
+    __slots__ = ('address', 'users', 'n_tx', 'scored_n_tx', 'balance_btc', 'interval', 'due',
+                 'risk', 'stats', 'rescoring')
+
+    def __init__(self, address: str, interval: float, due: float):
+        self.address = address
+        self.users: Set[int] = set()
+        self.n_tx: Optional[int] = None         # последнее увиденное число транзакций
+        self.scored_n_tx: Optional[int] = None  # по скольким транзакциям посчитан риск
+        self.balance_btc = 0.0
+        self.interval = interval
+        self.due = due
+        self.risk: Optional[float] = None
+        # счётчики accumulate_btc_batch по CATEGORIES: сначала число, затем сумма в сатоши
+        self.stats: Optional[array] = None
+        self.rescoring = False
+
+
+class Watchlist:
+    """Мониторинг отслеживаемых адресов в рамках фиксированного бюджета запросов.
+
+    - балансы опрашиваются пачками по 100 адресов (check_multiple_addresses)
+      в порядке срока из кучи (due, адрес);
+    - история запрашивается только при изменении n_tx и только новые
+      транзакции: счётчики категорий хранятся у адреса и дополняются;
+      такие пересчёты идут раньше первичной оценки новых адресов;
+    - интервал опроса адаптивный: при активности делится на 2 (до
+      `min_interval`), без изменений растёт в `backoff` раз (до `max_interval`);
+    - запросы к API ограничены token bucket: `budget` запросов в секунду, из них
+      доля `rescore_share` — на историю. Если бюджета не хватает, опрос
+      отстаёт от срока (stats['lag']), но число запросов не растёт;
+    - когда риск пересекает `threshold` (в любую сторону), подписчики адреса
+      получают оповещение через `notify`.
+    """
+
+    def __init__(self, checker: AsyncBitcoinAddressChecker, origin_analyzer: FundsOriginAnalyzer,
+                 notify: Notifier, path: Optional[str] = None, budget: float = 5.0,
+                 rescore_share: float = 0.5, threshold: float = 50, min_interval: float = 300,
+                 max_interval: float = 6 * 3600, backoff: float = 1.5, batch_size: int = 100,
+                 max_history: int = 1000, tick: float = 1.0, clock: Callable[[], float] = time.time):
+        self.checker = checker
+        self.origin_analyzer = origin_analyzer
+        self.notify = notify
+        self.threshold = threshold
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.batch_size = min(batch_size, 100)
+        self.max_history = max_history
+        self.tick = tick
+        self.clock = clock
+        now = clock()
+        self._polls = _Bucket(budget * (1 - rescore_share), max(1.0, budget * (1 - rescore_share) * tick), now)
+        self._rescores = _Bucket(budget * rescore_share, max(1.0, budget * rescore_share * tick), now)
+        self._watches: Dict[str, _Watch] = {}
+        self._per_user: Dict[int, int] = {}
+        self._heap: List[tuple] = []  # (due, seq, адрес); устаревшие записи пропускаются
+        self._seq = itertools.count()
+        # ждут пересчёта: адреса с новыми транзакциями (дёшево, идут первыми) и ещё не оценённые
+        self._pending: deque = deque()
+        self._unscored: deque = deque()
+        self._task = None
+        self.stats = {'polls': 0, 'polled_addresses': 0, 'rescores': 0, 'pages': 0, 'alerts': 0,
+                      'errors': 0, 'lag': 0.0}
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path)
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS watchlist (
+                    address TEXT NOT NULL, user_id INTEGER NOT NULL, PRIMARY KEY (address, user_id))
+            """)
+            self.db.commit()
+            for address, user_id in self.db.execute("SELECT address, user_id FROM watchlist"):
+                self._add(address, user_id, now)
+
+    def __len__(self):
+        return len(self._watches)
+
+    def count(self, user_id: int) -> int:
+        return self._per_user.get(user_id, 0)
+
+    def addresses(self, user_id: int) -> List[str]:
+        return [w.address for w in self._watches.values() if user_id in w.users]
+
+    def risk(self, address: str) -> Optional[float]:
+        watch = self._watches.get(address)
+        return watch.risk if watch is not None else None
+
+    def _schedule(self, watch: _Watch, due: float):
+        watch.due = due
+        heapq.heappush(self._heap, (due, next(self._seq), watch.address))
+
+    def _add(self, address: str, user_id: int, now: float) -> bool:
+        watch = self._watches.get(address)
+        if watch is None:
+            watch = self._watches[address] = _Watch(address, self.min_interval, now)
+            self._schedule(watch, now)
+        if user_id in watch.users:
+            return False
+        watch.users.add(user_id)
+        self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+        return True
+
+    def add(self, address: str, user_id: int) -> bool:
+        """Начать отслеживание; False — пользователь уже следит за адресом"""
+        if not self._add(address, user_id, self.clock()):
+            return False
+        if self.db is not None:
+            with self.db:
+                self.db.execute("INSERT OR IGNORE INTO watchlist VALUES (?, ?)", (address, user_id))
+        return True
+
+    def remove(self, address: str, user_id: int) -> bool:
+        watch = self._watches.get(address)
+        if watch is None or user_id not in watch.users:
+            return False
+        watch.users.discard(user_id)
+        left = self._per_user[user_id] - 1
+        if left:
+            self._per_user[user_id] = left
+        else:
+            del self._per_user[user_id]
+        if not watch.users:
+            del self._watches[address]  # запись в куче станет устаревшей
+        if self.db is not None:
+            with self.db:
+                self.db.execute("DELETE FROM watchlist WHERE address = ? AND user_id = ?", (address, user_id))
+        return True
+
+    def _has_due(self, now: float) -> bool:
+        """Есть ли адрес со сроком опроса; устаревшие записи кучи выбрасываются"""
+        while self._heap and self._heap[0][0] <= now:
+            due, _, address = self._heap[0]
+            watch = self._watches.get(address)
+            if watch is not None and watch.due == due:
+                return True
+            heapq.heappop(self._heap)
+        return False
+
+    def _pop_due(self, now: float) -> List[_Watch]:
+        batch = []
+        while self._heap and len(batch) < self.batch_size and self._heap[0][0] <= now:
+            due, _, address = heapq.heappop(self._heap)
+            watch = self._watches.get(address)
+            if watch is not None and watch.due == due:
+                self.stats['lag'] = now - due
+                batch.append(watch)
+        return batch
+
+    async def _poll(self, batch: List[_Watch]):
+        self.stats['polls'] += 1
+        self.stats['polled_addresses'] += len(batch)
+        result = await self.checker.check_multiple_addresses([w.address for w in batch])
+        now = self.clock()
+        if not result['success']:
+            self.stats['errors'] += 1
+            for watch in batch:
+                self._schedule(watch, now + self.min_interval)
+            return
+        for watch in batch:
+            if self._watches.get(watch.address) is not watch:
+                continue  # удалён, пока шёл запрос
+            info = result['results'].get(watch.address)
+            if info is None:
+                self._schedule(watch, now + watch.interval)
+                continue
+            watch.balance_btc = info['balance_btc']
+            if info['transaction_count'] != watch.n_tx:
+                watch.n_tx = info['transaction_count']
+                watch.interval = max(self.min_interval, watch.interval / 2)
+                if not watch.rescoring:
+                    watch.rescoring = True
+                    (self._pending if watch.stats is not None else self._unscored).append(watch)
+            else:
+                watch.interval = min(self.max_interval, watch.interval * self.backoff)
+            self._schedule(watch, now + watch.interval)
+
+    def _rescore_plan(self, watch: _Watch):
+        """(сколько новых транзакций запросить, пересчитывать ли с нуля)"""
+        new = watch.n_tx - watch.scored_n_tx if watch.scored_n_tx is not None else -1
+        if watch.stats is None or new < 0 or new > self.max_history:
+            return min(watch.n_tx, self.max_history), True
+        return new, False
+
+    async def _rescore(self, watch: _Watch, limit: int, full: bool):
+        n_tx = watch.n_tx
+        stats = self.origin_analyzer.new_category_stats()
+        if not full:
+            for i, cat in enumerate(CATEGORIES):
+                stats[cat]['count'] = watch.stats[i]
+                stats[cat]['amount'] = watch.stats[len(CATEGORIES) + i]
+        try:
+            if limit:
+                # страницы идут от новых к старым: первые `limit` — ещё не учтённые
+                async for batch in self.checker.iter_address_batches(watch.address, page_size=PAGE_SIZE,
+                                                                     max_txs=limit):
+                    self.stats['pages'] += 1
+                    self.origin_analyzer.accumulate_btc_batch(stats, batch, watch.address)
+        except Exception as e:
+            self.stats['errors'] += 1
+            logging.warning(f"Watchlist history fetch failed for {watch.address}: {e}")
+            watch.rescoring = False
+            return
+        watch.rescoring = False
+        watch.stats = array('q', [stats[cat]['count'] for cat in CATEGORIES] +
+                            [stats[cat]['amount'] for cat in CATEGORIES])
+        watch.scored_n_tx = n_tx
+        self.stats['rescores'] += 1
+
+        origin = self.origin_analyzer.origin_from_satoshi(stats)
+        risk = calculate_total_risk({'transaction_count': n_tx, 'balance_btc': watch.balance_btc}, origin)
+        previous, watch.risk = watch.risk, risk
+        # первая оценка — точка отсчёта; оповещение только при пересечении порога
+        if previous is None or (previous < self.threshold) == (risk < self.threshold):
+            return
+        level, emoji, _ = risk_level(risk)
+        alert = {'address': watch.address, 'risk': risk, 'previous_risk': previous, 'level': level,
+                 'emoji': emoji, 'rising': risk >= self.threshold, 'n_tx': n_tx, 'origin': origin}
+        for user_id in list(watch.users):
+            self.stats['alerts'] += 1
+            try:
+                await self.notify(user_id, watch.address, alert)
+            except Exception as e:
+                logging.warning(f"Watchlist alert to {user_id} failed: {e}")
+
+    async def step(self):
+        """Один цикл: опросы и пересчёты, на которые хватает бюджета"""
+        now = self.clock()
+        self._polls.refill(now)
+        self._rescores.refill(now)
+        jobs = []
+        for queue in (self._pending, self._unscored):
+            while queue:
+                watch = queue[0]
+                if self._watches.get(watch.address) is not watch:
+                    queue.popleft()
+                    continue
+                limit, full = self._rescore_plan(watch)
+                if not self._rescores.take(math.ceil(limit / PAGE_SIZE)):
+                    break
+                queue.popleft()
+                jobs.append(self._rescore(watch, limit, full))
+            if queue:
+                break  # бюджет истории исчерпан
+        while self._has_due(now) and self._polls.take(1):
+            jobs.append(self._poll(self._pop_due(now)))
+        if jobs:
+            await asyncio.gather(*jobs)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.step()
+            except Exception as e:
+                logging.error(f"Watchlist step failed: {e}")
+            await asyncio.sleep(self.tick)
+
+    def start(self):
+        """Фоновый цикл мониторинга (нужен запущенный event loop)"""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def info(self) -> Dict:
+        return {'watched': len(self._watches), 'users': len(self._per_user),
+                'pending_rescores': len(self._pending), 'unscored': len(self._unscored),
+                **self.stats}
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.db is not None:
+            self.db.close()
+            self.db = None